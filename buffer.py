@@ -401,6 +401,10 @@ class IntArray(Sequence):
         self._columns = columns
 
     def __getitem__(self, item):
+        if item < 0:
+            item += self._rows
+        if not 0 <= item < self._rows:
+            raise IndexError(f'row {item} out of range')
         start: int = item * self._columns
         end: int = start + self._columns
         return self._data[start: end]
@@ -409,7 +413,7 @@ class IntArray(Sequence):
         pass
 
     def __len__(self):
-        return math.ceil(self._data / self._columns)
+        return self._rows
 
     def __str__(self):
         return ", ".join(str(x) for x in self)
@@ -418,6 +422,13 @@ class IntArray(Sequence):
         self._rows = rows
         self._columns = columns
 
+    def to_bytes(self, byte_order: ByteOrder = ByteOrder.BIG_ENDIAN) -> bytes:
+        """The values as 32 bit words in byte_order."""
+        words = array.array('I', (value & 0xFFFFFFFF for value in self._data))
+        if (byte_order == ByteOrder.BIG_ENDIAN) != (sys.byteorder == 'big'):
+            words.byteswap()
+        return words.tobytes()
+
     @property
     def shape(self) -> (int, int):
         return self._rows, self._columns
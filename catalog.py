@@ -0,0 +1,477 @@
+import glob
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from typing import Iterable, Iterator, Optional, Union
+
+from model import DataRecord, SeedFormatV2, ns_to_datetime
+from seedindex import RecordIndex
+from seedio import DEFAULT_BLOCK_SIZE, RecordIterator, build_index, detect_compression, parse_record
+from selection import Selection, normalize_location
+
+SCAN_CHUNK_SIZE = 256
+SEGMENT_MAX_RECORDS = 64
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    record_length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS channels (
+    network TEXT NOT NULL,
+    station TEXT NOT NULL,
+    location TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    max_duration INTEGER NOT NULL,
+    PRIMARY KEY (network, station, location, channel)
+);
+CREATE TABLE IF NOT EXISTS segments (
+    file_id INTEGER NOT NULL REFERENCES files (id),
+    network TEXT NOT NULL,
+    station TEXT NOT NULL,
+    location TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    start_ns INTEGER NOT NULL,
+    end_ns INTEGER NOT NULL,
+    byte_offset INTEGER NOT NULL,
+    byte_length INTEGER NOT NULL,
+    number_of_records INTEGER NOT NULL,
+    number_of_samples INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_channel_time ON segments (network, station, location, channel, start_ns, end_ns);
+CREATE INDEX IF NOT EXISTS segments_file ON segments (file_id, byte_offset);
+"""
+
+
+class ChannelSummary:
+    """Extent of one channel inside one file, built from record headers only."""
+
+    def __init__(self, network: str, station: str, location: str, channel: str, start_ns: int, end_ns: int,
+                 number_of_records: int = 0, number_of_samples: int = 0, sample_rate: float = None,
+                 encodings: tuple = ()):
+        self.network = network
+        self.station = station
+        self.location = location
+        self.channel = channel
+        self.start_ns = start_ns
+        self.end_ns = end_ns
+        self.number_of_records = number_of_records
+        self.number_of_samples = number_of_samples
+        self.sample_rate = sample_rate
+        self.encodings = encodings
+
+    @property
+    def nslc(self) -> tuple:
+        return self.network, self.station, self.location, self.channel
+
+    @property
+    def start_time(self):
+        return ns_to_datetime(self.start_ns)
+
+    @property
+    def end_time(self):
+        return ns_to_datetime(self.end_ns)
+
+    def __str__(self) -> str:
+        return f'{".".join(self.nslc)} {self.start_time.isoformat()} {self.end_time.isoformat()} ' \
+               f'records:{self.number_of_records} samples:{self.number_of_samples}'
+
+
+class FileSummary:
+    def __init__(self, path: str, size: int, mtime_ns: int, record_length: int, channels: list[ChannelSummary]):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.record_length = record_length
+        self.channels = channels
+
+
+def is_seed_file(path) -> bool:
+    """Sniff the first bytes of path for a record header, compressed files are accepted as they are."""
+    try:
+        with open(path, 'rb') as file:
+            head = file.read(8)
+    except OSError:
+        return False
+    if detect_compression(head) is not None:
+        return True
+    return SeedFormatV2.RECORD_HEADER.match(head.decode('ascii', errors='replace')) is not None
+
+
+def summarize(path) -> FileSummary:
+    stat = os.stat(path)
+    channels = dict()
+    encodings = dict()
+    with RecordIterator(path, header_only=True, use_index=False) as iterator:
+        for record in iterator:
+            key = (record.network_code.strip(), record.station_code.strip(),
+                   normalize_location(record.channel_location_code), record.channel_code.strip())
+            start_ns = record.start_time_ns
+            end_ns = record.end_time_ns
+            summary = channels.get(key)
+            if summary is None:
+                summary = channels[key] = ChannelSummary(*key, start_ns=start_ns, end_ns=end_ns,
+                                                         sample_rate=record.sample_rate)
+                encodings[key] = set()
+            elif start_ns < summary.start_ns:
+                summary.start_ns = start_ns
+            if end_ns > summary.end_ns:
+                summary.end_ns = end_ns
+            summary.number_of_records += 1
+            summary.number_of_samples += record.number_of_samples
+            encodings[key].add(int(record.encoding_format))
+        record_length = iterator.record_length
+    for key, summary in channels.items():
+        summary.encodings = tuple(sorted(encodings[key]))
+    return FileSummary(os.fspath(path), stat.st_size, stat.st_mtime_ns, record_length, list(channels.values()))
+
+
+def _scan_file(path) -> tuple:
+    if not is_seed_file(path):
+        return path, None, None
+    try:
+        return path, summarize(path), None
+    except Exception as e:
+        return path, None, f'{type(e).__name__}: {e}'
+
+
+def find_files(paths_or_globs: Union[str, os.PathLike, Iterable]) -> Iterable[str]:
+    """Files named by paths_or_globs, directories are walked and glob patterns expanded ('**' recursively)."""
+    if isinstance(paths_or_globs, (str, os.PathLike)):
+        paths_or_globs = [paths_or_globs]
+    for entry in paths_or_globs:
+        entry = os.fspath(entry)
+        if os.path.isdir(entry):
+            for directory, directories, names in os.walk(entry):
+                directories.sort()
+                for name in sorted(names):
+                    yield os.path.join(directory, name)
+        elif glob.has_magic(entry):
+            for path in sorted(glob.iglob(entry, recursive=True)):
+                if os.path.isfile(path):
+                    yield path
+        elif os.path.isfile(entry):
+            yield entry
+
+
+class Catalog:
+    """Header summaries of many files, queried by channel and time window without reopening the files."""
+
+    def __init__(self, files: list[FileSummary] = None, errors: dict = None):
+        self._files = list()
+        self._errors = errors if errors is not None else dict()
+        for summary in files or ():
+            self.add(summary)
+
+    @property
+    def files(self) -> list[FileSummary]:
+        return self._files
+
+    @property
+    def errors(self) -> dict:
+        """Message of every seed file that could not be scanned, by path."""
+        return self._errors
+
+    def __len__(self):
+        return len(self._files)
+
+    def add(self, summary: FileSummary):
+        if summary is None:
+            raise ValueError
+        self._files.append(summary)
+
+    def channels(self) -> list[tuple]:
+        found = set()
+        for summary in self._files:
+            for channel in summary.channels:
+                found.add(channel.nslc)
+        return sorted(found)
+
+    def select(self, start=None, end=None, network: str = None, station: str = None, location: str = None,
+               channel: str = None, sample_rate=None) -> list[tuple[FileSummary, ChannelSummary]]:
+        """(file, channel) pairs overlapping the criteria, codes accept the wildcards of Selection."""
+        selection = Selection(start=start, end=end, network=network, station=station, location=location,
+                              channel=channel, sample_rate=sample_rate)
+        selected = list()
+        for summary in self._files:
+            for summary_channel in summary.channels:
+                if not selection.matches_channel(*summary_channel.nslc):
+                    continue
+                if not selection.matches_sample_rate(summary_channel.sample_rate):
+                    continue
+                if not selection.matches_time(summary_channel.start_ns, summary_channel.end_ns):
+                    continue
+                selected.append((summary, summary_channel))
+        return selected
+
+    def paths(self, **kwargs) -> list[str]:
+        """Paths of the files holding data matching the keyword criteria of select."""
+        return sorted({summary.path for summary, channel in self.select(**kwargs)})
+
+    def extent(self, network: str, station: str, location: str, channel: str) -> Optional[tuple[int, int]]:
+        """(start_ns, end_ns) of a channel over all files, None when the channel is not in the catalog."""
+        key = (network, station, normalize_location(location), channel)
+        extent = None
+        for summary in self._files:
+            for summary_channel in summary.channels:
+                if summary_channel.nslc != key:
+                    continue
+                if extent is None:
+                    extent = (summary_channel.start_ns, summary_channel.end_ns)
+                else:
+                    extent = (min(extent[0], summary_channel.start_ns), max(extent[1], summary_channel.end_ns))
+        return extent
+
+
+def scan(paths_or_globs, workers: int = None) -> Catalog:
+    """Summarize every seed file under paths_or_globs into a Catalog, in a pool of workers processes.
+
+    Files that do not start with a record header are passed over, files that fail to parse are
+    listed in Catalog.errors and do not stop the scan.
+    """
+    paths = find_files(paths_or_globs)
+    catalog = Catalog()
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            _collect(catalog, executor.map(_scan_file, paths, chunksize=SCAN_CHUNK_SIZE))
+    else:
+        _collect(catalog, map(_scan_file, paths))
+    return catalog
+
+
+def _collect(catalog: Catalog, results: Iterable[tuple]):
+    for path, summary, error in results:
+        if error is not None:
+            catalog.errors[path] = error
+        elif summary is not None:
+            catalog.add(summary)
+
+
+def index_segments(index: RecordIndex, max_records: int = SEGMENT_MAX_RECORDS) -> list[tuple]:
+    """Collapse the rows of an index into runs of at most max_records records of one channel stored back to
+    back in the file, as (network, station, location, channel, start_ns, end_ns, byte_offset, byte_length,
+    records, samples). Capping the runs bounds what a time window query reads beyond the window."""
+    segments = list()
+    run = None
+    for row in range(len(index)):
+        channel_id = index.channel_ids[row]
+        offset = index.offsets[row]
+        if run is not None and run[0] == channel_id and offset == run[3] + index.record_length and \
+                run[4] < max_records:
+            run[2] = max(run[2], index.end_times[row])
+            run[3] = offset
+            run[4] += 1
+            run[5] += index.sample_counts[row]
+            continue
+        if run is not None:
+            segments.append(_to_segment(index, run))
+        run = [channel_id, index.start_times[row], index.end_times[row], offset, 1, index.sample_counts[row], offset]
+    if run is not None:
+        segments.append(_to_segment(index, run))
+    return segments
+
+
+def _to_segment(index: RecordIndex, run: list) -> tuple:
+    channel_id, start_ns, end_ns, last_offset, records, samples, first_offset = run
+    return (*index.channels[channel_id], start_ns, end_ns, first_offset,
+            last_offset + index.record_length - first_offset, records, samples)
+
+
+def _index_file(path) -> tuple:
+    try:
+        with open(path, 'rb') as file:
+            head = file.read(8)
+    except OSError as e:
+        return path, None, f'{type(e).__name__}: {e}'
+    if not SeedFormatV2.RECORD_HEADER.match(head.decode('ascii', errors='replace')):
+        return path, None, None
+    try:
+        return path, build_index(path), None
+    except Exception as e:
+        return path, None, f'{type(e).__name__}: {e}'
+
+
+class CatalogDatabase:
+    """Record locations of many files in a SQLite database, for archive wide channel and time window queries.
+
+    Each row of the segments table is a run of records of one channel stored back to back in one file,
+    with its time extent and byte range, so a query answers which byte ranges of which files hold the
+    data. update only rescans files whose size or modification time changed. Compressed files are
+    passed over, their byte ranges cannot be read directly.
+    """
+
+    def __init__(self, path):
+        if path is None:
+            raise ValueError
+        self._path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(CATALOG_SCHEMA)
+        self._errors = dict()
+
+    @property
+    def errors(self) -> dict:
+        """Message of every seed file the last update could not index or a query could not find, by path."""
+        return self._errors
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    def files(self) -> list[str]:
+        return [row[0] for row in self._connection.execute('SELECT path FROM files ORDER BY path')]
+
+    def channels(self) -> list[tuple]:
+        return [tuple(row) for row in self._connection.execute(
+            'SELECT network, station, location, channel FROM channels ORDER BY network, station, location, channel')]
+
+    def update(self, paths_or_globs, workers: int = None) -> int:
+        """Index the new and changed seed files under paths_or_globs, returns the number of files indexed."""
+        known = dict()
+        for path, size, mtime_ns in self._connection.execute('SELECT path, size, mtime_ns FROM files'):
+            known[path] = (size, mtime_ns)
+        changed = list()
+        for path in find_files(paths_or_globs):
+            path = os.path.abspath(path)
+            stat = os.stat(path)
+            if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                changed.append(path)
+        self._errors = dict()
+        if workers and workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return self._store(executor.map(_index_file, changed, chunksize=SCAN_CHUNK_SIZE))
+        return self._store(map(_index_file, changed))
+
+    def _store(self, results: Iterable[tuple]) -> int:
+        count = 0
+        with self._connection:
+            for path, index, error in results:
+                if error is not None:
+                    self._errors[path] = error
+                    self._delete(path)
+                    continue
+                if index is None:
+                    continue
+                self._delete(path)
+                cursor = self._connection.execute(
+                    'INSERT INTO files (path, size, mtime_ns, record_length) VALUES (?, ?, ?, ?)',
+                    (path, index.file_size, index.mtime_ns, index.record_length))
+                file_id = cursor.lastrowid
+                segments = index_segments(index)
+                self._connection.executemany(
+                    'INSERT INTO segments (file_id, network, station, location, channel, start_ns, end_ns, '
+                    'byte_offset, byte_length, number_of_records, number_of_samples) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', [(file_id, *segment) for segment in segments])
+                self._connection.executemany(
+                    'INSERT INTO channels (network, station, location, channel, max_duration) VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (network, station, location, channel) '
+                    'DO UPDATE SET max_duration = MAX(max_duration, excluded.max_duration)',
+                    [(*segment[0:4], segment[5] - segment[4]) for segment in segments])
+                count += 1
+        return count
+
+    def _delete(self, path: str):
+        row = self._connection.execute('SELECT id FROM files WHERE path = ?', (path,)).fetchone()
+        if row is not None:
+            self._connection.execute('DELETE FROM segments WHERE file_id = ?', row)
+            self._connection.execute('DELETE FROM files WHERE id = ?', row)
+
+    def prune(self) -> int:
+        """Forget the files that no longer exist, returns their number."""
+        missing = [path for path in self.files() if not os.path.isfile(path)]
+        with self._connection:
+            for path in missing:
+                self._delete(path)
+        return len(missing)
+
+    def ranges(self, start=None, end=None, network: str = None, station: str = None, location: str = None,
+               channel: str = None) -> list[tuple[str, int, int, int]]:
+        """(path, record_length, byte_offset, byte_length) of the data matching the criteria, adjacent
+        ranges merged, ordered by path and offset."""
+        selection = Selection(start=start, end=end, network=network, station=station, location=location,
+                              channel=channel)
+        return self._ranges(selection)
+
+    def _ranges(self, selection: Selection) -> list[tuple[str, int, int, int]]:
+        found = list()
+        for network, station, location, channel, max_duration in self._connection.execute(
+                'SELECT network, station, location, channel, max_duration FROM channels'):
+            if not selection.matches_channel(network, station, location, channel):
+                continue
+            query = 'SELECT files.path, files.record_length, byte_offset, byte_length FROM segments ' \
+                    'JOIN files ON files.id = segments.file_id ' \
+                    'WHERE network = ? AND station = ? AND location = ? AND channel = ?'
+            parameters = [network, station, location, channel]
+            if selection.start_ns is not None:
+                query += ' AND start_ns >= ? AND end_ns >= ?'
+                parameters.extend((selection.start_ns - max_duration, selection.start_ns))
+            if selection.end_ns is not None:
+                query += ' AND start_ns <= ?'
+                parameters.append(selection.end_ns)
+            found.extend(self._connection.execute(query, parameters))
+        found.sort()
+        merged = list()
+        for path, record_length, offset, length in found:
+            if merged and merged[-1][0] == path and merged[-1][2] + merged[-1][3] == offset:
+                merged[-1] = (path, record_length, merged[-1][2], merged[-1][3] + length)
+            else:
+                merged.append((path, record_length, offset, length))
+        return merged
+
+    def records(self, start=None, end=None, network: str = None, station: str = None, location: str = None,
+                channel: str = None, quality: str = None) -> Iterator[DataRecord]:
+        """Records matching the criteria, read from their byte ranges only. A file changed since it was
+        indexed is read in full with the same criteria instead, one that can no longer be found is skipped,
+        removed from the catalog and reported in errors."""
+        selection = Selection(start=start, end=end, network=network, station=station, location=location,
+                              channel=channel, quality=quality)
+        for path, ranges in groupby(self._ranges(selection), key=lambda r: r[0]):
+            try:
+                stat = os.stat(path)
+            except OSError as e:
+                # a file deleted or moved since it was indexed is forgotten, the others are still read
+                self._errors[path] = f'{type(e).__name__}: {e}'
+                with self._connection:
+                    self._delete(path)
+                continue
+            indexed = self._connection.execute('SELECT size, mtime_ns FROM files WHERE path = ?', (path,)).fetchone()
+            if (stat.st_size, stat.st_mtime_ns) != tuple(indexed):
+                with RecordIterator(path, start=start, end=end, network=network, station=station, location=location,
+                                    channel=channel, quality=quality) as iterator:
+                    yield from iterator
+                continue
+            with open(path, 'rb') as file:
+                for _, record_length, offset, length in ranges:
+                    file.seek(offset)
+                    block_size = max(record_length, DEFAULT_BLOCK_SIZE // record_length * record_length)
+                    while length > 0:
+                        view = memoryview(file.read(min(length, block_size)))
+                        if len(view) == 0:
+                            break
+                        length -= len(view)
+                        for position in range(0, len(view) - record_length + 1, record_length):
+                            record = parse_record(view[position:position + record_length], selection=selection)
+                            if record is not None:
+                                yield record
+
+    def close(self):
+        try:
+            self._connection.close()
+        except:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def open_catalog(path, paths_or_globs=None, workers: int = None) -> CatalogDatabase:
+    """Open or create the catalog database at path, indexing the new and changed files of paths_or_globs."""
+    database = CatalogDatabase(path)
+    if paths_or_globs is not None:
+        database.update(paths_or_globs, workers=workers)
+    return database
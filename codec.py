@@ -7,6 +7,7 @@ from typing import Optional
 import ctypes as _ctypes
 import array
 import math
+import sys
 
 from buffer import ByteOrder, IntArray
 
@@ -228,8 +229,8 @@ def fix_sign_1(value: int, width: int):
 
 
 def fix_sign(value: int, width: int):
-    max_value = 2 ** (width - 1)
-    return -(value - max_value) if value >= max_value else value
+    value &= (1 << width) - 1
+    return value - (1 << width) if value >= 1 << (width - 1) else value
 
 
 def left_right_shift(value: int, width: int, left_start: int, right: int, expected_size: int) -> list[int]:
@@ -496,7 +497,7 @@ class Steim1Bucket(SteimBucket):
             # return -(value & 0x8000) | (value & 0x7fff)
             # return [value >> 16, value & 0x7fff]
             if not bucket.put(fix_sign((value >> 16), 16)) \
-                    or not bucket.put(fix_sign((value & 0x7fff), 16)):
+                    or not bucket.put(fix_sign(value, 16)):
                 raise ValueError
             return bucket
         elif control == 3:
@@ -784,7 +785,7 @@ class SteimRecord(EncodedRecord):
         return self._index >= self._capacity
 
     def to_byte_array(self) -> bytearray:
-        return self._frames.to_bytes()
+        return bytearray(self._frames.to_bytes(self.byte_order))
 
     def __len__(self):
         return len(self._frames)
@@ -810,7 +811,7 @@ class SteimRecord(EncodedRecord):
         if steim_bytes is None or len(steim_bytes) == 0:
             raise ValueError
 
-        instance = cls(IntArray.wrap_bytes(steim_bytes, rows=math.ceil(len(steim_bytes) / 16),
+        instance = cls(IntArray.wrap_bytes(steim_bytes, rows=math.ceil(len(steim_bytes) / 64),
                                            columns=16, byte_order=byte_order), encoding_format=encoding_format,
                        byte_order=byte_order)
         instance._index = instance._capacity
@@ -987,39 +988,94 @@ class Steim3Decoder(SteimDecoder):
         super(Steim3Decoder, self).__init__(EncodingFormat.STEIM_3, byte_order)
 
 
+# (differences per word, bits per difference, control nibble, high bits of the word) tried in order
+STEIM_1_WORDS = ((4, 8, 1, None), (2, 16, 2, None), (1, 32, 3, None))
+STEIM_2_WORDS = ((7, 4, 3, 2), (6, 5, 3, 1), (5, 6, 3, 0), (4, 8, 1, None), (3, 10, 2, 3), (2, 15, 2, 2),
+                 (1, 30, 2, 1))
+
+
+def _bits(difference: int) -> int:
+    """Smallest Steim field width, of those used by either format, holding difference."""
+    for bits in (4, 5, 6, 8, 10, 15, 16, 30, 32):
+        if -(1 << (bits - 1)) <= difference < (1 << (bits - 1)):
+            return bits
+    raise SteimError('Difference {} does not fit in 32 bits', difference)
+
+
+def pack_steim_frames(samples, offset: int, number_of_frames: int, encoding_format: EncodingFormat,
+                      carry_over: int = None) -> tuple[array.array, int]:
+    """Pack samples from offset into at most number_of_frames Steim 1 or Steim 2 frames.
+
+    Returns (the 32 bit words of the frames used, the number of samples packed). Every word packs as
+    many differences as fit, carry_over is the sample preceding samples[offset] in a continuous series
+    and the first difference is 0 without it. The first frame holds the forward and reverse integration
+    constants, the first and last sample packed.
+    """
+    if number_of_frames is None or number_of_frames < 1:
+        raise ValueError
+    if encoding_format == EncodingFormat.STEIM_1:
+        layouts = STEIM_1_WORDS
+    elif encoding_format == EncodingFormat.STEIM_2:
+        layouts = STEIM_2_WORDS
+    else:
+        raise ValueError(f'Cannot pack {encoding_format} frames')
+    end = min(len(samples), offset + number_of_frames * 15 * 7)
+    previous = samples[offset] if carry_over is None else carry_over
+    differences = list()
+    widths = list()
+    for i in range(offset, end):
+        difference = samples[i] - previous
+        differences.append(difference)
+        widths.append(_bits(difference))
+        previous = samples[i]
+    words = array.array('I', bytes(number_of_frames * 64))
+    count = len(differences)
+    index = 0
+    frame = 0
+    while frame < number_of_frames and index < count:
+        control = 0
+        for position in range(3 if frame == 0 else 1, 16):
+            if index >= count:
+                break
+            for number, bits, nibble, high in layouts:
+                if index + number <= count and max(widths[index:index + number]) <= bits:
+                    break
+            else:
+                raise SteimError('Difference {} cannot be packed in {}', differences[index], encoding_format)
+            mask = (1 << bits) - 1
+            word = 0 if high is None else high << 30
+            shift = bits * (number - 1)
+            for difference in differences[index:index + number]:
+                word |= (difference & mask) << shift
+                shift -= bits
+            words[frame * 16 + position] = word
+            control |= nibble << (30 - 2 * position)
+            index += number
+        words[frame * 16] = control
+        frame += 1
+    if index == 0:
+        raise ValueError('No samples to pack')
+    words[1] = samples[offset] & 0xFFFFFFFF
+    words[2] = samples[offset + index - 1] & 0xFFFFFFFF
+    del words[frame * 16:]
+    return words, index
+
+
 class SteimEncoder(Encoder, ABC):
     def __init__(self, encoding_format: EncodingFormat = EncodingFormat.STEIM_2,
                  byte_order: ByteOrder = ByteOrder.BIG_ENDIAN):
         super(SteimEncoder, self).__init__(encoding_format, byte_order)
 
     def encode(self, samples, offset: int = 0, **kwargs) -> EncodedRecord:
-        if not samples:
+        if samples is None or len(samples) <= offset:
             raise ValueError
         number_of_frames = kwargs.get('number_of_frames')
         if not number_of_frames or number_of_frames < 1:
             raise ValueError
-
-        carry_over = kwargs.get('carry_over')
-        previous = 0
-        if carry_over is not None:
-            previous = carry_over
-
-        record = SteimRecord.allocate(encoding_format=self.encoding_format, number_of_frames=number_of_frames,
-                                      byte_order=self.byte_order)
-        record.forward_integration_factor = samples[offset]
-        reusable_bucket = SteimBucket.instance(self.encoding_format)
-        for sample in samples:
-            if record.is_full():
-                break
-            delta = sample - previous
-            if not reusable_bucket.put(delta):
-                if not record.append(reusable_bucket):
-                    raise RuntimeError
-                if not reusable_bucket.put(delta):
-                    raise RuntimeError
-            previous = sample
-        if not record.is_full() and not reusable_bucket.is_empty():
-            record.append(reusable_bucket)
+        words, number_of_samples = pack_steim_frames(samples, offset, number_of_frames, self.encoding_format,
+                                                     kwargs.get('carry_over'))
+        record = SteimRecord.wrap_ints(words, encoding_format=self.encoding_format, byte_order=self.byte_order)
+        record._number_of_samples = number_of_samples
         return record
 
 
@@ -1038,9 +1094,59 @@ class Steim3Encoder(SteimEncoder):
         super(Steim3Encoder, self).__init__(EncodingFormat.STEIM_3, byte_order)
 
 
+PRIMITIVE_TYPECODES = {EncodingFormat.SIXTEEN_BIT: 'h', EncodingFormat.THIRTY_TOW_BIT: 'i',
+                       EncodingFormat.IEEE_FLOATING_POINT: 'f', EncodingFormat.IEEE_DOUBLE: 'd'}
+
+
+class PrimitiveRecord(EncodedRecord):
+    """Samples stored as plain 16 or 32 bit integers or IEEE floats."""
+
+    def __init__(self, values: array.array, encoding_format: EncodingFormat = None,
+                 byte_order: ByteOrder = ByteOrder.BIG_ENDIAN):
+        super(PrimitiveRecord, self).__init__(encoding_format=encoding_format, byte_order=byte_order)
+        self._values = values
+        self._number_of_samples = len(values)
+
+    def to_byte_array(self) -> bytearray:
+        values = self._values
+        if (self.byte_order == ByteOrder.BIG_ENDIAN) != (sys.byteorder == 'big'):
+            values = array.array(values.typecode, values)
+            values.byteswap()
+        return bytearray(values.tobytes())
+
+
+class PrimitiveEncoder(Encoder):
+    def encode(self, samples, offset: int = 0, **kwargs) -> EncodedRecord:
+        if samples is None or len(samples) <= offset:
+            raise ValueError
+        number_of_samples = kwargs.get('number_of_samples') or len(samples) - offset
+        return PrimitiveRecord(array.array(PRIMITIVE_TYPECODES[self.encoding_format],
+                                           samples[offset:offset + number_of_samples]),
+                               encoding_format=self.encoding_format, byte_order=self.byte_order)
+
+
+class PrimitiveDecoder(Decoder):
+    def decode(self, data, **kwargs) -> array:
+        if data is None:
+            raise ValueError
+        values = array.array(PRIMITIVE_TYPECODES[self.encoding_format])
+        length = len(data) - len(data) % values.itemsize
+        expected_number_of_samples = kwargs.get('expected_number_of_samples')
+        if expected_number_of_samples is not None:
+            length = min(length, expected_number_of_samples * values.itemsize)
+        values.frombytes(bytes(data[0:length]))
+        if (self.byte_order == ByteOrder.BIG_ENDIAN) != (sys.byteorder == 'big'):
+            values.byteswap()
+        if expected_number_of_samples and expected_number_of_samples != len(values):
+            raise RuntimeWarning(f'{expected_number_of_samples}, {len(values)}')
+        return values
+
+
 def get_encoder(encoding_format: EncodingFormat, byte_order: ByteOrder = ByteOrder.BIG_ENDIAN) -> Encoder:
     if not encoding_format:
         raise ValueError
+    elif encoding_format in PRIMITIVE_TYPECODES:
+        return PrimitiveEncoder(encoding_format, byte_order=byte_order)
     elif encoding_format == EncodingFormat.STEIM_1:
         return Steim1Encoder(byte_order=byte_order)
     elif encoding_format == EncodingFormat.STEIM_2:
@@ -1054,6 +1160,8 @@ def get_encoder(encoding_format: EncodingFormat, byte_order: ByteOrder = ByteOrd
 def get_decoder(encoding_format: EncodingFormat, byte_order: ByteOrder = ByteOrder.BIG_ENDIAN) -> Decoder:
     if not encoding_format:
         raise ValueError
+    elif encoding_format in PRIMITIVE_TYPECODES:
+        return PrimitiveDecoder(encoding_format, byte_order=byte_order)
     elif encoding_format == EncodingFormat.STEIM_1:
         return Steim1Decoder(byte_order=byte_order)
     elif encoding_format == EncodingFormat.STEIM_2:
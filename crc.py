@@ -0,0 +1,43 @@
+import sys
+from array import array
+
+CASTAGNOLI_POLYNOMIAL = 0x82F63B78
+
+
+def _tables(polynomial: int) -> tuple[list[int], ...]:
+    """The byte table of polynomial and the three derived tables that advance it by 2, 3 and 4 bytes."""
+    table = list()
+    for byte in range(256):
+        crc = byte
+        for bit in range(8):
+            crc = (crc >> 1) ^ polynomial if crc & 1 else crc >> 1
+        table.append(crc)
+    tables = [table]
+    for i in range(3):
+        previous = tables[-1]
+        tables.append([(previous[byte] >> 8) ^ table[previous[byte] & 0xFF] for byte in range(256)])
+    return tuple(tables)
+
+
+CRC32C_TABLES = _tables(CASTAGNOLI_POLYNOMIAL)
+
+
+def crc32c(data, crc: int = 0) -> int:
+    """CRC-32C (Castagnoli) of data, a previous result passed as crc continues it over the next bytes.
+
+    Data is consumed four bytes at a time through the slicing-by-4 tables, the trailing bytes one at a time.
+    """
+    table0, table1, table2, table3 = CRC32C_TABLES
+    view = memoryview(data).cast('B')
+    length = len(view) & ~3
+    words = array('I')
+    words.frombytes(view[0:length])
+    if sys.byteorder == 'big':
+        words.byteswap()
+    crc ^= 0xFFFFFFFF
+    for word in words:
+        crc ^= word
+        crc = table3[crc & 0xFF] ^ table2[(crc >> 8) & 0xFF] ^ table1[(crc >> 16) & 0xFF] ^ table0[crc >> 24]
+    for byte in view[length:]:
+        crc = table0[(crc ^ byte) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
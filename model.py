@@ -1,4 +1,5 @@
 import datetime
+import json
 import re
 import struct
 from abc import ABC
@@ -12,6 +13,7 @@ import math
 
 from buffer import ByteOrder
 from codec import EncodingFormat
+from objectidentifier import parse_source_id, to_source_id
 
 
 class DataHeader:
@@ -112,8 +114,8 @@ class DataHeader:
                 year, day, hour, minute, second, unused, fraction = struct.unpack('>hhbbbbh', val)
             else:
                 year, day, hour, minute, second, unused, fraction = struct.unpack('<hhbbbbh', val)
-        start_time = datetime.datetime(year, 1, 1, hour, minute, second)
-        start_time += datetime.timedelta(days=day)
+        start_time = datetime.datetime(year, 1, 1, hour, minute, second, fraction * 100)
+        start_time += datetime.timedelta(days=day - 1)
         dh.record_start_time = start_time
         if dh.byte_order is ByteOrder.BIG_ENDIAN:
             dh.number_of_samples, dh.sample_rate_factor, dh.sample_rate_multiplier, dh.activity_flags, dh.io_and_clock_flags, \
@@ -126,6 +128,146 @@ class DataHeader:
         return dh
 
 
+STEIM_ENCODINGS = (EncodingFormat.STEIM_1, EncodingFormat.STEIM_2, EncodingFormat.STEIM_3)
+
+
+class DataHeaderV3:
+    """Header of a miniSEED 3 record: the 40 byte little endian fixed section followed by the FDSN source
+    identifier and the extra headers.
+
+    The start time is kept in integer nanoseconds and the sample rate in samples per second, a negative
+    rate field (a sample period) is converted when parsed. The extra headers are kept as their JSON text
+    and only parsed when extra_headers or record_type is read.
+    """
+    FIXED_HEADER = struct.Struct('<2sBBIHHBBBBdIIBBHI')
+    LENGTH = 40
+    CRC_OFFSET = 28
+
+    def __init__(self, source_id: str = None, start_time_ns: int = None, encoding_format=None,
+                 sample_rate: float = 0.0, number_of_samples: int = 0, flags: int = 0, crc: int = 0,
+                 publication_version: int = 1, extra_headers=None, data_length: int = 0):
+        self.source_id = source_id
+        if source_id is not None:
+            self.network_code, self.station_identifier_code, self.location_identifier, self.channel_identifier = \
+                parse_source_id(source_id)
+        else:
+            self.network_code = self.station_identifier_code = self.location_identifier = \
+                self.channel_identifier = None
+        self.start_time_ns = start_time_ns
+        self.encoding_format = encoding_format
+        self.sample_rate = sample_rate
+        self.number_of_samples = number_of_samples
+        self.flags = flags
+        self.crc = crc
+        self.publication_version = publication_version
+        self._extra_headers = extra_headers if extra_headers is not None else b''
+        self.data_length = data_length
+        self.byte_order = ByteOrder.BIG_ENDIAN if encoding_format in STEIM_ENCODINGS else ByteOrder.LITTLE_ENDIAN
+        self.time_correction = 0
+        self.activity_flags = 0
+
+    @property
+    def extra_headers(self) -> dict:
+        if not isinstance(self._extra_headers, dict):
+            self._extra_headers = json.loads(self._extra_headers) if self._extra_headers else dict()
+        return self._extra_headers
+
+    @property
+    def record_type(self) -> str:
+        if not self._extra_headers:
+            return 'D'
+        return self.extra_headers.get('FDSN', dict()).get('DataQuality', 'D')
+
+    @property
+    def record_start_time(self) -> Optional[datetime.datetime]:
+        if self.start_time_ns is None:
+            return None
+        return ns_to_datetime(self.start_time_ns)
+
+    @property
+    def extra_headers_length(self) -> int:
+        if isinstance(self._extra_headers, dict):
+            return len(self.extra_headers_bytes())
+        return len(self._extra_headers)
+
+    def extra_headers_bytes(self) -> bytes:
+        if isinstance(self._extra_headers, dict):
+            if not self._extra_headers:
+                return b''
+            return json.dumps(self._extra_headers, separators=(',', ':')).encode('utf-8')
+        return bytes(self._extra_headers)
+
+    @property
+    def beginning_of_data(self) -> int:
+        return self.LENGTH + len(self.source_id.encode('ascii')) + self.extra_headers_length
+
+    @property
+    def record_length(self) -> int:
+        return self.beginning_of_data + self.data_length
+
+    def __str__(self) -> str:
+        return 'source_id:{}, start_time_ns:{}, encoding_format:{}, sample_rate:{}, number_of_samples:{}, ' \
+               'flags:{}, crc:{}, publication_version:{}, data_length:{}'.format(
+                self.source_id, self.start_time_ns, self.encoding_format, self.sample_rate,
+                self.number_of_samples, self.flags, self.crc, self.publication_version, self.data_length)
+
+    @staticmethod
+    def length_of(b_bytes) -> int:
+        """Total length of the record starting b_bytes, from the lengths in its fixed header."""
+        identifier_length, extra_headers_length, data_length = struct.unpack_from('<BHI', b_bytes, 33)
+        return DataHeaderV3.LENGTH + identifier_length + extra_headers_length + data_length
+
+    @staticmethod
+    def from_bytes(b_bytes) -> "DataHeaderV3":
+        """Parse the header at the start of bytes or a memoryview, nothing past the extra headers is copied."""
+        if b_bytes is None:
+            raise ValueError
+        if len(b_bytes) < DataHeaderV3.LENGTH:
+            raise ValueError(f'Expected at least {DataHeaderV3.LENGTH} bytes but received {len(b_bytes)}')
+        indicator, version, flags, nanosecond, year, day, hour, minute, second, encoding, sample_rate, \
+            number_of_samples, crc, publication_version, identifier_length, extra_headers_length, data_length = \
+            DataHeaderV3.FIXED_HEADER.unpack_from(b_bytes, 0)
+        if indicator != b'MS' or version != 3:
+            raise ValueError(f'Invalid miniSEED 3 record header [{bytes(b_bytes[0:3])}]')
+        if nanosecond > 999999999 or not 1 <= day <= 366 or hour > 23 or minute > 59 or second > 60:
+            raise ValueError(f'Invalid record start time {year}.{day},{hour}:{minute}:{second}.{nanosecond}')
+        start = DataHeaderV3.LENGTH
+        end = start + identifier_length + extra_headers_length
+        if len(b_bytes) < end:
+            raise ValueError(f'Expected at least {end} bytes but received {len(b_bytes)}')
+        source_id = bytes(b_bytes[start:start + identifier_length]).decode('ascii')
+        try:
+            encoding = EncodingFormat(encoding)
+        except ValueError:
+            pass
+        if sample_rate < 0:
+            sample_rate = -1.0 / sample_rate
+        days = datetime.date(year, 1, 1).toordinal() - EPOCH_ORDINAL + day - 1
+        start_time_ns = (days * 86400 + hour * 3600 + minute * 60 + second) * 1000000000 + nanosecond
+        return DataHeaderV3(source_id=source_id, start_time_ns=start_time_ns, encoding_format=encoding,
+                            sample_rate=sample_rate, number_of_samples=number_of_samples, flags=flags, crc=crc,
+                            publication_version=publication_version,
+                            extra_headers=bytes(b_bytes[start + identifier_length:end]), data_length=data_length)
+
+
+EPOCH = datetime.datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+
+def datetime_to_ns(time: datetime.datetime) -> int:
+    if time is None:
+        raise ValueError
+    if time.tzinfo is not None:
+        time = time.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return ((time - EPOCH) // datetime.timedelta(microseconds=1)) * 1000
+
+
+def ns_to_datetime(ns: int) -> datetime.datetime:
+    if ns is None:
+        raise ValueError
+    return EPOCH + datetime.timedelta(microseconds=ns // 1000)
+
+
 class SeedObject(ABC):
     def __init__(self) -> None:
         if type(self) is SeedObject:
@@ -278,6 +420,8 @@ class DataRecord:
 
     @property
     def encoding_format(self) -> Optional[EncodingFormat]:
+        if isinstance(self._header, DataHeaderV3):
+            return self._header.encoding_format
         b1000 = self.blockette(1000)
         if b1000 is None:
             return None
@@ -294,15 +438,12 @@ class DataRecord:
 
     @property
     def actual_sample_rate(self) -> Optional[int]:
-        if 100 in self.blockettes:
-            b100 = self.blockette(100)
-            if not b100:
-                return None
-            if not isinstance(b100, B100):
-                raise RuntimeError
-            return b100.actual_sample_rate
-        else:
+        b100 = self.blockette(100)
+        if not b100:
             return None
+        if not isinstance(b100, B100):
+            raise RuntimeError
+        return b100.actual_sample_rate
 
     @property
     def sample_rate_factor(self) -> Optional[int]:
@@ -312,6 +453,8 @@ class DataRecord:
 
     @property
     def sample_rate(self) -> [int]:
+        if isinstance(self._header, DataHeaderV3):
+            return self._header.sample_rate
         sample_rate = self.actual_sample_rate
         if sample_rate is None:
             sample_rate = self.calculate_sample_rate()
@@ -329,6 +472,48 @@ class DataRecord:
             return None
         return self.header.record_start_time
 
+    @property
+    def start_time_ns(self) -> Optional[int]:
+        """Record start time in integer nanoseconds since the epoch, including the B1001 microseconds
+        and the header time correction when it has not already been applied."""
+        if isinstance(self.header, DataHeaderV3):
+            return self.header.start_time_ns
+        if self.header is None or self.header.record_start_time is None:
+            return None
+        start: int = datetime_to_ns(self.header.record_start_time)
+        b1001 = self._blockettes.get(1001)
+        if b1001 is not None and b1001.microseconds:
+            start += b1001.microseconds * 1000
+        if self.header.time_correction and not (self.header.activity_flags or 0) & 0x02:
+            start += self.header.time_correction * 100000
+        return start
+
+    @property
+    def end_time_ns(self) -> Optional[int]:
+        """Time of the last sample in integer nanoseconds since the epoch."""
+        start = self.start_time_ns
+        if start is None:
+            return None
+        sample_rate = self.sample_rate
+        if not sample_rate or not self.number_of_samples or self.number_of_samples < 2:
+            return start
+        return start + round((self.number_of_samples - 1) * 1000000000 / sample_rate)
+
+    @property
+    def source_id(self) -> Optional[str]:
+        """FDSN source identifier, read from a miniSEED 3 header and built from the codes of a miniSEED 2 one."""
+        if self.header is None:
+            return None
+        if isinstance(self.header, DataHeaderV3):
+            return self.header.source_id
+        return to_source_id(self.network_code, self.station_code, self.channel_location_code, self.channel_code)
+
+    @property
+    def extra_headers(self) -> dict:
+        if isinstance(self.header, DataHeaderV3):
+            return self.header.extra_headers
+        return dict()
+
     @property
     def b1000(self) -> Optional[B1000]:
         b1000 = self.blockette(1000)
@@ -356,7 +541,7 @@ class DataRecord:
     def blockette(self, number: int) -> Optional[DataBlockette]:
         if not self._blockettes or len(self._blockettes) == 0:
             return None
-        return self._blockettes[number]
+        return self._blockettes.get(number)
 
     @property
     def data(self) -> bytearray:
@@ -382,14 +567,11 @@ class DataRecord:
         sample_rate_multiplier = self.sample_rate_multiplier
         if sample_rate_multiplier is None or sample_rate_factor is None:
             return 0
-        sample_rate_factor_multiplier = sample_rate_factor * sample_rate_multiplier
-        sample_rate_factor = abs(sample_rate_factor)
-        if sample_rate_factor_multiplier != 0:
-            return math.pow(abs(sample_rate_factor), sample_rate_factor / abs(sample_rate_factor)) * \
-                   math.pow(abs(sample_rate_multiplier), sample_rate_multiplier) / abs(
-                sample_rate_multiplier)
-        else:
+        if sample_rate_factor * sample_rate_multiplier == 0:
             return 0
+        sample_rate = float(sample_rate_factor) if sample_rate_factor > 0 else -1 / sample_rate_factor
+        return sample_rate * sample_rate_multiplier if sample_rate_multiplier > 0 else \
+            sample_rate / -sample_rate_multiplier
 
     def append(self, blockette: DataBlockette):
         if not blockette:
@@ -489,7 +671,11 @@ class BlocketteFactory:
         else:
             b_type, next_blockette = struct.unpack('<hh', b_bytes[offset:offset + 4])
         if b_type == 100:
-            return B100.from_bytes(b_bytes, byte_order, offset)
+            b_type, next_blockette_byte_number, actual_sample_rate, flags \
+                = struct.unpack('<hhfbxxx' if byte_order is ByteOrder.LITTLE_ENDIAN else '>hhfbxxx',
+                                b_bytes[offset:offset + 12])
+            return B100(next_blockette_byte_number=next_blockette_byte_number, actual_sample_rate=actual_sample_rate,
+                        flags=flags)
         elif b_type == 1000:
             b_type, next_blockette_byte_number, encoding_format, word_order, data_record_length, reserved \
                 = struct.unpack('<hhbbbb' if byte_order is ByteOrder.LITTLE_ENDIAN else '>hhbbbb',
@@ -540,6 +726,7 @@ class SeedFormatV2(SeedFormat):
 
 
 class SeedFormatV3(SeedFormat):
+    RECORD_HEADER = re.compile(r'^MS\x03')
 
     def __init__(self):
         super().__init__("3.0")
@@ -48,3 +48,37 @@ class ObjectIdentifier:
     def to_dictionary(self) -> Dict:
         return {'network': self._network, 'station': self._station, 'location': self._location,
                 'channel': self._channel}
+
+
+FDSN_SOURCE_ID_PREFIX = 'FDSN:'
+
+
+def parse_source_id(source_id: str) -> tuple[str, str, str, str]:
+    """(network, station, location, channel) of an FDSN source identifier such as 'FDSN:IU_ANMO_00_B_H_Z',
+    band, source and subsource codes of one character each are joined into a SEED channel code ('BHZ')."""
+    if source_id is None or not source_id.startswith(FDSN_SOURCE_ID_PREFIX):
+        raise ValueError(f'Expected an FDSN source identifier but received {source_id}')
+    codes = source_id[len(FDSN_SOURCE_ID_PREFIX):].split('_')
+    if len(codes) != 6:
+        raise ValueError(f'Expected NET_STA_LOC_BAND_SOURCE_SUBSOURCE but received {source_id}')
+    network, station, location, band, source, subsource = codes
+    if len(band) <= 1 and len(source) <= 1 and len(subsource) <= 1:
+        channel = band + source + subsource
+    else:
+        channel = '_'.join((band, source, subsource))
+    return network, station, location, channel
+
+
+def to_source_id(network: str, station: str, location: str, channel: str) -> str:
+    """The FDSN source identifier of SEED codes, a three letter channel is split into band, source and subsource."""
+    if network is None or station is None or channel is None:
+        raise ValueError
+    location = (location or '').strip()
+    if location == '--':
+        location = ''
+    channel = channel.strip()
+    if '_' not in channel:
+        if len(channel) != 3:
+            raise ValueError(f'Expected a three letter channel code but received {channel}')
+        channel = '_'.join(channel)
+    return f'{FDSN_SOURCE_ID_PREFIX}{network.strip()}_{station.strip()}_{location}_{channel}'
@@ -0,0 +1,145 @@
+import datetime
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from model import DataHeader
+from seedio import DEFAULT_BLOCK_SIZE, open_raw_records
+from selection import normalize_location
+
+FSYNC_POLICIES = (None, 'flush', 'close')
+
+
+class RecordRouter(ABC):
+    """Appends raw records to the file route picks from their channel codes and start day.
+
+    Records are written byte for byte, never decoded. At most max_open_files append handles stay open,
+    the least recently used one is closed when another file is needed, and every handle batches its
+    writes in a buffer of buffer_size bytes. Buffers are flushed when full, when flush_interval seconds
+    have passed since the last flush and on close. fsync is None (leave it to the OS), 'flush' (after
+    every flush) or 'close' (when a handle is closed). When a channel is routed to a new file for a
+    later day the file of its previous day is closed.
+    """
+
+    def __init__(self, max_open_files: int = 64, buffer_size: int = 2 ** 16, flush_interval: float = None,
+                 fsync: str = None):
+        if max_open_files is None or max_open_files < 1:
+            raise ValueError(f'max_open_files must be at least 1 but received {max_open_files}')
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f'Expected fsync to be one of {FSYNC_POLICIES} but received {fsync}')
+        self._max_open_files = max_open_files
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        self._fsync = fsync
+        self._handles = OrderedDict()
+        self._days = dict()
+        self._last_flush = time.monotonic()
+        self.records_written = 0
+        self.bytes_written = 0
+        self.files_opened = 0
+        self.closed = False
+
+    @abstractmethod
+    def route(self, identifier: tuple, day: datetime.date) -> str:
+        """Path of the file for records of identifier, (network, station, location, channel), starting on day."""
+        pass
+
+    def write(self, b_bytes, header: DataHeader = None) -> str:
+        """Append one record, bytes or a memoryview, and return the path of the file it went to."""
+        if self.closed:
+            raise ValueError(f'write to a closed {type(self).__name__}')
+        if header is None:
+            header = DataHeader.from_bytes(bytes(b_bytes[0:48]))
+        identifier = (header.network_code, header.station_identifier_code,
+                      normalize_location(header.location_identifier), header.channel_identifier)
+        day = header.record_start_time.date()
+        path = self.route(identifier, day)
+        current = self._days.get(identifier)
+        if current is None or current[0] < day:
+            if current is not None and current[1] != path:
+                self._close(current[1])
+            self._days[identifier] = (day, path)
+        self._handle(path).write(b_bytes)
+        self.records_written += 1
+        self.bytes_written += len(b_bytes)
+        if self._flush_interval is not None and time.monotonic() - self._last_flush >= self._flush_interval:
+            self.flush()
+        return path
+
+    def _handle(self, path: str):
+        handle = self._handles.get(path)
+        if handle is not None:
+            self._handles.move_to_end(path)
+            return handle
+        while len(self._handles) >= self._max_open_files:
+            self._close(next(iter(self._handles)))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle = open(path, 'ab', buffering=self._buffer_size)
+        self._handles[path] = handle
+        self.files_opened += 1
+        return handle
+
+    def _close(self, path: str):
+        handle = self._handles.pop(path, None)
+        if handle is None:
+            return
+        handle.flush()
+        if self._fsync is not None:
+            os.fsync(handle.fileno())
+        handle.close()
+
+    def flush(self):
+        for handle in self._handles.values():
+            handle.flush()
+            if self._fsync == 'flush':
+                os.fsync(handle.fileno())
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if self.closed:
+            return
+        for path in list(self._handles):
+            self._close(path)
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class Demultiplexer(RecordRouter):
+    """Routes records to one file per channel, NET.STA.LOC.CHAN.mseed, or per channel and day,
+    NET.STA.LOC.CHAN.YEAR.DAY.mseed, in directory. Existing files are appended to."""
+
+    def __init__(self, directory, by_day: bool = False, max_open_files: int = 64, buffer_size: int = 2 ** 16,
+                 flush_interval: float = None, fsync: str = None):
+        if directory is None:
+            raise ValueError
+        super().__init__(max_open_files=max_open_files, buffer_size=buffer_size, flush_interval=flush_interval,
+                         fsync=fsync)
+        self.directory = os.fspath(directory)
+        self.by_day = by_day
+
+    def route(self, identifier: tuple, day: datetime.date) -> str:
+        name = '.'.join(identifier)
+        if self.by_day:
+            name = f'{name}.{day.year:04d}.{day.timetuple().tm_yday:03d}'
+        return os.path.join(self.directory, f'{name}.mseed')
+
+
+def split(source, directory, by_day: bool = False, max_open_files: int = 64, block_size: int = DEFAULT_BLOCK_SIZE,
+          fsync: str = None) -> dict:
+    """Copy every record of source to the file of its channel (and day) in directory, without decoding.
+
+    Returns the number of records written to every file, by path.
+    """
+    written = dict()
+    with open_raw_records(source, block_size=block_size) as records, \
+            Demultiplexer(directory, by_day=by_day, max_open_files=max_open_files, fsync=fsync) as demultiplexer:
+        for header, b_bytes in records:
+            path = demultiplexer.write(b_bytes, header)
+            written[path] = written.get(path, 0) + 1
+    return written
@@ -0,0 +1,148 @@
+import datetime
+import fnmatch
+import glob
+import os
+from typing import Union
+
+from model import ns_to_datetime
+from router import RecordRouter
+from selection import normalize_location, to_ns
+
+SDS_BORDER_NS = 30 * 1000000000
+
+
+def day_of(time_ns: int) -> datetime.date:
+    return ns_to_datetime(time_ns).date()
+
+
+class SDSArchive:
+    """A SeisComP Data Structure archive, YEAR/NET/STA/CHAN.TYPE/NET.STA.LOC.CHAN.TYPE.YEAR.DAY.
+
+    Day file paths are computed from the codes and the time window. A directory is listed only
+    when the code of its level is a pattern ('*', '?' or comma separated alternatives), so a query
+    with exact codes touches nothing but the day files it reads.
+    """
+
+    def __init__(self, root, data_type: str = 'D'):
+        if root is None:
+            raise ValueError
+        if not data_type or len(data_type) != 1:
+            raise ValueError(f'Expected a one letter data type but received {data_type}')
+        self.root = os.fspath(root)
+        self.data_type = data_type
+
+    def path(self, network: str, station: str, location: str, channel: str,
+             day: Union[datetime.date, datetime.datetime]) -> str:
+        location = normalize_location(location) or ''
+        year = day.year
+        day_of_year = day.timetuple().tm_yday
+        return os.path.join(self.root, f'{year:04d}', network, station, f'{channel}.{self.data_type}',
+                            f'{network}.{station}.{location}.{channel}.{self.data_type}.{year:04d}.{day_of_year:03d}')
+
+    def files(self, start, end, network: str = None, station: str = None, location: str = None,
+              channel: str = None, border_ns: int = SDS_BORDER_NS) -> dict[tuple, list[str]]:
+        """Existing day files holding data between start and end, by (network, station, location, channel),
+        in time order. The day before start is included when start is within border_ns of midnight,
+        since a record starting before midnight is stored in the file of that day."""
+        start_ns = to_ns(start)
+        end_ns = to_ns(end)
+        if start_ns is None or end_ns is None:
+            raise ValueError('start and end are required')
+        if end_ns < start_ns:
+            raise ValueError('end must not be before start')
+        days = list()
+        day = day_of(start_ns - border_ns)
+        last = day_of(end_ns)
+        while day <= last:
+            days.append(day)
+            day += datetime.timedelta(days=1)
+        found = dict()
+        for year in sorted({day.year for day in days}):
+            year_days = {day.timetuple().tm_yday: day for day in days if day.year == year}
+            year_directory = os.path.join(self.root, f'{year:04d}')
+            for network_code in _codes(year_directory, network):
+                network_directory = os.path.join(year_directory, network_code)
+                for station_code in _codes(network_directory, station):
+                    station_directory = os.path.join(network_directory, station_code)
+                    for channel_code in _codes(station_directory, channel, f'.{self.data_type}'):
+                        channel_directory = os.path.join(station_directory, f'{channel_code}.{self.data_type}')
+                        for location_code, day_of_year, path in self._day_files(
+                                channel_directory, network_code, station_code, location, channel_code, year,
+                                year_days):
+                            found.setdefault((network_code, station_code, location_code, channel_code),
+                                             list()).append((year_days[day_of_year], path))
+        return {key: [path for day, path in sorted(paths)] for key, paths in sorted(found.items())}
+
+    def _day_files(self, directory: str, network: str, station: str, location: str, channel: str, year: int,
+                   days: dict) -> list[tuple]:
+        prefix = f'{network}.{station}.'
+        suffix = f'.{channel}.{self.data_type}.{year:04d}.'
+        alternatives = _alternatives(location)
+        if not any(glob.has_magic(alternative) for alternative in alternatives):
+            day_files = list()
+            for location_code in alternatives:
+                for day_of_year in days:
+                    path = os.path.join(directory, f'{prefix}{location_code}{suffix}{day_of_year:03d}')
+                    if os.path.isfile(path):
+                        day_files.append((location_code, day_of_year, path))
+            return day_files
+        day_files = list()
+        for name in _list(directory):
+            if not name.startswith(prefix) or suffix not in name[len(prefix):]:
+                continue
+            location_code, day_of_year = name[len(prefix):].split(suffix, 1)
+            if not day_of_year.isdigit() or int(day_of_year) not in days:
+                continue
+            if any(fnmatch.fnmatchcase(location_code, alternative) for alternative in alternatives):
+                day_files.append((location_code, int(day_of_year), os.path.join(directory, name)))
+        return day_files
+
+
+def _alternatives(pattern: str, location: bool = True) -> list[str]:
+    if pattern is None:
+        return ['*']
+    alternatives = list()
+    for alternative in pattern.split(','):
+        alternatives.append(normalize_location(alternative) if location else alternative.strip())
+    return alternatives
+
+
+def _list(directory: str) -> list[str]:
+    try:
+        return sorted(os.listdir(directory))
+    except OSError:
+        return list()
+
+
+def _codes(directory: str, pattern: str, suffix: str = '') -> list[str]:
+    """Codes of the entries of directory matching pattern, listing directory only for wildcard alternatives."""
+    codes = list()
+    names = None
+    for alternative in _alternatives(pattern, location=False):
+        if not glob.has_magic(alternative):
+            if alternative not in codes:
+                codes.append(alternative)
+            continue
+        if names is None:
+            names = [name[:len(name) - len(suffix)] for name in _list(directory) if name.endswith(suffix)]
+        for code in names:
+            if fnmatch.fnmatchcase(code, alternative) and code not in codes:
+                codes.append(code)
+    return codes
+
+
+class SDSWriter(RecordRouter):
+    """Appends raw records to the day files of an SDS archive, routed by the codes and start day of their headers.
+
+    Records are written byte for byte, never decoded, through the bounded set of buffered append handles
+    of RecordRouter. A channel moving on to a new day closes the file of its previous day.
+    """
+
+    def __init__(self, root, data_type: str = 'D', max_open_files: int = 64, buffer_size: int = 2 ** 16,
+                 flush_interval: float = None, fsync: str = None):
+        super().__init__(max_open_files=max_open_files, buffer_size=buffer_size, flush_interval=flush_interval,
+                         fsync=fsync)
+        self.archive = SDSArchive(root, data_type=data_type)
+
+    def route(self, identifier: tuple, day: datetime.date) -> str:
+        return self.archive.path(*identifier, day)
@@ -1,18 +1,44 @@
 import datetime
+import math
+import os
 import profile
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from pathlib import PurePath
 
 import h5py
 import pyarrow.parquet as pq
 import pyarrow as pa
 import xarray as xarray
 
+import catalog
+import seedfile
+import router
 import seedio
+import writer
+from catalog import CatalogDatabase
+from codec import get_decoder
 from geocsv import GeoCSVHeader, GeoCSVField, SeedGeoCSV
-from seedio import RecordIterator
-from timeseries import Trace
+from model import ns_to_datetime, SeedFormatV2
+from seedio import RecordIterator, Parser, decode_record_data
+from sds import SDSArchive
+from selection import Selection
+from timeseries import Trace, Segment
+from translate import translate, translate_files
 import fdsn
 
 get_record_length = seedio.get_record_length
+index = seedio.open_index
+diff = seedio.diff
+sync = seedio.sync
+split = router.split
+cut = seedio.cut
+rewrite_headers = seedio.rewrite_headers
+scan = catalog.scan
+open_catalog = catalog.open_catalog
+write = writer.write
+reformat = writer.reformat
+open_writer = writer.RecordWriter
 
 
 def count(source) -> int:
@@ -23,22 +49,56 @@ def count(source) -> int:
         return cnt
 
 
-def iterate(source, decompress: bool = False):
-    return RecordIterator(source, decompress=decompress)
+def iterate(source, decompress: bool = False, start=None, end=None, network: str = None, station: str = None,
+            location: str = None, channel: str = None, quality: str = None, sample_rate=None, workers: int = None,
+            prefetch: int = None, prefetch_bytes: int = None, tolerant: bool = False, on_error=seedio.log_error,
+            verify_crc: bool = False):
+    return RecordIterator(source, decompress=decompress, start=start, end=end, network=network, station=station,
+                          location=location, channel=channel, quality=quality, sample_rate=sample_rate,
+                          workers=workers, prefetch=prefetch, prefetch_bytes=prefetch_bytes, tolerant=tolerant,
+                          on_error=on_error, verify_crc=verify_crc)
 
 
-def read(source, decompress: bool = False):
-    with iterate(source, decompress) as iterator:
+def iterate_archive(name=None, fileobj=None, pattern: str = None, decompress: bool = False, **kwargs):
+    """Records of the seed members of a tar or zip archive, pattern filters members by name ('*.mseed')."""
+    return seedfile.iterate_archive(name=name, fileobj=fileobj, pattern=pattern, decompress=decompress, **kwargs)
+
+
+def merge(sources, decompress: bool = False, start=None, end=None, network: str = None, station: str = None,
+          location: str = None, channel: str = None, quality: str = None) -> seedio.MergeIterator:
+    """Records of sources merged in (network, station, location, channel, start time) order, duplicates dropped."""
+    return seedio.MergeIterator(sources, decompress=decompress, start=start, end=end, network=network,
+                                station=station, location=location, channel=channel, quality=quality)
+
+
+def read(source, decompress: bool = False, start=None, end=None, network: str = None, station: str = None,
+         location: str = None, channel: str = None, quality: str = None, sample_rate=None, workers: int = None,
+         prefetch: int = None, prefetch_bytes: int = None, tolerant: bool = False, on_error=seedio.log_error,
+         verify_crc: bool = False):
+    with iterate(source, decompress, start=start, end=end, network=network, station=station, location=location,
+                 channel=channel, quality=quality, sample_rate=sample_rate, workers=workers, prefetch=prefetch,
+                 prefetch_bytes=prefetch_bytes, tolerant=tolerant, on_error=on_error,
+                 verify_crc=verify_crc) as iterator:
         records = list()
         for record in iterator:
             records.append(record)
         return records
 
 
-def trace(source, decompress: bool = False) -> Trace:
+def trace(source, decompress: bool = False, start=None, end=None, network: str = None, station: str = None,
+          location: str = None, channel: str = None, quality: str = None, sample_rate=None,
+          workers: int = None) -> Trace:
     if source is None:
         raise ValueError
-    with iterate(source, decompress=decompress) as iterator:
+    if workers and workers > 1 and decompress and _is_file(source) and not seedio.is_compressed(source):
+        found = traces(source, start=start, end=end, network=network, station=station, location=location,
+                       channel=channel, quality=quality, sample_rate=sample_rate, workers=workers)
+        if len(found) > 1:
+            raise ValueError(f'Expected a single channel but found {len(found)}, use a channel filter')
+        return found[0] if found else None
+    with iterate(source, decompress=decompress, start=start, end=end, network=network, station=station,
+                 location=location, channel=channel, quality=quality, sample_rate=sample_rate,
+                 workers=workers) as iterator:
         t: Trace = None
         for record in iterator:
             if t is None:
@@ -51,21 +111,218 @@ def trace(source, decompress: bool = False) -> Trace:
         return t
 
 
-def convert(source, destination, data_format: str = None):
+def _is_file(source) -> bool:
+    return isinstance(source, (str, PurePath)) and os.path.isfile(source)
+
+
+def _join_runs(runs: list[list]) -> list[list]:
+    """Concatenate runs of [start_ns, sample_rate, samples, next_ns, record_type] that continue each other
+    within half a sample period, runs must be sorted by start time. Runs of different record types join
+    into one of type 'M'."""
+    joined = list()
+    for run in runs:
+        if joined:
+            last = joined[-1]
+            if last[1] == run[1] and abs(run[0] - last[3]) <= 500000000 / run[1]:
+                last[2].extend(run[2])
+                last[3] = run[3]
+                if last[4] != run[4]:
+                    last[4] = 'M'
+                continue
+        joined.append(run)
+    return joined
+
+
+def _trace_range(path, first: int, last: int, record_length: int, selection: Selection) -> dict:
+    """Decode the records in [first, last) and join them into runs per channel, only these compact
+    runs travel back to the parent process."""
+    runs = dict()
+    with Parser(SeedFormatV2(), open(path, "rb"), offsets=range(first, last, record_length),
+                selection=selection) as parser:
+        while True:
+            record = parser.next_record()
+            if record is None:
+                break
+            samples = decode_record_data(record.encoding_format, record.byte_order, record.number_of_samples,
+                                         record.data)
+            rate = record.sample_rate
+            start_ns = record.start_time_ns
+            run = [start_ns, rate, samples, start_ns + round(len(samples) * 1000000000 / rate), record.record_type]
+            channel_runs = runs.setdefault((record.network_code, record.station_code, record.channel_location_code,
+                                            record.channel_code), list())
+            if channel_runs:
+                previous = channel_runs[-1]
+                if previous[1] == rate and abs(start_ns - previous[3]) <= 500000000 / rate:
+                    previous[2].extend(samples)
+                    previous[3] = run[3]
+                    if previous[4] != record.record_type:
+                        previous[4] = 'M'
+                    continue
+            channel_runs.append(run)
+    return runs
+
+
+def traces(source, start=None, end=None, network: str = None, station: str = None, location: str = None,
+           channel: str = None, quality: str = None, sample_rate=None, workers: int = None) -> list[Trace]:
+    """One Trace per channel of a seed file.
+
+    With workers the file is cut into record aligned byte ranges that are decoded and joined into
+    per channel runs by a process pool, the runs are then stitched across range boundaries here.
+    """
+    if not _is_file(source):
+        raise ValueError(f'Expected a path to a seed file but received {source}')
+    if seedio.is_compressed(source):
+        raise ValueError(f'{source} is compressed and cannot be split into byte ranges')
+    selection = Selection(start=start, end=end, network=network, station=station, location=location,
+                          channel=channel, quality=quality, sample_rate=sample_rate)
+    record_length = get_record_length(source)
+    number_of_records = os.path.getsize(source) // record_length
+    workers = workers if workers and workers > 0 else 1
+    parts = min(number_of_records, workers * 4) or 1
+    bounds = [(number_of_records * i // parts) * record_length for i in range(parts + 1)]
+    if workers == 1:
+        results = [_trace_range(source, bounds[0], bounds[-1], record_length, selection)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_trace_range, source, bounds[i], bounds[i + 1], record_length, selection)
+                       for i in range(parts)]
+            results = [future.result() for future in futures]
+    channels = dict()
+    for result in results:
+        for identifier, runs in result.items():
+            channels.setdefault(identifier, list()).extend(runs)
+    found = list()
+    for identifier in sorted(channels):
+        runs = sorted(channels[identifier], key=lambda r: r[0])
+        t = Trace.with_network_station_location_channel(*identifier)
+        for run in _join_runs(runs):
+            t.add_segment(Segment(start_time=ns_to_datetime(run[0]), sample_rate=run[1], samples=run[2]),
+                          quality=run[4])
+        found.append(t)
+    return found
+
+
+def read_sds(root, start, end, network: str = None, station: str = None, location: str = None,
+             channel: str = None, quality: str = None, data_type: str = 'D') -> list[Trace]:
+    """Traces of the channels of an SDS archive matching the codes between start and end, both inclusive.
+
+    Only the day files of the window are opened, data crossing midnight is stitched into continuous
+    segments and the edge records are trimmed to the sample like extract.
+    """
+    selection = Selection(start=start, end=end, network=network, station=station, location=location,
+                          channel=channel, quality=quality)
+    archive = SDSArchive(root, data_type=data_type)
+    found = list()
+    for identifier, paths in archive.files(selection.start_ns, selection.end_ns, network=network, station=station,
+                                           location=location, channel=channel).items():
+        records = list()
+        for path in paths:
+            with RecordIterator(path, start=selection.start_ns, end=selection.end_ns, network=identifier[0],
+                                station=identifier[1], location=identifier[2] or '--', channel=identifier[3],
+                                quality=quality, use_index=False) as iterator:
+                records.extend(iterator)
+        if not records:
+            continue
+        record_types = {record.record_type for record in records}
+        record_type = record_types.pop() if len(record_types) == 1 else 'M'
+        t = Trace.with_network_station_location_channel(*identifier)
+        for segment in _trim(records, selection):
+            t.add_segment(segment, quality=record_type)
+        found.append(t)
+    return found
+
+
+def _sample_index(offset_ns: int, sample_rate: float, round_up: bool) -> int:
+    position = Fraction(offset_ns) * Fraction(sample_rate) / 1000000000
+    return math.ceil(position) if round_up else math.floor(position)
+
+
+def extract(source, start, end, network: str = None, station: str = None, location: str = None,
+            channel: str = None, quality: str = None) -> list[Segment]:
+    """Samples of one channel between start and end, both inclusive, source may be a CatalogDatabase.
+
+    Only records overlapping the window are decoded, the first and last of them are trimmed to the
+    first and last sample inside the window. Continuous data comes back as a single segment, a gap
+    larger than half a sample period starts a new one and overlapping samples are kept only once.
+    """
+    if start is None or end is None:
+        raise ValueError('start and end are required')
+    selection = Selection(start=start, end=end, network=network, station=station, location=location,
+                          channel=channel, quality=quality)
+    if isinstance(source, CatalogDatabase):
+        records = list(source.records(start=selection.start_ns, end=selection.end_ns, network=network,
+                                      station=station, location=location, channel=channel, quality=quality))
+    else:
+        with iterate(source, start=selection.start_ns, end=selection.end_ns, network=network, station=station,
+                     location=location, channel=channel, quality=quality) as iterator:
+            records = list(iterator)
+    return _trim(records, selection)
+
+
+def _trim(records: list, selection: Selection) -> list[Segment]:
+    """Segments of the samples of records, all of one channel, inside the time window of selection."""
+    records = sorted(records, key=lambda r: r.start_time_ns)
+    segments = list()
+    object_identifier = None
+    samples = None
+    segment_start: int = 0
+    next_sample: int = 0
+    sample_rate = None
+    for record in records:
+        identifier = (record.network_code, record.station_code, record.channel_location_code, record.channel_code)
+        if object_identifier is None:
+            object_identifier = identifier
+        elif object_identifier != identifier:
+            raise ValueError(f'Expected a single channel but found {object_identifier} and {identifier}')
+        record_start = record.start_time_ns
+        rate = record.sample_rate
+        first = max(0, _sample_index(selection.start_ns - record_start, rate, True))
+        last = min(record.number_of_samples, _sample_index(selection.end_ns - record_start, rate, False) + 1)
+        if samples is not None and rate == sample_rate:
+            half_period = 500000000 / rate
+            first_time = record_start + round(first * 1000000000 / rate)
+            if first_time < next_sample - half_period:
+                first = max(first, _sample_index(next_sample - half_period - record_start, rate, True))
+                first_time = record_start + round(first * 1000000000 / rate)
+            if first_time > next_sample + half_period:
+                segments.append(Segment(start_time=ns_to_datetime(segment_start), sample_rate=sample_rate,
+                                        samples=samples))
+                samples = None
+        elif samples is not None:
+            segments.append(Segment(start_time=ns_to_datetime(segment_start), sample_rate=sample_rate,
+                                    samples=samples))
+            samples = None
+        if first >= last:
+            continue
+        decoded = get_decoder(encoding_format=record.encoding_format, byte_order=record.byte_order). \
+            decode(data=record.data, expected_number_of_samples=record.number_of_samples)
+        if samples is None:
+            samples = decoded[first:last]
+            segment_start = record_start + round(first * 1000000000 / rate)
+            sample_rate = rate
+        else:
+            samples.extend(decoded[first:last])
+        next_sample = record_start + round(last * 1000000000 / rate)
+    if samples is not None:
+        segments.append(Segment(start_time=ns_to_datetime(segment_start), sample_rate=sample_rate, samples=samples))
+    return segments
+
+
+def convert(source, destination, data_format: str = None, workers: int = None):
     if data_format == 'parquet':
-        to_parquet(source, destination)
+        to_parquet(source, destination, workers=workers)
     elif data_format == 'geocsv':
-        to_geocsv(source, destination)
+        to_geocsv(source, destination, workers=workers)
     elif data_format == 'hdf5':
-        to_hdf5(source, destination)
+        to_hdf5(source, destination, workers=workers)
     elif data_format == 'netcdf':
-        to_netcdf(source, destination)
+        to_netcdf(source, destination, workers=workers)
     else:
         raise NotImplementedError(data_format)
 
 
-def to_geocsv(source, destination):
-    t = trace(source=source, decompress=True)
+def to_geocsv(source, destination, workers: int = None):
+    t = trace(source=source, decompress=True, workers=workers)
     if t:
         params = t.object_identifier.to_dictionary()
         params['start'] = '2012-01-01T10:00:00'
@@ -98,26 +355,26 @@ def to_geocsv(source, destination):
         raise IOError
 
 
-def to_parquet(source, destination):
+def to_parquet(source, destination, workers: int = None):
     if source is None or destination is None:
         raise ValueError
-    t = trace(source=source, decompress=True)
+    t = trace(source=source, decompress=True, workers=workers)
     if t:
         x = pa.array(t.x)
         y = pa.array(t.y)
         table = pa.Table.from_arrays([x, y],
                                      schema=pa.schema(
-                                         [pa.field('timestamp', pa.timestamp(unit='ms')), pa.field('sample',
+                                         [pa.field('timestamp', pa.timestamp(unit='us')), pa.field('sample',
                                                                                                    type=pa.int32())]))
         pq.write_table(table, destination)
     else:
         raise IOError
 
 
-def to_hdf5(source, destination):
+def to_hdf5(source, destination, workers: int = None):
     if source is None or destination is None:
         raise ValueError
-    t = trace(source=source, decompress=True)
+    t = trace(source=source, decompress=True, workers=workers)
     if t:
         with h5py.File(destination, 'w') as h5f:
             data_set = h5f.create_dataset(str(t.object_identifier), dtype=('int64', 'int64'),
@@ -127,10 +384,10 @@ def to_hdf5(source, destination):
         raise IOError
 
 
-def to_netcdf(source, destination):
+def to_netcdf(source, destination, workers: int = None):
     if source is None or destination is None:
         raise ValueError
-    t = trace(source=source, decompress=True)
+    t = trace(source=source, decompress=True, workers=workers)
     if t:
         #dates = [datetime.datetime(2001, 1, 1, 15) + datetime.timedelta(hours=i) for i in range(len(t.x))]
         scheme = {
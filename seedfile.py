@@ -1,6 +1,12 @@
-from seed import DataRecord
-from seedio import RecordIterator
+import fnmatch
+import tarfile
+import zipfile
+from typing import Optional
+
+from model import DataRecord
+from seedio import RecordIterator, detect_compression, detect_format, peek
 from timeseries import Timeseries
+from writer import RecordWriter
 
 
 class SeedError(Exception):
@@ -75,13 +81,114 @@ class SeedFile(object):
 
     @classmethod
     def open(cls, name, mode="r", fileobj=None, **kwargs):
-        """Open uncompressed tar archive name for reading or writing.
+        """Open uncompressed tar archive name for reading or writing, a RecordWriter for 'a', 'w' and 'x'.
         """
         if mode not in ("r", "a", "w", "x"):
             raise ValueError("mode must be 'r', 'a', 'w' or 'x'")
+        if mode != "r":
+            return RecordWriter(fileobj if fileobj is not None else name, mode=mode, **kwargs)
         return cls(name, mode, fileobj, **kwargs)
 
 
+class ArchiveIterator(object):
+    """Iterate over the records of every seed member of a tar or zip archive without extracting it.
+
+    Members are read in place through the archive's single file handle, compressed tar archives
+    and gzip, bz2 or xz compressed members included. Members whose name does not match pattern,
+    and members that turn out not to hold seed records, are skipped. Remaining keyword arguments
+    are handed to the RecordIterator of each member.
+    """
+
+    def __init__(self, name=None, fileobj=None, pattern: str = None, **kwargs):
+        if name is None and fileobj is None:
+            raise ValueError('name or fileobj is required')
+        self._pattern = pattern
+        self._kwargs = kwargs
+        self._iterator: Optional[RecordIterator] = None
+        self._member: Optional[str] = None
+        self._closed = False
+        source = fileobj if fileobj is not None else name
+        try:
+            if zipfile.is_zipfile(source):
+                self._archive = zipfile.ZipFile(source)
+                self._members = self._zip_members()
+            else:
+                if fileobj is not None:
+                    fileobj.seek(0)
+                    self._archive = tarfile.open(fileobj=fileobj, mode='r:*')
+                else:
+                    self._archive = tarfile.open(name, mode='r:*')
+                self._members = self._tar_members()
+        except (tarfile.TarError, zipfile.BadZipFile) as e:
+            raise ReadError(f'{name or fileobj} is not a readable tar or zip archive') from e
+
+    @property
+    def member(self) -> Optional[str]:
+        """Name of the member the last record came from."""
+        return self._member
+
+    def _matches(self, name: str) -> bool:
+        return self._pattern is None or fnmatch.fnmatch(name, self._pattern)
+
+    def _zip_members(self):
+        for info in self._archive.infolist():
+            if not info.is_dir() and self._matches(info.filename):
+                yield info.filename, self._archive.open(info)
+
+    def _tar_members(self):
+        for info in self._archive:
+            if info.isfile() and self._matches(info.name):
+                yield info.name, self._archive.extractfile(info)
+
+    def _next_iterator(self) -> bool:
+        for name, member in self._members:
+            member, head = peek(member, 8)
+            if detect_compression(head) is None and detect_format(head) is None:
+                member.close()
+                continue
+            try:
+                self._iterator = RecordIterator(member, **self._kwargs)
+            except ValueError:
+                member.close()
+                continue
+            self._member = name
+            return True
+        return False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> DataRecord:
+        if self._closed:
+            raise StopIteration
+        while True:
+            if self._iterator is None and not self._next_iterator():
+                raise StopIteration
+            try:
+                return next(self._iterator)
+            except StopIteration:
+                self._iterator.close()
+                self._iterator = None
+
+    def close(self):
+        if self._closed:
+            return
+        if self._iterator is not None:
+            self._iterator.close()
+        self._archive.close()
+        self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def iterate_archive(name=None, fileobj=None, pattern: str = None, **kwargs) -> ArchiveIterator:
+    return ArchiveIterator(name=name, fileobj=fileobj, pattern=pattern, **kwargs)
+
+
 def is_seed_file(name):
     """Return True if name points to a seed file that we
        are able to handle, else return False.
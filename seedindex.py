@@ -0,0 +1,295 @@
+import hashlib
+import os
+import struct
+import sys
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Optional
+
+import array
+
+from model import DataRecord
+from selection import Selection, normalize_location
+
+INDEX_SUFFIX = '.idx'
+INDEX_MAGIC = b'SEEDIDX\x00'
+INDEX_VERSION = 2
+
+st_index_header = struct.Struct('<8sHqqiII')
+st_channel = struct.Struct('<HIIq')
+
+
+class SeedIndexError(Exception):
+    """Exception for unreadable or incompatible index files."""
+    pass
+
+
+def index_path(path) -> str:
+    return f'{os.fspath(path)}{INDEX_SUFFIX}'
+
+
+def fingerprint(record: DataRecord) -> int:
+    """64 bit hash of what a record holds, its channel, start time, sample count and rate, encoding and
+    payload, leaving out the sequence number, quality code and flags that differ between copies of it."""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(f'{record.network_code.strip()}.{record.station_code.strip()}.'
+                  f'{record.channel_location_code.strip()}.{record.channel_code.strip()}.{record.start_time_ns}.'
+                  f'{record.number_of_samples}.{record.sample_rate}.{int(record.encoding_format)}.'.encode('ascii'))
+    if record.data is not None:
+        digest.update(record.data)
+    return int.from_bytes(digest.digest(), 'little')
+
+
+def _write_column(file, column: array.array):
+    if sys.byteorder != 'little':
+        column = array.array(column.typecode, column)
+        column.byteswap()
+    column.tofile(file)
+
+
+def _read_column(file, typecode: str, count: int) -> array.array:
+    column = array.array(typecode)
+    column.fromfile(file, count)
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
+
+
+class RecordIndex:
+    """Per-record summary of a seed file that can be queried without parsing the file.
+
+    Rows are grouped by channel and sorted by start time inside each group, every column is stored
+    as a flat little endian array so an index loads with one read per column. The index remembers
+    the size and modification time of the file it describes and is stale once either changes.
+    """
+
+    def __init__(self, file_size: int, mtime_ns: int, record_length: int, channels: list[tuple],
+                 channel_ids: array.array, offsets: array.array, start_times: array.array, end_times: array.array,
+                 sample_counts: array.array, encodings: array.array, ranges: list[tuple] = None,
+                 fingerprints: array.array = None):
+        self._file_size = file_size
+        self._mtime_ns = mtime_ns
+        self._record_length = record_length
+        self._channels = channels
+        self._channel_ids = channel_ids
+        self._offsets = offsets
+        self._start_times = start_times
+        self._end_times = end_times
+        self._sample_counts = sample_counts
+        self._encodings = encodings
+        self._fingerprints = fingerprints if fingerprints is not None else array.array('Q', bytes(8 * len(offsets)))
+        if ranges is None:
+            ranges = list()
+            first: int = 0
+            for channel_id in range(len(channels)):
+                last = bisect_right(channel_ids, channel_id, first)
+                max_duration = 0
+                for row in range(first, last):
+                    max_duration = max(max_duration, end_times[row] - start_times[row])
+                ranges.append((first, last, max_duration))
+                first = last
+        self._ranges = ranges
+
+    @property
+    def file_size(self) -> int:
+        return self._file_size
+
+    @property
+    def mtime_ns(self) -> int:
+        return self._mtime_ns
+
+    @property
+    def record_length(self) -> int:
+        return self._record_length
+
+    @property
+    def channels(self) -> list[tuple]:
+        return self._channels
+
+    @property
+    def channel_ids(self) -> array.array:
+        """Position in channels of the channel of every row."""
+        return self._channel_ids
+
+    @property
+    def offsets(self) -> array.array:
+        return self._offsets
+
+    @property
+    def start_times(self) -> array.array:
+        return self._start_times
+
+    @property
+    def end_times(self) -> array.array:
+        return self._end_times
+
+    @property
+    def sample_counts(self) -> array.array:
+        return self._sample_counts
+
+    @property
+    def encodings(self) -> array.array:
+        return self._encodings
+
+    @property
+    def fingerprints(self) -> array.array:
+        """fingerprint of every record, 0 for indexes built from headers alone."""
+        return self._fingerprints
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def is_valid(self, path) -> bool:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return stat.st_size == self._file_size and stat.st_mtime_ns == self._mtime_ns
+
+    def rows(self, selection: Selection) -> list[int]:
+        """Row numbers matching selection, in file order."""
+        if selection is None:
+            raise ValueError
+        rows = list()
+        for channel_id, (network, station, location, channel) in enumerate(self._channels):
+            if not selection.matches_channel(network, station, location, channel):
+                continue
+            first, last, max_duration = self._ranges[channel_id]
+            if selection.start_ns is not None:
+                first = bisect_left(self._start_times, selection.start_ns - max_duration, first, last)
+            if selection.end_ns is not None:
+                last = bisect_right(self._start_times, selection.end_ns, first, last)
+            for row in range(first, last):
+                if selection.matches_time(self._start_times[row], self._end_times[row]):
+                    rows.append(row)
+        rows.sort(key=lambda r: self._offsets[r])
+        return rows
+
+    def select(self, selection: Selection) -> list[int]:
+        """Byte offsets of the records matching selection, in file order."""
+        return [self._offsets[row] for row in self.rows(selection)]
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            file.write(st_index_header.pack(INDEX_MAGIC, INDEX_VERSION, self._file_size, self._mtime_ns,
+                                            self._record_length, len(self), len(self._channels)))
+            for channel_id, channel in enumerate(self._channels):
+                name = '.'.join(channel).encode('ascii')
+                first, last, max_duration = self._ranges[channel_id]
+                file.write(st_channel.pack(len(name), first, last - first, max_duration))
+                file.write(name)
+            for column in (self._channel_ids, self._offsets, self._start_times, self._end_times,
+                           self._sample_counts, self._encodings, self._fingerprints):
+                _write_column(file, column)
+
+    @classmethod
+    def load(cls, path) -> 'RecordIndex':
+        with open(path, 'rb') as file:
+            b_bytes = file.read(st_index_header.size)
+            if len(b_bytes) != st_index_header.size:
+                raise SeedIndexError(f'{path} is not an index file')
+            magic, version, file_size, mtime_ns, record_length, count, number_of_channels = \
+                st_index_header.unpack(b_bytes)
+            if magic != INDEX_MAGIC:
+                raise SeedIndexError(f'{path} is not an index file')
+            if version != INDEX_VERSION:
+                raise SeedIndexError(f'Unsupported index version {version}, expected {INDEX_VERSION}')
+            channels = list()
+            ranges = list()
+            for i in range(number_of_channels):
+                length, first, rows, max_duration = st_channel.unpack(file.read(st_channel.size))
+                channels.append(tuple(file.read(length).decode('ascii').split('.')))
+                ranges.append((first, first + rows, max_duration))
+            try:
+                return cls(file_size, mtime_ns, record_length, channels,
+                           _read_column(file, 'H', count), _read_column(file, 'q', count),
+                           _read_column(file, 'q', count), _read_column(file, 'q', count),
+                           _read_column(file, 'i', count), _read_column(file, 'B', count), ranges,
+                           _read_column(file, 'Q', count))
+            except EOFError:
+                raise SeedIndexError(f'{path} is truncated')
+
+    @classmethod
+    def from_records(cls, records: Iterable[tuple[int, DataRecord]], file_size: int, mtime_ns: int,
+                     record_length: int) -> 'RecordIndex':
+        """Build an index from (byte offset, record) pairs, records without a payload get no fingerprint."""
+        rows = list()
+        for offset, record in records:
+            channel = (record.network_code.strip(), record.station_code.strip(),
+                       normalize_location(record.channel_location_code), record.channel_code.strip())
+            rows.append((channel, record.start_time_ns, offset, record.end_time_ns, record.number_of_samples,
+                         int(record.encoding_format), fingerprint(record) if record.data is not None else 0))
+        rows.sort()
+        channels = list()
+        channel_ids = array.array('H')
+        offsets = array.array('q')
+        start_times = array.array('q')
+        end_times = array.array('q')
+        sample_counts = array.array('i')
+        encodings = array.array('B')
+        fingerprints = array.array('Q')
+        for channel, start, offset, end, number_of_samples, encoding, record_fingerprint in rows:
+            if not channels or channels[-1] != channel:
+                channels.append(channel)
+            channel_ids.append(len(channels) - 1)
+            offsets.append(offset)
+            start_times.append(start)
+            end_times.append(end)
+            sample_counts.append(number_of_samples)
+            encodings.append(encoding)
+            fingerprints.append(record_fingerprint)
+        return cls(file_size, mtime_ns, record_length, channels, channel_ids, offsets, start_times, end_times,
+                   sample_counts, encodings, fingerprints=fingerprints)
+
+
+def load_index(path) -> Optional[RecordIndex]:
+    """Load the sidecar index of path, None when it is missing, unreadable or stale."""
+    try:
+        index = RecordIndex.load(index_path(path))
+    except (OSError, SeedIndexError):
+        return None
+    if not index.is_valid(path):
+        return None
+    return index
+
+
+class RecordDiff:
+    """Records of a source missing from a target, found only in the target, or held by both with different
+    content, matched on channel and start time. Offsets are byte offsets in their own file."""
+
+    def __init__(self, missing: list[int], extra: list[int], changed: list[tuple[int, int]]):
+        self.missing = missing
+        self.extra = extra
+        self.changed = changed
+
+    def __bool__(self):
+        return bool(self.missing or self.extra or self.changed)
+
+    def __str__(self):
+        return f'missing:{len(self.missing)}, extra:{len(self.extra)}, changed:{len(self.changed)}'
+
+
+def _records_by_key(index: RecordIndex) -> dict:
+    records = dict()
+    for row in range(len(index)):
+        records[(index.channels[index.channel_ids[row]], index.start_times[row])] = \
+            (index.offsets[row], index.fingerprints[row])
+    return records
+
+
+def diff_indexes(source: RecordIndex, target: RecordIndex) -> RecordDiff:
+    """Compare the records of two indexes by channel, start time and fingerprint."""
+    if source is None or target is None:
+        raise ValueError
+    source_records = _records_by_key(source)
+    target_records = _records_by_key(target)
+    missing = list()
+    changed = list()
+    for key, (offset, source_fingerprint) in source_records.items():
+        found = target_records.get(key)
+        if found is None:
+            missing.append(offset)
+        elif found[1] != source_fingerprint or not source_fingerprint:
+            # a record without a fingerprint cannot be compared and is copied again
+            changed.append((offset, found[0]))
+    extra = [offset for key, (offset, target_fingerprint) in target_records.items() if key not in source_records]
+    return RecordDiff(sorted(missing), sorted(extra), sorted(changed))
@@ -1,58 +1,154 @@
+import bz2
+import gzip
+import heapq
+import logging as log
+import lzma
+import mmap
 import os
+import queue
 import re
+import struct
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from io import BufferedReader, BytesIO
 from pathlib import PosixPath
 from typing import Optional
 
 from codec import SteimError, get_decoder
-from model import DecompressedRecord, DataRecord, DataHeader, BlocketteFactory, SeedFormatV2, SeedFormatV3, SeedFormat, \
-    B1000
+from crc import crc32c
+from model import DecompressedRecord, DataRecord, DataHeader, DataHeaderV3, BlocketteFactory, SeedFormatV2, \
+    SeedFormatV3, SeedFormat, B1000
+from seedindex import RecordDiff, RecordIndex, diff_indexes, index_path, load_index
+from selection import QUALITY_CODES, Selection
+
+
+record_header = re.compile(r'^\d{6}[VASTDRQM]')
+data_record_header = re.compile(rb'\d{6}[DRQM]')
+ms3_record_header = re.compile(rb'MS\x03')
+any_record_header = re.compile(rb'\d{6}[DRQM]|MS\x03')
+record_minimum_length = 2 ** 8
+record_preferred_length = 2 ** 12
+record_maximum_length = 2 ** 15
+ms3_record_maximum_length = 10 * 2 ** 20
+DEFAULT_BLOCK_SIZE = 2 ** 20
+COMPRESSION_MAGIC = ((b'\x1f\x8b', 'gzip'), (b'BZh', 'bz2'), (b'\xfd7zXZ\x00', 'xz'))
+# high byte of a big endian year between 1900 and 2600
+BIG_ENDIAN_YEAR_BYTES = bytes(range(7, 11))
+TIME_CORRECTION_APPLIED = 0x02
+
+
+class CorruptRecordError(Exception):
+    """A record that could not be parsed or decoded, reported with the source and byte offset it came from."""
+
+    def __init__(self, name, offset: int, cause: Exception):
+        super().__init__(f'Corrupt record in {name} at byte offset {offset}: {type(cause).__name__}: {cause}')
+        self.name = name
+        self.offset = offset
+        self.cause = cause
+
+
+def log_error(error: CorruptRecordError):
+    log.warning(str(error))
 
 
 class RecordIterator:
-    def __init__(self, source, decompress: bool = False, header_only: bool = False):
+    def __init__(self, source, decompress: bool = False, header_only: bool = False, start=None, end=None,
+                 network: str = None, station: str = None, location: str = None, channel: str = None,
+                 quality: str = None, sample_rate=None, use_index: bool = True, workers: int = None,
+                 chunk_size: int = 64, prefetch: int = None, prefetch_bytes: int = None, tolerant: bool = False,
+                 on_error=log_error, verify_crc: bool = False):
         if not source:
             raise ValueError()
-        if type(source) is str and os.path.isfile(source):
-            source = open(source, "rb")
-        elif isinstance(source, PosixPath):
-            source = open(source, "rb")
-        elif isinstance(source, bytes):
-            source = BufferedReader(BytesIO(source))
-        elif isinstance(source, BytesIO):
-            source = BufferedReader(source)
+        if chunk_size is None or chunk_size < 1:
+            raise ValueError(f'chunk_size must be at least 1 but received {chunk_size}')
+        selection = Selection(start=start, end=end, network=network, station=station, location=location,
+                              channel=channel, quality=quality, sample_rate=sample_rate)
+        self._selection: Optional[Selection] = None if selection.is_empty() else selection
+        offsets = None
+        source, path, name = open_source(source)
+        source, head = peek(source, 8)
+        compression = detect_compression(head)
+        self._compressed_source = None
+        seed_format = None
+        if compression is not None:
+            self._compressed_source = source
+            source = decompressor(source, compression)
         else:
-            raise ValueError("Incorrect source parameters: must be path to file or io.BufferedReader {}", type(source))
-
-        if isinstance(source, BufferedReader):
-            reader = source
+            seed_format = detect_format(head)
+        if path is not None and isinstance(seed_format, SeedFormatV2) and self._selection is not None and use_index \
+                and not tolerant:
+            offsets = open_index(path).select(self._selection)
+        if prefetch and offsets is None:
+            source = PrefetchReader(source, depth=prefetch, max_bytes=prefetch_bytes)
+        self._name = name
+        self._tolerant = tolerant
+        self._on_error = on_error
+        self._decode_errors = 0
+        if tolerant or compression is not None or isinstance(seed_format, SeedFormatV3) or not is_seekable(source):
+            self.parser = StreamParser(source, header_only, selection=self._selection, tolerant=tolerant, name=name,
+                                       on_error=on_error, verify_crc=verify_crc)
         else:
-            reader = BufferedReader(source)
-
-        chunk = reader.read(8)
-        source.seek(0)
-        if SeedFormatV2.RECORD_HEADER.match(chunk.decode('ascii')):
-            self.parser = Parser(SeedFormatV2(), reader, header_only)
-        elif SeedFormatV3.RECORD_HEADER.match(chunk.decode('ascii')):
-            self.parser = Parser(SeedFormatV3(), reader)
-        else:
-            raise ValueError("Invalid Seed format")
+            if isinstance(source, BufferedReader):
+                reader = source
+            else:
+                reader = BufferedReader(source)
+
+            chunk = reader.read(8)
+            reader.seek(0)
+            if isinstance(detect_format(chunk), SeedFormatV2):
+                self.parser = Parser(SeedFormatV2(), reader, header_only, offsets, self._selection)
+            else:
+                raise ValueError("Invalid Seed format")
         self._decompress: bool = decompress
         self._header_only: bool = header_only
         self._record_length = self.parser.record_length
         self._closed = False
-        self._carry_over = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        if workers and workers > 1 and decompress and not header_only:
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+            self._chunk_size = chunk_size
+            self._max_pending = workers * 2
+            self._pending = deque()
+            self._ready = deque()
+            self._exhausted = False
 
     @property
     def record_length(self):
         return self._record_length
 
+    @property
+    def corrupt_records(self) -> int:
+        """Records skipped in tolerant mode, whether they failed to parse or to decode."""
+        return getattr(self.parser, 'corrupt_records', 0) + self._decode_errors
+
+    @property
+    def skipped_bytes(self) -> int:
+        """Bytes passed over in tolerant mode while resynchronizing on the next record header."""
+        return getattr(self.parser, 'skipped_bytes', 0)
+
+    def _report(self, offset: int, cause: Exception):
+        self._decode_errors += 1
+        if self._on_error is not None:
+            self._on_error(CorruptRecordError(self._name, offset, cause))
+
     def close(self):
         if self.parser:
             try:
                 self.parser.close()
             except:
                 pass
+        if self._compressed_source is not None:
+            try:
+                self._compressed_source.close()
+            except:
+                pass
+        if self._executor is not None:
+            for records, future in self._pending:
+                future.cancel()
+            self._pending.clear()
+            self._executor.shutdown(wait=True)
+            self._executor = None
         self._closed = True
 
     def __iter__(self):
@@ -61,16 +157,302 @@ class RecordIterator:
     def __next__(self):
         if not self.parser or self._closed:
             return None
-        record = self.parser.next_record()
-        if not record:
+        if self._executor is not None:
+            return self._next_decoded()
+        while True:
+            record = self.parser.next_record()
+            if not record:
+                raise StopIteration
+            if self._header_only or not self._decompress:
+                return record
+            if not self._tolerant:
+                return to_decompressed_record(record, decode_record_data(record.encoding_format, record.byte_order,
+                                                                         record.number_of_samples, record.data))
+            try:
+                return to_decompressed_record(record, decode_record_data(record.encoding_format, record.byte_order,
+                                                                         record.number_of_samples, record.data))
+            except Exception as e:
+                self._report(self.parser.record_offset, e)
+
+    def _next_decoded(self):
+        """Records whose payloads were decoded by the process pool, in record order.
+
+        Headers are parsed here and payloads leave in chunks of chunk_size records; at most
+        workers * 2 chunks are in flight and they are collected in submission order, which
+        bounds the memory held by chunks that finish early.
+        """
+        while not self._ready:
+            self._submit()
+            if not self._pending:
+                raise StopIteration
+            records, future = self._pending.popleft()
+            for (record, offset), samples in zip(records, future.result()):
+                if isinstance(samples, Exception):
+                    self._report(offset, samples)
+                else:
+                    self._ready.append(to_decompressed_record(record, samples))
+            self._submit()
+        return self._ready.popleft()
+
+    def _submit(self):
+        while not self._exhausted and len(self._pending) < self._max_pending:
+            records = list()
+            while len(records) < self._chunk_size:
+                record = self.parser.next_record()
+                if not record:
+                    self._exhausted = True
+                    break
+                records.append((record, getattr(self.parser, 'record_offset', None)))
+            if not records:
+                return
+            payloads = [(record.encoding_format, record.byte_order, record.number_of_samples, record.data)
+                        for record, offset in records]
+            self._pending.append((records, self._executor.submit(decode_chunk, payloads, self._tolerant)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class PrefetchReader:
+    """A read-only, non-seekable view of source that a background thread reads ahead of the consumer.
+
+    The thread fills blocks of block_size bytes from a fixed pool of depth buffers, so no more than
+    depth blocks (and never more than max_bytes) are held at once. Reads release the GIL, which lets
+    disk or network latency overlap with parsing and decoding in the consuming thread.
+    """
+
+    def __init__(self, source, block_size: int = DEFAULT_BLOCK_SIZE, depth: int = 4, max_bytes: int = None):
+        if source is None:
+            raise ValueError
+        if depth is None or depth < 1:
+            raise ValueError(f'depth must be at least 1 but received {depth}')
+        if max_bytes is not None:
+            if max_bytes < 2 * record_maximum_length:
+                raise ValueError(f'max_bytes must be at least {2 * record_maximum_length} but received {max_bytes}')
+            block_size = min(block_size, max_bytes // 2)
+            depth = max(1, min(depth, max_bytes // block_size - 1))
+        self._source = source
+        self._readinto = getattr(source, 'readinto', None)
+        self._free = queue.Queue()
+        self._full = queue.Queue()
+        for i in range(depth + 1):
+            self._free.put(bytearray(block_size))
+        self._block: Optional[bytearray] = None
+        self._position = 0
+        self._length = 0
+        self._eof = False
+        self._stopped = threading.Event()
+        self.closed = False
+        self._thread = threading.Thread(target=self._run, name='seed-prefetch', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                block = self._free.get()
+                if block is None:
+                    return
+                length = 0
+                view = memoryview(block)
+                while length < len(block):
+                    if self._readinto is not None:
+                        count = self._readinto(view[length:])
+                    else:
+                        b_bytes = self._source.read(len(block) - length)
+                        count = len(b_bytes) if b_bytes else 0
+                        view[length:length + count] = b_bytes or b''
+                    if not count:
+                        break
+                    length += count
+                view.release()
+                self._full.put((block, length))
+                if length < len(block):
+                    self._full.put((None, 0))
+                    return
+        except BaseException as e:
+            self._full.put((e, 0))
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def readinto(self, b) -> int:
+        while self._position >= self._length:
+            if self._eof:
+                return 0
+            if self._block is not None:
+                self._free.put(self._block)
+                self._block = None
+            block, length = self._full.get()
+            if isinstance(block, BaseException):
+                self._eof = True
+                raise block
+            if block is None:
+                self._eof = True
+                return 0
+            self._block, self._position, self._length = block, 0, length
+        count = min(len(b), self._length - self._position)
+        b[0:count] = self._block[self._position:self._position + count]
+        self._position += count
+        return count
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            chunks = list()
+            while True:
+                chunk = self.read(DEFAULT_BLOCK_SIZE)
+                if not chunk:
+                    return b''.join(chunks)
+                chunks.append(chunk)
+        b_bytes = bytearray(size)
+        count = self.readinto(b_bytes)
+        return bytes(b_bytes[0:count])
+
+    def close(self):
+        if self.closed:
+            return
+        self._stopped.set()
+        self._free.put(None)
+        while self._thread.is_alive():
+            try:
+                self._full.get(timeout=0.1)
+            except queue.Empty:
+                pass
+            self._free.put(None)
+        try:
+            self._source.close()
+        except:
+            pass
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class MergeIterator:
+    """Records of several sources in (network, station, location, channel, start time) order.
+
+    Every source must already be in that order, as single channel files written in time order are,
+    and only the next record of each source is held in memory. Records repeated with an identical
+    header and payload, within or across sources, are yielded once and counted in duplicates.
+    Remaining keyword arguments, such as channel or time window filters, go to the RecordIterator
+    of every source.
+    """
+
+    def __init__(self, sources, decompress: bool = False, **kwargs):
+        if sources is None:
+            raise ValueError
+        self._decompress = decompress
+        self._iterators = list()
+        self._heap = list()
+        self._key = None
+        self._seen = set()
+        self.duplicates = 0
+        self._closed = False
+        try:
+            for source in sources:
+                self._iterators.append(RecordIterator(source, **kwargs))
+        except BaseException:
+            self.close()
+            raise
+        for position in range(len(self._iterators)):
+            self._advance(position)
+
+    def _advance(self, position: int):
+        record = next(self._iterators[position], None)
+        if record is not None:
+            heapq.heappush(self._heap, (merge_key(record), position, record))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while self._heap and not self._closed:
+            key, position, record = heapq.heappop(self._heap)
+            self._advance(position)
+            if key != self._key:
+                self._key = key
+                self._seen.clear()
+            identity = (tuple(sorted(vars(record.header).items())), record.data)
+            if identity in self._seen:
+                self.duplicates += 1
+                continue
+            self._seen.add(identity)
+            if self._decompress:
+                return to_decompressed_record(record, decode_record_data(record.encoding_format, record.byte_order,
+                                                                         record.number_of_samples, record.data))
+            return record
+        raise StopIteration
+
+    def close(self):
+        for iterator in self._iterators:
+            try:
+                iterator.close()
+            except:
+                pass
+        self._heap.clear()
+        self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def merge_key(record: DataRecord) -> tuple:
+    return (record.network_code.strip(), record.station_code.strip(), record.channel_location_code.strip(),
+            record.channel_code.strip(), record.start_time_ns)
+
+
+class RawRecordIterator:
+    """(DataHeader or DataHeaderV3, record bytes) of every record of source, only the header is parsed.
+
+    The bytes are a view into the read buffer that stays valid until the next record is requested,
+    so they must be written or copied before that.
+    """
+
+    def __init__(self, source, block_size: int = DEFAULT_BLOCK_SIZE):
+        if not source:
+            raise ValueError()
+        source, path, name = open_source(source)
+        source, head = peek(source, 6)
+        compression = detect_compression(head)
+        self._compressed_source = None
+        if compression is not None:
+            self._compressed_source = source
+            source = decompressor(source, compression)
+        self.parser = StreamParser(source, header_only=True, block_size=block_size)
+        self.name = name
+
+    @property
+    def record_length(self):
+        return self.parser.record_length
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> tuple:
+        b_bytes = self.parser.next_raw()
+        if b_bytes is None:
             raise StopIteration
-        if not self._header_only and self._decompress:
-            samples = get_decoder(encoding_format=record.encoding_format, byte_order=record.byte_order). \
-                decode(data=record.data, carry_over=self._carry_over,
-                       expected_number_of_samples=record.number_of_samples)
-            self._carry_over = samples[-1]
-            record = DecompressedRecord(header=record.header, sample_rate=record.sample_rate, samples=samples)
-        return record
+        return parse_header(b_bytes), b_bytes
+
+    def close(self):
+        self.parser.close()
+        if self._compressed_source is not None:
+            try:
+                self._compressed_source.close()
+            except:
+                pass
 
     def __enter__(self):
         return self
@@ -79,9 +461,53 @@ class RecordIterator:
         self.close()
 
 
+def open_raw_records(source, block_size: int = DEFAULT_BLOCK_SIZE) -> RawRecordIterator:
+    return RawRecordIterator(source, block_size=block_size)
+
+
+def open_source(source) -> tuple:
+    """(readable stream, path or None, name) of a path, bytes, BytesIO or readable object."""
+    if (type(source) is str and os.path.isfile(source)) or isinstance(source, PosixPath):
+        return open(source, "rb"), source, os.fspath(source)
+    if isinstance(source, bytes):
+        return BufferedReader(BytesIO(source)), None, '<bytes>'
+    if isinstance(source, BytesIO):
+        return BufferedReader(source), None, '<stream>'
+    if hasattr(source, 'read'):
+        return source, None, getattr(source, 'name', '<stream>')
+    raise ValueError("Incorrect source parameters: must be path to file or io.BufferedReader {}", type(source))
+
+
+def decode_record_data(encoding_format, byte_order, number_of_samples: int, data: bytes):
+    """Decode one record payload, every Steim record carries its own forward integration constant."""
+    return get_decoder(encoding_format=encoding_format, byte_order=byte_order). \
+        decode(data=data, expected_number_of_samples=number_of_samples)
+
+
+def decode_chunk(payloads: list[tuple], tolerant: bool = False) -> list:
+    """Decode a chunk of payloads, in tolerant mode a payload that fails is returned as its exception."""
+    if not tolerant:
+        return [decode_record_data(*payload) for payload in payloads]
+    decoded = list()
+    for payload in payloads:
+        try:
+            decoded.append(decode_record_data(*payload))
+        except Exception as e:
+            decoded.append(e)
+    return decoded
+
+
+def to_decompressed_record(record: DataRecord, samples) -> DecompressedRecord:
+    decompressed = DecompressedRecord(header=record.header, sample_rate=record.sample_rate, samples=samples)
+    for blockette in record.blockettes:
+        decompressed.append(blockette)
+    return decompressed
+
+
 class Parser:
 
-    def __init__(self, seed_format: SeedFormat, reader: BufferedReader, header_only: bool = False):
+    def __init__(self, seed_format: SeedFormat, reader: BufferedReader, header_only: bool = False,
+                 offsets: list[int] = None, selection: Selection = None):
         if seed_format is None:
             raise ValueError
         if reader is None:
@@ -91,6 +517,9 @@ class Parser:
         self.closed = False
         self._header_only = header_only
         self._record_length = get_record_length(reader)
+        self._offsets = offsets
+        self._next_offset: int = 0
+        self._selection = selection
 
     @property
     def record_length(self):
@@ -100,24 +529,275 @@ class Parser:
         return self.reader.tell()
 
     def next_record(self) -> Optional[DataRecord]:
-        b_bytes = self.reader.read(self._record_length)
-        if b_bytes is None or len(b_bytes) == 0:
+        while True:
+            if self._offsets is not None:
+                if self._next_offset >= len(self._offsets):
+                    return None
+                offset = self._offsets[self._next_offset]
+                self._next_offset += 1
+                if self.reader.tell() != offset:
+                    self.reader.seek(offset)
+            b_bytes = self.reader.read(self._record_length)
+            if b_bytes is None or len(b_bytes) == 0:
+                return None
+            record = parse_record(b_bytes, self._header_only, self._selection)
+            if record is not None:
+                return record
+
+    def close(self):
+        if self.reader:
+            try:
+                self.reader.close()
+            except:
+                pass
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class StreamParser:
+    """Parses records from any readable object without ever seeking it.
+
+    The source is read with ``readinto`` in blocks of ``block_size`` bytes into one reusable buffer.
+    Every complete record in a block is parsed before the next read, and the partial record left at
+    the end of a block is moved to the front of the buffer to be completed by the next read.
+
+    miniSEED 3 records are variable length, the length of each is read from its fixed header and the
+    buffer grows when a record does not fit. verify_crc checks the CRC-32C of every miniSEED 3 record.
+
+    In tolerant mode a record that fails to parse is reported to on_error and counted, and parsing
+    resumes at the next position in the stream holding a data record header that parses.
+    """
+
+    def __init__(self, reader, header_only: bool = False, block_size: int = DEFAULT_BLOCK_SIZE,
+                 selection: Selection = None, tolerant: bool = False, name='<stream>', on_error=log_error,
+                 verify_crc: bool = False):
+        if reader is None:
+            raise ValueError
+        if block_size is None or block_size < record_maximum_length + 8:
+            raise ValueError(f'block_size must be at least {record_maximum_length + 8} bytes')
+        self.reader = reader
+        self.closed = False
+        self._header_only = header_only
+        self._selection = selection
+        self._verify_crc = verify_crc
+        self._readinto = getattr(reader, 'readinto', None)
+        self._buffer = bytearray(block_size)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+        self._offset = 0
+        self._eof = False
+        self._tolerant = tolerant
+        self._name = name
+        self._on_error = on_error
+        self._header_pattern = any_record_header
+        self.record_offset: Optional[int] = None
+        self.corrupt_records = 0
+        self.skipped_bytes = 0
+        self._fill(8)
+        chunk = bytes(self._view[0:8])
+        if tolerant and detect_format(chunk) is None:
+            self._record_length = record_maximum_length
+            self._report(0, SyntaxError('Invalid record header [{}]'.format(chunk)))
+            self._resync(1)
+            chunk = bytes(self._view[self._start:self._start + 8])
+        self.seed_format = detect_format(chunk)
+        if isinstance(self.seed_format, SeedFormatV2):
+            self._header_pattern = data_record_header
+            self._record_length = self._find_record_length()
+        elif isinstance(self.seed_format, SeedFormatV3):
+            self._header_pattern = ms3_record_header
+            self._record_length = None
+        else:
+            raise ValueError("Invalid Seed format")
+
+    @property
+    def record_length(self):
+        """Length of every record of a miniSEED 2 stream, None for miniSEED 3 where it varies."""
+        return self._record_length
+
+    def byte_offset(self):
+        return self._offset + self._start
+
+    def _find_record_length(self) -> int:
+        """Record length of a miniSEED 2 stream, from the B1000 of its first record or, without one, from
+        where the second record starts. Only as much of the stream is read as that takes."""
+        while True:
+            head = self._view[self._start:self._end]
+            try:
+                b1000 = parse_record(bytes(head), header_only=True).blockette(1000)
+                if b1000 is not None and b1000.data_record_length:
+                    return 2 ** b1000.data_record_length
+            except Exception:
+                pass
+            try:
+                return find_record_length(head, eof=self._eof)
+            except SyntaxError:
+                if self._eof or self._end - self._start >= len(self._buffer):
+                    raise
+            self._fill(self._end - self._start + 1)
+
+    def _length_at(self, position: int) -> Optional[int]:
+        """Length of the record at buffer position, None while its fixed header is not completely buffered."""
+        if self._buffer[position:position + 3] != b'MS\x03':
+            return self._record_length
+        if self._end - position < DataHeaderV3.LENGTH:
             return None
-        header = DataHeader.from_bytes(b_bytes)
-        record = DataRecord(header)
-        offset = header.first_blockette
-        for i in range(0, header.number_of_blockettes_that_follow):
-            blockette = BlocketteFactory.create(b_bytes, header.byte_order, offset)
-            offset = blockette.next_blockette_byte_number
-            record.append(blockette)
-        b1000: B1000 = record.blockette(1000)
-        if b1000 is None:
-            raise SteimError(f'Record has no blockette of type 1000, b1000 is required.')
-        if not self._header_only:
-            #record.data = numpy.frombuffer(b_bytes[header.beginning_of_data: self._record_length],
-             #                              dtype='>i' if header.byte_order == ByteOrder.BIG_ENDIAN else '<i')
-            record.data = b_bytes[header.beginning_of_data: self._record_length]
-        return record
+        return DataHeaderV3.length_of(self._view[position:position + DataHeaderV3.LENGTH])
+
+    def _next_length(self) -> int:
+        """Length of the record at the read position, filling the buffer until it is complete or the stream
+        ends, 0 at the end of the stream."""
+        length = self._length_at(self._start)
+        while (length is None or self._end - self._start < length) and not self._eof:
+            self._fill(length or DataHeaderV3.LENGTH)
+            length = self._length_at(self._start)
+        if self._end == self._start:
+            return 0
+        if length is None:
+            return DataHeaderV3.LENGTH
+        if length > ms3_record_maximum_length:
+            raise SyntaxError(f'Record length {length} at byte offset {self.byte_offset()} exceeds '
+                              f'{ms3_record_maximum_length} bytes')
+        return length
+
+    def next_raw(self) -> Optional[memoryview]:
+        """The bytes of the next record, unparsed, as a view into the read buffer that stays valid
+        until the next call."""
+        length = self._next_length()
+        if length == 0:
+            return None
+        available = self._end - self._start
+        if available < length:
+            raise IOError(f'Truncated record at byte offset {self.byte_offset()}, '
+                          f'expected {length} bytes but received {available}')
+        start = self._start
+        self.record_offset = self._offset + start
+        self._start += length
+        return self._view[start:self._start]
+
+    def next_record(self) -> Optional[DataRecord]:
+        while True:
+            if not self._tolerant:
+                length = self._next_length()
+            else:
+                try:
+                    length = self._next_length()
+                except SyntaxError as e:
+                    self._report(self.byte_offset(), e)
+                    self._resync(self._start + 1)
+                    continue
+            if length == 0:
+                return None
+            available = self._end - self._start
+            if available < length:
+                error = IOError(f'Truncated record at byte offset {self.byte_offset()}, '
+                                f'expected {length} bytes but received {available}')
+                if not self._tolerant:
+                    raise error
+                self._report(self.byte_offset(), error)
+                self._start = self._end
+                return None
+            start = self._start
+            self.record_offset = self._offset + start
+            self._start += length
+            if not self._tolerant:
+                record = parse_record(self._view[start:self._start], self._header_only, self._selection,
+                                      self._verify_crc)
+            else:
+                try:
+                    record = parse_record(self._view[start:self._start], self._header_only, self._selection,
+                                          self._verify_crc)
+                except Exception as e:
+                    self._report(self.record_offset, e)
+                    self._resync(start + 1)
+                    continue
+            if record is not None:
+                return record
+
+    def _report(self, offset: int, cause: Exception):
+        self.corrupt_records += 1
+        if self._on_error is not None:
+            self._on_error(CorruptRecordError(self._name, offset, cause))
+
+    def _resync(self, position: int):
+        """Move to the next data record header at or after buffer position that parses, or to the end."""
+        self._start = position
+        while True:
+            match = self._header_pattern.search(self._buffer, self._start, self._end)
+            if match is None:
+                keep = 0 if self._eof else min(self._end - self._start, 6)
+                self.skipped_bytes += self._end - self._start - keep
+                self._start = self._end - keep
+                if self._eof:
+                    return
+                self._fill()
+                continue
+            candidate = match.start()
+            self.skipped_bytes += candidate - self._start
+            self._start = candidate
+            length = self._length_at(candidate)
+            if length is not None and length <= ms3_record_maximum_length:
+                if self._end - candidate < length and not self._eof:
+                    self._fill(length)
+                    continue
+                if self._is_plausible(candidate, length):
+                    return
+            elif length is None and not self._eof:
+                self._fill()
+                continue
+            self.skipped_bytes += 1
+            self._start = candidate + 1
+
+    def _is_plausible(self, position: int, length: int) -> bool:
+        try:
+            parse_record(self._view[position:position + length], header_only=True)
+        except Exception:
+            return False
+        return True
+
+    def _fill(self, length: int = 0):
+        """Move the unread bytes to the front of the buffer, growing it to hold length bytes, and read
+        until it holds length unread bytes, at least one read's worth, or the stream ends.
+
+        Pipes and sockets return short reads, so whatever has arrived is handed back to the caller to parse
+        instead of waiting for the whole buffer to fill."""
+        remaining = self._end - self._start
+        if length > len(self._buffer):
+            buffer = bytearray(max(length, 2 * len(self._buffer)))
+            buffer[0:remaining] = self._buffer[self._start:self._end]
+            self._buffer = buffer
+            self._view = memoryview(buffer)
+            self._offset += self._start
+            self._start = 0
+            self._end = remaining
+        elif self._start > 0:
+            self._buffer[0:remaining] = self._buffer[self._start:self._end]
+            self._offset += self._start
+            self._start = 0
+            self._end = remaining
+        capacity = len(self._buffer)
+        wanted = min(max(length, remaining + 1), capacity)
+        while self._end < wanted and not self._eof:
+            count = self._read_into(self._view[self._end:capacity])
+            if not count:
+                self._eof = True
+            else:
+                self._end += count
+
+    def _read_into(self, view: memoryview) -> int:
+        if self._readinto is not None:
+            return self._readinto(view)
+        b_bytes = self.reader.read(len(view))
+        if not b_bytes:
+            return 0
+        view[0:len(b_bytes)] = b_bytes
+        return len(b_bytes)
 
     def close(self):
         if self.reader:
@@ -134,6 +814,393 @@ class Parser:
         self.close()
 
 
+def parse_record(b_bytes, header_only: bool = False, selection: Selection = None,
+                 verify_crc: bool = False) -> Optional[DataRecord]:
+    """Parse one record from bytes or a memoryview over a larger buffer.
+
+    When a selection is given it is checked as soon as the fixed header and then the blockettes are
+    parsed, a record that does not match returns None before its payload is copied. miniSEED 3 records
+    are recognized by their first bytes, verify_crc checks their CRC-32C and applies to them only.
+    """
+    if b_bytes[0:3] == b'MS\x03':
+        return parse_record_v3(b_bytes, header_only, selection, verify_crc)
+    if isinstance(b_bytes, bytes):
+        header = DataHeader.from_bytes(b_bytes)
+    else:
+        header = DataHeader.from_bytes(bytes(b_bytes[0:48]))
+    if selection is not None and not selection.matches_header(header):
+        return None
+    if not isinstance(b_bytes, bytes):
+        end_of_header = header.beginning_of_data if header.beginning_of_data and header.beginning_of_data > 48 \
+            else len(b_bytes)
+        head = bytes(b_bytes[0:end_of_header])
+    else:
+        head = b_bytes
+    record = DataRecord(header)
+    offset = header.first_blockette
+    for i in range(0, header.number_of_blockettes_that_follow):
+        blockette = BlocketteFactory.create(head, header.byte_order, offset)
+        offset = blockette.next_blockette_byte_number
+        record.append(blockette)
+    b1000: B1000 = record.blockette(1000)
+    if b1000 is None:
+        raise SteimError(f'Record has no blockette of type 1000, b1000 is required.')
+    if selection is not None and not selection.matches(record):
+        return None
+    if not header_only:
+        #record.data = numpy.frombuffer(b_bytes[header.beginning_of_data: self._record_length],
+         #                              dtype='>i' if header.byte_order == ByteOrder.BIG_ENDIAN else '<i')
+        record.data = bytes(b_bytes[header.beginning_of_data: len(b_bytes)])
+    return record
+
+
+def parse_record_v3(b_bytes, header_only: bool = False, selection: Selection = None,
+                    verify_crc: bool = False) -> Optional[DataRecord]:
+    """Parse one miniSEED 3 record, the fixed header is unpacked in place from a memoryview and only
+    the source identifier, the extra headers and, unless header_only, the payload are copied."""
+    header = DataHeaderV3.from_bytes(b_bytes)
+    length = header.record_length
+    if len(b_bytes) < length:
+        raise IOError(f'Truncated record, expected {length} bytes but received {len(b_bytes)}')
+    if selection is not None and not selection.matches_header(header):
+        return None
+    record = DataRecord(header)
+    if selection is not None and not selection.matches(record):
+        return None
+    if verify_crc:
+        crc = record_crc(memoryview(b_bytes)[0:length])
+        if crc != header.crc:
+            raise ValueError(f'CRC mismatch, the record holds {header.crc:#010x} but its bytes give {crc:#010x}')
+    if not header_only:
+        record.data = bytes(b_bytes[header.beginning_of_data:length])
+    return record
+
+
+def parse_header(b_bytes):
+    """The DataHeader or DataHeaderV3 at the start of a record."""
+    if b_bytes[0:3] == b'MS\x03':
+        return DataHeaderV3.from_bytes(b_bytes)
+    return DataHeader.from_bytes(bytes(b_bytes[0:48]))
+
+
+def record_crc(b_bytes) -> int:
+    """CRC-32C of a miniSEED 3 record, computed with its CRC field as zero."""
+    view = memoryview(b_bytes)
+    crc = crc32c(view[0:DataHeaderV3.CRC_OFFSET])
+    crc = crc32c(bytes(4), crc)
+    return crc32c(view[DataHeaderV3.CRC_OFFSET + 4:], crc)
+
+
+def detect_format(head) -> Optional[SeedFormat]:
+    """The format of the record starting head, None when no record starts there."""
+    text = bytes(head[0:8]).decode('latin-1')
+    if SeedFormatV2.RECORD_HEADER.match(text):
+        return SeedFormatV2()
+    if SeedFormatV3.RECORD_HEADER.match(text):
+        return SeedFormatV3()
+    return None
+
+
+def detect_compression(head: bytes) -> Optional[str]:
+    for magic, compression in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def peek(source, size: int) -> tuple:
+    """Return (source, the first size bytes of source) without consuming them, wrapping a
+    non-seekable raw stream in a BufferedReader when that is the only way to look ahead."""
+    if hasattr(source, 'peek'):
+        return source, source.peek(size)[0:size]
+    if is_seekable(source):
+        position = source.tell()
+        head = source.read(size)
+        source.seek(position)
+        return source, head
+    if hasattr(source, 'readinto'):
+        source = BufferedReader(source)
+        return source, source.peek(size)[0:size]
+    return source, b''
+
+
+def decompressor(source, compression: str):
+    """A stream of the decompressed bytes of source, closing it leaves source open."""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=source, mode='rb')
+    if compression == 'bz2':
+        return bz2.BZ2File(source, mode='rb')
+    if compression == 'xz':
+        return lzma.LZMAFile(source, mode='rb')
+    raise ValueError(f'Unsupported compression {compression}')
+
+
+def is_compressed(path) -> bool:
+    with open(path, "rb") as file:
+        return detect_compression(file.read(6)) is not None
+
+
+def is_seekable(source) -> bool:
+    try:
+        return source.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+
+def build_index(path) -> RecordIndex:
+    stat = os.stat(path)
+    with Parser(SeedFormatV2(), open(path, "rb")) as parser:
+        def records():
+            while True:
+                offset = parser.byte_offset()
+                record = parser.next_record()
+                if record is None:
+                    return
+                yield offset, record
+
+        return RecordIndex.from_records(records(), stat.st_size, stat.st_mtime_ns, parser.record_length)
+
+
+def open_index(path, rebuild: bool = False) -> RecordIndex:
+    """Return the sidecar index of path, building and saving it when it is missing or stale.
+    A read-only archive still gets an index, it is simply not persisted."""
+    index = None if rebuild else load_index(path)
+    if index is None:
+        index = build_index(path)
+        try:
+            index.save(index_path(path))
+        except OSError:
+            pass
+    return index
+
+
+def diff(source, target) -> RecordDiff:
+    """Records of source missing from, only in, or changed in target, compared through their indexes."""
+    return diff_indexes(open_index(source), open_index(target))
+
+
+def sync(source, target) -> RecordDiff:
+    """Bring target up to date with source by copying only the records that differ.
+
+    Changed records are overwritten in place and missing records are appended, records found only
+    in target are left alone. Both files must use the same record length.
+    """
+    source_index = open_index(source)
+    target_index = open_index(target)
+    if source_index.record_length != target_index.record_length:
+        raise ValueError(f'Record lengths differ, {source_index.record_length} and {target_index.record_length}')
+    difference = diff_indexes(source_index, target_index)
+    record_length = source_index.record_length
+    with open(source, 'rb') as reader, open(target, 'r+b') as writer:
+        for source_offset, target_offset in difference.changed:
+            reader.seek(source_offset)
+            writer.seek(target_offset)
+            writer.write(reader.read(record_length))
+        writer.seek(0, os.SEEK_END)
+        for source_offset in difference.missing:
+            reader.seek(source_offset)
+            writer.write(reader.read(record_length))
+    return difference
+
+
+def cut(source, output, start=None, end=None, network: str = None, station: str = None, location: str = None,
+        channel: str = None, quality: str = None) -> int:
+    """Copy the records of source overlapping the criteria to output, byte for byte, nothing is decoded.
+
+    Records are chosen by their header times, so the first and last ones may hold samples outside
+    the window. A file source is read through its record index and the runs of adjacent records are
+    copied by the kernel, with copy_file_range or sendfile, when output is a file too. output is a
+    path or a writable binary object, returns the number of records copied.
+    """
+    selection = Selection(start=start, end=end, network=network, station=station, location=location,
+                          channel=channel, quality=quality)
+    if isinstance(output, (str, PosixPath)):
+        with open(output, 'wb') as file:
+            return cut(source, file, start=start, end=end, network=network, station=station, location=location,
+                       channel=channel, quality=quality)
+    if not ((type(source) is str and os.path.isfile(source)) or isinstance(source, PosixPath)) or \
+            is_compressed(source):
+        count = 0
+        with RawRecordIterator(source) as records:
+            for header, b_bytes in records:
+                if selection.matches_header(header) and parse_record(b_bytes, True, selection) is not None:
+                    output.write(b_bytes)
+                    count += 1
+        return count
+    index = open_index(source)
+    offsets = index.select(selection) if not selection.is_empty() else sorted(index.offsets)
+    record_length = index.record_length
+    runs = list()
+    for offset in offsets:
+        if runs and runs[-1][0] + runs[-1][1] == offset:
+            runs[-1][1] += record_length
+        else:
+            runs.append([offset, record_length])
+    with open(source, 'rb') as reader:
+        for offset, length in runs:
+            copy_range(reader, output, offset, length)
+    return len(offsets)
+
+
+def copy_range(reader, output, offset: int, length: int):
+    """Copy length bytes of the file reader from offset to the current position of output."""
+    try:
+        output_fd = output.fileno()
+    except (AttributeError, OSError, ValueError):
+        output_fd = None
+    if output_fd is not None:
+        output.flush()
+        reader_fd = reader.fileno()
+        use_copy_file_range = hasattr(os, 'copy_file_range')
+        while length > 0:
+            try:
+                if use_copy_file_range:
+                    count = os.copy_file_range(reader_fd, output_fd, length, offset)
+                else:
+                    count = os.sendfile(output_fd, reader_fd, offset, length)
+            except OSError:
+                if not use_copy_file_range:
+                    break
+                # copy_file_range needs two regular files on one kernel supported file system
+                use_copy_file_range = False
+                continue
+            if count <= 0:
+                break
+            offset += count
+            length -= count
+        if is_seekable(output):
+            output.seek(os.lseek(output_fd, 0, os.SEEK_CUR))
+    reader.seek(offset)
+    while length > 0:
+        b_bytes = reader.read(min(length, DEFAULT_BLOCK_SIZE))
+        if not b_bytes:
+            raise IOError(f'Unexpected end of file at byte offset {offset}')
+        output.write(b_bytes)
+        offset += len(b_bytes)
+        length -= len(b_bytes)
+
+
+def rewrite_headers(path, start=None, end=None, network: str = None, station: str = None, location: str = None,
+                    channel: str = None, quality: str = None, new_network: str = None, new_station: str = None,
+                    new_location: str = None, new_channel: str = None, new_quality: str = None,
+                    time_correction: int = None, correction_applied: bool = None, encoding_format: int = None,
+                    timing_quality: int = None, dry_run: bool = False) -> int:
+    """Rewrite header fields of the records of path matching the criteria, in place, and return their number.
+
+    Codes and the quality code are replaced, time_correction (in units of 0.0001 seconds) is written and
+    correction_applied sets or clears the activity flag telling readers the correction is already in
+    the start time. encoding_format and timing_quality go to blockettes 1000 and 1001. Payloads are
+    never touched. The file is mapped writable and every field is written across a run of adjacent
+    records with one strided slice assignment. With dry_run nothing is written.
+    """
+    patches = list()
+    for value, position, length in ((new_network, 18, 2), (new_station, 8, 5), (new_location, 13, 2),
+                                    (new_channel, 15, 3)):
+        if value is None:
+            continue
+        value = '' if value == '--' else value
+        if len(value) > length:
+            raise ValueError(f'Expected at most {length} characters but received {value}')
+        patches.append((position, value.ljust(length).encode('ascii')))
+    if new_quality is not None:
+        if len(new_quality) != 1 or new_quality.upper() not in QUALITY_CODES:
+            raise ValueError(f'Invalid quality code {new_quality}, expected one of {QUALITY_CODES}')
+        patches.append((6, new_quality.upper().encode('ascii')))
+    if timing_quality is not None and not 0 <= timing_quality <= 100:
+        raise ValueError(f'Expected a timing quality between 0 and 100 but received {timing_quality}')
+    selection = Selection(start=start, end=end, network=network, station=station, location=location,
+                          channel=channel, quality=quality)
+    record_length = get_record_length(path)
+    if selection.is_empty():
+        runs = [(0, os.path.getsize(path) // record_length)] if os.path.getsize(path) else []
+    else:
+        runs = list()
+        for offset in open_index(path).select(selection):
+            if runs and runs[-1][0] + runs[-1][1] * record_length == offset:
+                runs[-1] = (runs[-1][0], runs[-1][1] + 1)
+            else:
+                runs.append((offset, 1))
+    count = sum(run[1] for run in runs)
+    if dry_run or count == 0:
+        return count
+    flags = None
+    if correction_applied is not None:
+        flags = bytes(i | TIME_CORRECTION_APPLIED if correction_applied else i & ~TIME_CORRECTION_APPLIED
+                      for i in range(256))
+    with open(path, 'r+b') as file, mmap.mmap(file.fileno(), 0) as mapped:
+        for offset, number_of_records in runs:
+            end_of_run = offset + number_of_records * record_length
+            for position, value in patches:
+                for i, byte in enumerate(value):
+                    mapped[offset + position + i:end_of_run:record_length] = bytes((byte,)) * number_of_records
+            if flags is not None:
+                column = slice(offset + 36, end_of_run, record_length)
+                mapped[column] = mapped[column].translate(flags)
+            if time_correction is not None or encoding_format is not None or timing_quality is not None:
+                _rewrite_ordered_fields(mapped, offset, number_of_records, record_length, time_correction,
+                                        encoding_format, timing_quality)
+        mapped.flush()
+    return count
+
+
+def _uniform(mapped, offset: int, end: int, record_length: int, position: int, length: int) -> bool:
+    """True when bytes position to position + length are the same in every record from offset to end."""
+    for i in range(position, position + length):
+        column = mapped[offset + i:end:record_length]
+        if column.count(column[0:1]) != len(column):
+            return False
+    return True
+
+
+def _rewrite_ordered_fields(mapped, offset: int, number_of_records: int, record_length: int, time_correction: int,
+                            encoding_format: int, timing_quality: int):
+    """Write the fields whose place or encoding depends on the byte order and blockette layout of a record,
+    across the whole run when the run shares them and record by record when it does not."""
+    end = offset + number_of_records * record_length
+    years = mapped[offset + 20:end:record_length]
+    if not years.translate(None, BIG_ENDIAN_YEAR_BYTES):
+        byte_order = '>'
+    elif not mapped[offset + 21:end:record_length].translate(None, BIG_ENDIAN_YEAR_BYTES):
+        byte_order = '<'
+    else:
+        byte_order = None
+    blockettes = None
+    if byte_order is not None and _uniform(mapped, offset, end, record_length, 39, 1) and \
+            _uniform(mapped, offset, end, record_length, 46, 2):
+        blockettes = dict()
+        position, = struct.unpack(byte_order + 'H', mapped[offset + 46:offset + 48])
+        for i in range(mapped[offset + 39]):
+            if not 48 <= position <= record_length - 8 or \
+                    not _uniform(mapped, offset, end, record_length, position, 4):
+                blockettes = None
+                break
+            blockette_type, next_blockette = struct.unpack(byte_order + 'HH',
+                                                           mapped[offset + position:offset + position + 4])
+            blockettes[blockette_type] = position
+            if next_blockette == 0:
+                break
+            position = next_blockette
+    if blockettes is None:
+        if number_of_records == 1:
+            raise ValueError(f'Could not read the header of the record at byte offset {offset}')
+        for record_offset in range(offset, end, record_length):
+            _rewrite_ordered_fields(mapped, record_offset, 1, record_length, time_correction, encoding_format,
+                                    timing_quality)
+        return
+    patches = list()
+    if time_correction is not None:
+        patches.append((40, struct.pack(byte_order + 'i', time_correction)))
+    if encoding_format is not None:
+        if 1000 not in blockettes:
+            raise ValueError(f'Record at byte offset {offset} has no blockette 1000')
+        patches.append((blockettes[1000] + 4, bytes((int(encoding_format),))))
+    if timing_quality is not None and 1001 in blockettes:
+        patches.append((blockettes[1001] + 4, bytes((timing_quality,))))
+    for position, value in patches:
+        for i, byte in enumerate(value):
+            mapped[offset + position + i:end:record_length] = bytes((byte,)) * number_of_records
+
+
 def parse(source, seed_format: SeedFormat):
     if not source:
         raise ValueError()
@@ -153,19 +1220,36 @@ def parse(source, seed_format: SeedFormat):
     else:
         reader = BufferedReader(source)
     chunk = reader.read(8)
-    source.seek(0)
-    if SeedFormatV2.RECORD_HEADER.match(chunk.decode('ascii')):
+    reader.seek(0)
+    seed_format = detect_format(chunk)
+    if isinstance(seed_format, SeedFormatV2):
         return Parser(SeedFormatV2(), reader)
-    elif SeedFormatV2.RECORD_HEADER.match(chunk.decode('ascii')):
-        return Parser(SeedFormatV3(), reader)
+    elif isinstance(seed_format, SeedFormatV3):
+        return StreamParser(reader)
     else:
         raise ValueError("Invalid Seed format")
 
 
-record_header = re.compile(r'^\d{6}[VASTDRQM]')
-record_minimum_length = 2 ** 8
-record_preferred_length = 2 ** 12
-record_maximum_length = 2 ** 15
+def find_record_length(chunk, eof: bool = True) -> int:
+    """Same search as get_record_length but over bytes already in memory, so non-seekable
+    streams can be measured from their first block without reading them twice.
+    """
+    length = len(chunk)
+    if length < 8:
+        raise SyntaxError('Could not determine record size!')
+    if not record_header.match(bytes(chunk[0:8]).decode('ascii', errors='replace')):
+        raise SyntaxError('Invalid seed file! [{}]'.format(bytes(chunk[0:8])))
+    record_size = record_minimum_length
+    while record_size <= record_maximum_length:
+        if record_size + 8 <= length:
+            if record_header.match(bytes(chunk[record_size:record_size + 8]).decode('ascii', errors='replace')):
+                return record_size
+        elif record_size == length and eof:
+            return record_size
+        else:
+            break
+        record_size *= 2
+    raise SyntaxError('could not determine record size!')
 
 
 def get_record_length(source, **kwargs) -> int:
@@ -0,0 +1,133 @@
+import datetime
+import fnmatch
+import re
+from typing import Optional, Pattern, Union
+
+from model import DataHeader, DataRecord, datetime_to_ns
+
+QUALITY_CODES = 'DRQM'
+
+
+def to_ns(time: Union[datetime.datetime, int, None]) -> Optional[int]:
+    if time is None:
+        return None
+    if isinstance(time, datetime.datetime):
+        return datetime_to_ns(time)
+    if isinstance(time, int):
+        return time
+    raise ValueError(f'Expected datetime or nanoseconds but received {type(time)}')
+
+
+def normalize_location(location: Optional[str]) -> Optional[str]:
+    if location is None:
+        return None
+    location = location.strip()
+    return '' if location == '--' else location
+
+
+def compile_pattern(pattern: Optional[str], location: bool = False) -> Optional[Pattern]:
+    """Compile a code pattern such as 'BH?' or 'BHZ,LH*' into a regular expression,
+    '*' and '?' are wildcards and ',' separates alternatives."""
+    if pattern is None:
+        return None
+    alternatives = list()
+    for alternative in pattern.split(','):
+        alternative = normalize_location(alternative) if location else alternative.strip()
+        alternatives.append(fnmatch.translate(alternative))
+    return re.compile('|'.join(alternatives))
+
+
+class Selection:
+    """Channel, time window, quality and sample rate criteria shared by the record index and the parsers.
+
+    A criterion left as None matches everything. Codes accept '*' and '?' wildcards and comma separated
+    alternatives, the time window is inclusive on both ends and matches any record overlapping it,
+    quality is a string of accepted record types (for example 'DQ') and sample_rate is either a rate
+    or a (minimum, maximum) pair.
+    """
+
+    def __init__(self, start: Union[datetime.datetime, int] = None, end: Union[datetime.datetime, int] = None,
+                 network: str = None, station: str = None, location: str = None, channel: str = None,
+                 quality: str = None, sample_rate: Union[float, tuple[float, float]] = None):
+        self._start_ns = to_ns(start)
+        self._end_ns = to_ns(end)
+        if self._start_ns is not None and self._end_ns is not None and self._end_ns < self._start_ns:
+            raise ValueError('end must not be before start')
+        self.network = network
+        self.station = station
+        self.location = location
+        self.channel = channel
+        self._patterns = (compile_pattern(network), compile_pattern(station),
+                          compile_pattern(location, location=True), compile_pattern(channel))
+        self._channels = dict()
+        if quality is not None:
+            quality = quality.upper()
+            for code in quality:
+                if code not in QUALITY_CODES:
+                    raise ValueError(f'Invalid quality code {code}, expected one of {QUALITY_CODES}')
+        self.quality = quality
+        if sample_rate is None:
+            self._sample_rates = None
+        elif isinstance(sample_rate, (tuple, list)):
+            self._sample_rates = (sample_rate[0], sample_rate[1])
+        else:
+            self._sample_rates = (sample_rate * 0.9999, sample_rate * 1.0001)
+        self.sample_rate = sample_rate
+
+    @property
+    def start_ns(self) -> Optional[int]:
+        return self._start_ns
+
+    @property
+    def end_ns(self) -> Optional[int]:
+        return self._end_ns
+
+    def is_empty(self) -> bool:
+        return self._start_ns is None and self._end_ns is None and self.network is None and \
+               self.station is None and self.location is None and self.channel is None and \
+               self.quality is None and self.sample_rate is None
+
+    def matches_channel(self, network: str, station: str, location: str, channel: str) -> bool:
+        key = (network, station, location, channel)
+        matched = self._channels.get(key)
+        if matched is None:
+            matched = True
+            for pattern, code in zip(self._patterns, (network.strip(), station.strip(), normalize_location(location),
+                                                      channel.strip())):
+                if pattern is not None and not pattern.match(code):
+                    matched = False
+                    break
+            self._channels[key] = matched
+        return matched
+
+    def matches_time(self, start_ns: int, end_ns: int) -> bool:
+        if self._start_ns is not None and end_ns < self._start_ns:
+            return False
+        if self._end_ns is not None and start_ns > self._end_ns:
+            return False
+        return True
+
+    def matches_sample_rate(self, sample_rate: float) -> bool:
+        if self._sample_rates is None:
+            return True
+        if sample_rate is None:
+            return False
+        return self._sample_rates[0] <= sample_rate <= self._sample_rates[1]
+
+    def matches_header(self, header: DataHeader) -> bool:
+        """Checks that need nothing but the fixed header, evaluated before the blockettes are parsed."""
+        if self.quality is not None and header.record_type not in self.quality:
+            return False
+        return self.matches_channel(header.network_code, header.station_identifier_code, header.location_identifier,
+                                    header.channel_identifier)
+
+    def matches(self, record: DataRecord) -> bool:
+        if record is None:
+            raise ValueError
+        if not self.matches_header(record.header):
+            return False
+        if not self.matches_sample_rate(record.sample_rate):
+            return False
+        if self._start_ns is None and self._end_ns is None:
+            return True
+        return self.matches_time(record.start_time_ns, record.end_time_ns)
@@ -0,0 +1,84 @@
+import gzip
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+import seed
+import test_util
+from seedfile import ArchiveIterator, ReadError
+
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.members = dict()
+        for name in ('fdsnws-dataselect_2020-03-28t21_11_14z.mseed', 'fdsnws-dataselect_2021-10-16t19_00_21z.mseed'):
+            with open(test_util.path(name), 'rb') as file:
+                self.members[f'data/{name}'] = file.read()
+        self.expected = dict()
+        for name, data in self.members.items():
+            self.expected[name] = [(record.channel_code, list(record.samples)) for record in seed.read(data, True)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_tar(self, name: str, mode: str, extra: dict = None) -> str:
+        path = os.path.join(self.directory, name)
+        with tarfile.open(path, mode) as archive:
+            for member, data in {**self.members, **(extra or {})}.items():
+                info = tarfile.TarInfo(member)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+        return path
+
+    def write_zip(self, name: str, extra: dict = None) -> str:
+        path = os.path.join(self.directory, name)
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for member, data in {**self.members, **(extra or {})}.items():
+                archive.writestr(member, data)
+        return path
+
+    def read(self, path, **kwargs) -> dict:
+        found = dict()
+        with ArchiveIterator(path, decompress=True, **kwargs) as iterator:
+            for record in iterator:
+                found.setdefault(iterator.member, list()).append((record.channel_code, list(record.samples)))
+        return found
+
+    def test_tar(self):
+        self.assertEqual(self.expected, self.read(self.write_tar('data.tar', 'w')))
+
+    def test_compressed_tar(self):
+        self.assertEqual(self.expected, self.read(self.write_tar('data.tar.gz', 'w:gz')))
+
+    def test_zip(self):
+        self.assertEqual(self.expected, self.read(self.write_zip('data.zip')))
+
+    def test_skips_other_members(self):
+        path = self.write_zip('data.zip', {'README.txt': b'not seed data\n'})
+        self.assertEqual(self.expected, self.read(path))
+
+    def test_compressed_member(self):
+        name = 'data/fdsnws-dataselect_2020-03-28t21_11_14z.mseed'
+        path = self.write_tar('data.tar', 'w', {f'{name}.gz': gzip.compress(self.members[name])})
+        found = self.read(path, pattern='*.gz')
+        self.assertEqual({f'{name}.gz': self.expected[name]}, found)
+
+    def test_pattern(self):
+        path = self.write_tar('data.tar', 'w')
+        found = self.read(path, pattern='*2020-03-28*')
+        self.assertEqual(['data/fdsnws-dataselect_2020-03-28t21_11_14z.mseed'], list(found))
+
+    def test_fileobj(self):
+        with open(self.write_zip('data.zip'), 'rb') as file:
+            with seed.iterate_archive(fileobj=file, channel='BHZ') as iterator:
+                self.assertEqual(['BHZ'] * 1244, [record.channel_code for record in iterator])
+
+    def test_not_an_archive(self):
+        with self.assertRaises(ReadError):
+            ArchiveIterator(test_util.path('fdsnws-dataselect_2020-03-28t21_11_14z.mseed'))
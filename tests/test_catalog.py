@@ -0,0 +1,114 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+import seed
+import test_util
+from catalog import Catalog, find_files
+
+
+class TestScan(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'IU', 'ANMO'))
+        os.makedirs(os.path.join(self.directory, 'TA'))
+        self.anmo = os.path.join(self.directory, 'IU', 'ANMO', 'anmo.mseed')
+        self.n25k = os.path.join(self.directory, 'TA', 'n25k.mseed.gz')
+        shutil.copy(test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed'), self.anmo)
+        with open(test_util.path('fdsnws-dataselect_2020-03-28t21_11_14z.mseed'), 'rb') as file:
+            data = file.read()
+        with open(self.n25k, 'wb') as file:
+            file.write(gzip.compress(data))
+        with open(os.path.join(self.directory, 'TA', 'README'), 'w') as file:
+            file.write('not seed data\n')
+        with open(os.path.join(self.directory, 'TA', 'broken.mseed'), 'wb') as file:
+            file.write(data[:20] + b'\xff' * 492)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_find_files(self):
+        self.assertEqual([self.anmo], list(find_files(os.path.join(self.directory, '**', 'anmo.*'))))
+        self.assertEqual(4, len(list(find_files(self.directory))))
+
+    def test_scan(self):
+        for workers in (None, 2):
+            catalog: Catalog = seed.scan(self.directory, workers=workers)
+            self.assertEqual(sorted([self.anmo, self.n25k]), sorted(summary.path for summary in catalog.files))
+            self.assertEqual([os.path.join(self.directory, 'TA', 'broken.mseed')], list(catalog.errors))
+            self.assertEqual(13, len(catalog.channels()))
+            anmo = [summary for summary in catalog.files if summary.path == self.anmo][0]
+            self.assertEqual(512, anmo.record_length)
+            channel = anmo.channels[0]
+            self.assertEqual(('IU', 'ANMO', '00', 'BHZ'), channel.nslc)
+            self.assertEqual(1243, channel.number_of_records)
+            self.assertEqual(sum(record.number_of_samples for record in seed.read(self.anmo)),
+                             channel.number_of_samples)
+            self.assertEqual((11,), channel.encodings)
+            self.assertEqual(20, channel.sample_rate)
+
+    def test_query(self):
+        catalog = seed.scan([self.anmo, self.n25k])
+        self.assertEqual([self.n25k], catalog.paths(channel='BH?', network='TA'))
+        self.assertEqual(3, len(catalog.select(station='N25K', channel='BH?')))
+        start, end = catalog.extent('IU', 'ANMO', '00', 'BHZ')
+        self.assertEqual([self.anmo], catalog.paths(start=end, end=end + 1))
+        self.assertEqual([], catalog.paths(start=end + 1, network='IU'))
+        self.assertIsNone(catalog.extent('IU', 'ANMO', '10', 'BHZ'))
+
+
+class TestCatalogDatabase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.anmo = os.path.join(self.directory, 'anmo.mseed')
+        self.n25k = os.path.join(self.directory, 'n25k.mseed')
+        shutil.copy(test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed'), self.anmo)
+        shutil.copy(test_util.path('fdsnws-dataselect_2020-03-28t21_11_14z.mseed'), self.n25k)
+        self.database = seed.open_catalog(os.path.join(self.directory, 'catalog.sqlite'), self.directory)
+
+    def tearDown(self):
+        self.database.close()
+        shutil.rmtree(self.directory)
+
+    def test_update(self):
+        self.assertEqual([self.anmo, self.n25k], self.database.files())
+        self.assertEqual(13, len(self.database.channels()))
+        self.assertEqual(0, self.database.update(self.directory))
+        with open(self.n25k, 'ab') as file:
+            file.write(b'\x00' * 512)
+        self.assertEqual(0, self.database.update(self.directory))
+        self.assertEqual([self.n25k], list(self.database.errors))
+        self.assertEqual([self.anmo], self.database.files())
+        os.remove(self.anmo)
+        self.assertEqual(1, self.database.prune())
+        self.assertEqual(0, len(self.database))
+
+    def test_ranges(self):
+        self.assertEqual([(self.anmo, 512, 0, 1243 * 512)], self.database.ranges(network='IU'))
+        ranges = self.database.ranges(station='N25K', channel='BH?')
+        self.assertEqual([(self.n25k, 512, 0, 3 * 512)], ranges)
+
+    def test_records_of_deleted_file(self):
+        os.remove(self.anmo)
+        records = list(self.database.records(channel='BH?'))
+        self.assertEqual(3, len(records))
+        self.assertEqual({'N25K'}, {record.station_code for record in records})
+        self.assertEqual([self.anmo], list(self.database.errors))
+        self.assertEqual([self.n25k], self.database.files())
+
+    def test_extract(self):
+        with seed.iterate(self.anmo) as iterator:
+            records = list(iterator)
+        start = records[100].start_time_ns + 1
+        end = records[110].start_time_ns
+        self.assertEqual([(self.anmo, 512, 64 * 512, 64 * 512)],
+                         self.database.ranges(start=start, end=end, channel='BHZ'))
+        expected = seed.extract(self.anmo, start=start, end=end, channel='BHZ')
+        actual = seed.extract(self.database, start=start, end=end, channel='BHZ')
+        self.assertEqual(1, len(actual))
+        self.assertEqual(list(expected[0].samples), list(actual[0].samples))
+        self.assertEqual(expected[0].start_time, actual[0].start_time)
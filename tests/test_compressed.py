@@ -0,0 +1,59 @@
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+import unittest
+
+import seed
+import test_util
+from seedio import RecordIterator, detect_compression
+from test_stream_parser import PipeReader
+
+
+class TestCompressed(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(test_util.path('fdsnws-dataselect_2020-03-28t21_11_14z.mseed'), 'rb') as file:
+            self.data = file.read()
+        self.expected = [(record.channel_code, list(record.samples)) for record in seed.read(self.data, True)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as file:
+            file.write(data)
+        return path
+
+    def read(self, source, **kwargs):
+        with RecordIterator(source, decompress=True, **kwargs) as iterator:
+            return [(record.channel_code, list(record.samples)) for record in iterator]
+
+    def test_detect_compression(self):
+        self.assertEqual('gzip', detect_compression(gzip.compress(self.data)))
+        self.assertEqual('bz2', detect_compression(bz2.compress(self.data)))
+        self.assertEqual('xz', detect_compression(lzma.compress(self.data)))
+        self.assertIsNone(detect_compression(self.data))
+
+    def test_files(self):
+        for name, compress in (('day.mseed.gz', gzip.compress), ('day.mseed.bz2', bz2.compress),
+                               ('day.mseed.xz', lzma.compress)):
+            path = self.write(name, compress(self.data))
+            self.assertEqual(self.expected, self.read(path), name)
+
+    def test_bytes_and_pipes(self):
+        self.assertEqual(self.expected, self.read(gzip.compress(self.data)))
+        self.assertEqual(self.expected, self.read(PipeReader(lzma.compress(self.data))))
+
+    def test_filter_without_index(self):
+        path = self.write('day.mseed.gz', gzip.compress(self.data))
+        self.assertEqual(3, len(self.read(path, channel='BH?')))
+        self.assertFalse(os.path.exists(path + '.idx'))
+
+    def test_prefetch(self):
+        path = self.write('day.mseed.xz', lzma.compress(self.data))
+        self.assertEqual(self.expected, self.read(path, prefetch=2))
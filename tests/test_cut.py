@@ -0,0 +1,54 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import seed
+import test_util
+from seedio import copy_range
+
+
+class TestCut(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'anmo.mseed')
+        shutil.copy(test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed'), self.source)
+        with open(self.source, 'rb') as file:
+            self.data = file.read()
+        self.records = seed.read(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def window(self, first: int, last: int) -> tuple[int, int]:
+        return self.records[first].start_time_ns + 1, self.records[last].start_time_ns
+
+    def test_cut_to_file(self):
+        start, end = self.window(100, 200)
+        output = os.path.join(self.directory, 'cut.mseed')
+        self.assertEqual(101, seed.cut(self.source, output, start=start, end=end, channel='BHZ'))
+        with open(output, 'rb') as file:
+            self.assertEqual(self.data[100 * 512:201 * 512], file.read())
+
+    def test_cut_to_buffer(self):
+        start, end = self.window(10, 12)
+        for source in (self.source, self.data):
+            output = io.BytesIO()
+            self.assertEqual(3, seed.cut(source, output, start=start, end=end))
+            self.assertEqual(self.data[10 * 512:13 * 512], output.getvalue())
+
+    def test_cut_nothing(self):
+        output = io.BytesIO()
+        self.assertEqual(0, seed.cut(self.source, output, channel='LHZ'))
+        self.assertEqual(b'', output.getvalue())
+
+    def test_copy_range_appends(self):
+        output = os.path.join(self.directory, 'copy.mseed')
+        with open(self.source, 'rb') as reader, open(output, 'wb') as file:
+            file.write(b'head')
+            copy_range(reader, file, 512, 1024)
+            file.write(b'tail')
+        with open(output, 'rb') as file:
+            self.assertEqual(b'head' + self.data[512:1536] + b'tail', file.read())
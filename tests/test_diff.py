@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import seed
+import test_util
+from seedindex import fingerprint
+
+
+class TestDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed'), 'rb') as file:
+            data = file.read()
+        records = [data[i:i + 512] for i in range(0, len(data), 512)]
+        with open(test_util.path('fdsnws-dataselect_2020-03-28t21_11_14z.mseed'), 'rb') as file:
+            extra = file.read(512)
+        target = list(records)
+        target[20] = target[20][0:100] + bytes(412)
+        target[30] = b'999999' + target[30][6:]
+        del target[40:50]
+        target.append(extra)
+        self.source = self.write('source.mseed', data)
+        self.target = self.write('target.mseed', b''.join(target))
+        self.data = data
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as file:
+            file.write(data)
+        return path
+
+    def test_fingerprint(self):
+        records = seed.read(self.data[0:1024])
+        self.assertNotEqual(fingerprint(records[0]), fingerprint(records[1]))
+        renumbered = seed.read(b'999999' + self.data[6:512])[0]
+        self.assertEqual(fingerprint(records[0]), fingerprint(renumbered))
+        self.assertEqual(fingerprint(records[0]), seed.index(self.source).fingerprints[0])
+
+    def test_diff(self):
+        difference = seed.diff(self.source, self.target)
+        self.assertEqual([i * 512 for i in range(40, 50)], difference.missing)
+        self.assertEqual([1233 * 512], difference.extra)
+        self.assertEqual([(20 * 512, 20 * 512)], difference.changed)
+        self.assertFalse(seed.diff(self.source, self.source))
+
+    def test_sync(self):
+        seed.sync(self.source, self.target)
+        self.assertEqual(os.path.getsize(self.source) + 512, os.path.getsize(self.target))
+        difference = seed.diff(self.source, self.target)
+        self.assertEqual([], difference.missing)
+        self.assertEqual([], difference.changed)
+        self.assertEqual(1, len(difference.extra))
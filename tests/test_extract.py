@@ -0,0 +1,43 @@
+import datetime
+import unittest
+
+import seed
+import test_util
+from model import datetime_to_ns
+
+
+class TestExtract(unittest.TestCase):
+    source = test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed')
+
+    def setUp(self):
+        records = seed.read(self.source, decompress=True)
+        self.start_ns = None
+        self.samples = list()
+        for record in records:
+            if self.start_ns is None:
+                self.start_ns = record.start_time_ns
+            self.samples.extend(record.samples)
+
+    def sample_time(self, index: int) -> int:
+        return self.start_ns + index * 50000000
+
+    def test_window(self):
+        first, last = 1000, 5000
+        segments = seed.extract(self.source, start=self.sample_time(first) - 1000, end=self.sample_time(last),
+                                network='IU', station='ANMO', location='00', channel='BHZ')
+        self.assertEqual(1, len(segments))
+        self.assertEqual(self.samples[first:last + 1], list(segments[0].samples))
+        self.assertEqual(self.sample_time(first), datetime_to_ns(segments[0].start_time))
+        self.assertEqual(20, segments[0].sample_rate)
+
+    def test_window_inside_one_record(self):
+        segments = seed.extract(self.source, start=self.sample_time(10), end=self.sample_time(12))
+        self.assertEqual(self.samples[10:13], list(segments[0].samples))
+
+    def test_window_outside_data(self):
+        start = datetime.datetime(2000, 1, 1)
+        self.assertEqual([], seed.extract(self.source, start=start, end=start + datetime.timedelta(hours=1)))
+
+    def test_requires_window(self):
+        with self.assertRaises(ValueError):
+            seed.extract(self.source, start=None, end=None)
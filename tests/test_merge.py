@@ -0,0 +1,40 @@
+import unittest
+
+import seed
+import test_util
+from seedio import merge_key
+
+
+class TestMerge(unittest.TestCase):
+
+    def setUp(self):
+        with open(test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed'), 'rb') as file:
+            data = file.read()
+        self.anmo = [data[i:i + 512] for i in range(0, len(data), 512)]
+        self.expected = [merge_key(record) for record in seed.read(data)]
+
+    def test_interleaved_sources(self):
+        sources = [b''.join(self.anmo[i::3]) for i in range(3)]
+        with seed.merge(sources) as iterator:
+            self.assertEqual(self.expected, [merge_key(record) for record in iterator])
+            self.assertEqual(0, iterator.duplicates)
+
+    def test_duplicates(self):
+        sources = [b''.join(self.anmo[0::2]), b''.join(self.anmo[1::2]), b''.join(self.anmo[100:200])]
+        with seed.merge(sources) as iterator:
+            self.assertEqual(self.expected, [merge_key(record) for record in iterator])
+            self.assertEqual(100, iterator.duplicates)
+
+    def test_channels(self):
+        with open(test_util.path('fdsnws-dataselect_2020-03-28t21_11_14z.mseed'), 'rb') as file:
+            data = file.read()
+        records = sorted(((merge_key(record), data[i * 512:(i + 1) * 512]) for i, record in
+                          enumerate(seed.read(data))))
+        sources = [b''.join(record for key, record in records[0::2]), b''.join(record for key, record in records[1::2]),
+                   b''.join(self.anmo[0:10])]
+        with seed.merge(sources, decompress=True, channel='BH?,LHZ') as iterator:
+            merged = list(iterator)
+        self.assertEqual([('IU', 'ANMO', '00', 'BHZ')] * 10 + [('TA', 'N25K', '', code) for code in
+                                                               ('BHE', 'BHN', 'BHZ', 'LHZ')],
+                         [merge_key(record)[0:4] for record in merged])
+        self.assertEqual(list(seed.read(self.anmo[0], True)[0].samples), list(merged[0].samples))
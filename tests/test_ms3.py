@@ -0,0 +1,119 @@
+import datetime
+import json
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import seed
+import test_util
+from crc import crc32c
+from model import DataHeaderV3
+from objectidentifier import parse_source_id, to_source_id
+from seedio import RecordIterator, record_crc
+from test_stream_parser import PipeReader
+
+
+def to_ms3(record, nanosecond: int = 0, extra_headers: dict = None) -> bytes:
+    """A miniSEED 3 record holding the payload of a miniSEED 2 record."""
+    start_ns = record.start_time_ns + nanosecond
+    start = datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=start_ns // 1000000000)
+    identifier = record.source_id.encode('ascii')
+    extra = json.dumps(extra_headers).encode('utf-8') if extra_headers else b''
+    b_bytes = bytearray(DataHeaderV3.FIXED_HEADER.pack(
+        b'MS', 3, 0, start_ns % 1000000000, start.year, start.timetuple().tm_yday, start.hour, start.minute,
+        start.second, record.encoding_format, record.sample_rate, record.number_of_samples, 0, 1,
+        len(identifier), len(extra), len(record.data)) + identifier + extra + record.data)
+    struct.pack_into('<I', b_bytes, DataHeaderV3.CRC_OFFSET, record_crc(b_bytes))
+    return bytes(b_bytes)
+
+
+class TestSourceId(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(('IU', 'ANMO', '00', 'BHZ'), parse_source_id('FDSN:IU_ANMO_00_B_H_Z'))
+        self.assertEqual(('XX', 'TEST', '', 'L_HH_Z'), parse_source_id('FDSN:XX_TEST__L_HH_Z'))
+        with self.assertRaises(ValueError):
+            parse_source_id('IU.ANMO.00.BHZ')
+
+    def test_to_source_id(self):
+        self.assertEqual('FDSN:IU_ANMO_00_B_H_Z', to_source_id('IU', 'ANMO', '00', 'BHZ'))
+        self.assertEqual('FDSN:TA_N25K__L_H_Z', to_source_id('TA', 'N25K', '  ', 'LHZ'))
+
+
+class TestCrc(unittest.TestCase):
+
+    def test_check_value(self):
+        self.assertEqual(0xE3069283, crc32c(b'123456789'))
+        self.assertEqual(0xE3069283, crc32c(b'6789', crc32c(b'12345')))
+
+
+class TestMiniSeed3(unittest.TestCase):
+    source = test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed')
+
+    def setUp(self):
+        self.records = seed.read(self.source)
+        self.expected = seed.read(self.source, decompress=True)
+        self.data = b''.join(to_ms3(record) for record in self.records)
+
+    def test_read(self):
+        records = seed.read(self.data, decompress=True)
+        self.assertEqual(len(self.expected), len(records))
+        for expected, record in zip(self.expected, records):
+            self.assertEqual(list(expected.samples), list(record.samples))
+            self.assertEqual(expected.start_time_ns, record.start_time_ns)
+            self.assertEqual(expected.end_time_ns, record.end_time_ns)
+            self.assertEqual(expected.sample_rate, record.sample_rate)
+        self.assertEqual('FDSN:IU_ANMO_00_B_H_Z', records[0].source_id)
+        self.assertEqual(('IU', 'ANMO', '00', 'BHZ'), (records[0].network_code, records[0].station_code,
+                                                       records[0].channel_location_code, records[0].channel_code))
+
+    def test_nanosecond_start(self):
+        records = seed.read(to_ms3(self.records[0], nanosecond=123))
+        self.assertEqual(self.records[0].start_time_ns + 123, records[0].start_time_ns)
+
+    def test_extra_headers(self):
+        data = to_ms3(self.records[0], extra_headers={'FDSN': {'DataQuality': 'Q'}}) + self.data
+        records = seed.read(data, quality='Q')
+        self.assertEqual(1, len(records))
+        self.assertEqual({'FDSN': {'DataQuality': 'Q'}}, records[0].extra_headers)
+        self.assertEqual(len(self.records), len(seed.read(data, quality='D')))
+
+    def test_stream(self):
+        with RecordIterator(PipeReader(self.data), decompress=True) as iterator:
+            self.assertEqual(len(self.expected), len(list(iterator)))
+
+    def test_file_with_selection(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'anmo.ms3')
+            with open(path, 'wb') as file:
+                file.write(self.data)
+            start = self.records[10].start_time_ns
+            records = seed.read(path, start=start, end=start, channel='BHZ')
+            self.assertEqual([start], [record.start_time_ns for record in records])
+            self.assertFalse(os.path.exists(path + '.idx'))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_verify_crc(self):
+        self.assertEqual(len(self.records), len(seed.read(self.data, verify_crc=True)))
+        data = bytearray(self.data)
+        data[-1] ^= 0xFF
+        self.assertEqual(len(self.records), len(seed.read(bytes(data))))
+        with self.assertRaises(ValueError):
+            seed.read(bytes(data), verify_crc=True)
+        errors = list()
+        with RecordIterator(bytes(data), tolerant=True, on_error=errors.append, verify_crc=True) as iterator:
+            self.assertEqual(len(self.records) - 1, len(list(iterator)))
+        self.assertEqual(1, len(errors))
+
+    def test_tolerant_resync(self):
+        length = len(to_ms3(self.records[0]))
+        data = self.data[0:length] + b'garbage' + self.data[length:]
+        errors = list()
+        with RecordIterator(data, tolerant=True, on_error=errors.append) as iterator:
+            self.assertEqual(len(self.records), len(list(iterator)))
+            self.assertEqual(6, iterator.skipped_bytes)
+        self.assertEqual([length], [error.offset for error in errors])
@@ -0,0 +1,29 @@
+import unittest
+
+import test_util
+from seedio import RecordIterator
+
+
+class TestParallelDecode(unittest.TestCase):
+    source = test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed')
+
+    def read(self, **kwargs):
+        with RecordIterator(self.source, decompress=True, **kwargs) as iterator:
+            return [(record.header.sequence_number, list(record.samples)) for record in iterator]
+
+    def test_same_as_serial(self):
+        expected = self.read()
+        self.assertEqual(1243, len(expected))
+        self.assertEqual(expected, self.read(workers=2, chunk_size=50))
+
+    def test_small_chunks(self):
+        self.assertEqual(self.read(channel='BHZ'), self.read(channel='BHZ', workers=3, chunk_size=1))
+
+    def test_close_before_exhausted(self):
+        with RecordIterator(self.source, decompress=True, workers=2) as iterator:
+            record = next(iterator)
+            self.assertEqual(record.number_of_samples, len(record.samples))
+
+    def test_invalid_chunk_size(self):
+        with self.assertRaises(ValueError):
+            RecordIterator(self.source, decompress=True, workers=2, chunk_size=0)
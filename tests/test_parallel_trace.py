@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import seed
+import test_util
+from model import datetime_to_ns
+
+
+class TestParallelTrace(unittest.TestCase):
+    source = test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed')
+    multiplexed = test_util.path('fdsnws-dataselect_2020-03-28t21_11_14z.mseed')
+
+    def test_same_as_serial(self):
+        serial = seed.trace(self.source, decompress=True)
+        parallel = seed.trace(self.source, decompress=True, workers=3)
+        self.assertEqual(1, len(parallel.segments))
+        self.assertEqual(serial.number_of_samples, parallel.number_of_samples)
+        self.assertEqual(list(serial.y), list(parallel.y))
+        self.assertEqual(seed.read(self.source)[0].start_time_ns, datetime_to_ns(parallel.start_time))
+
+    def test_ranges_are_stitched(self):
+        serial = seed.traces(self.source)
+        parallel = seed.traces(self.source, workers=4)
+        self.assertEqual(1, len(parallel))
+        self.assertEqual([len(segment) for segment in serial[0].segments],
+                         [len(segment) for segment in parallel[0].segments])
+
+    def test_multiplexed(self):
+        traces = seed.traces(self.multiplexed, workers=2)
+        self.assertEqual(12, len(traces))
+        self.assertEqual(3, len(seed.traces(self.multiplexed, channel='BH?', workers=2)))
+        with self.assertRaises(ValueError):
+            seed.trace(self.multiplexed, decompress=True, workers=2)
+
+    def test_mixed_record_types(self):
+        with open(self.source, 'rb') as file:
+            data = bytearray(file.read())
+        for i in range(1243):
+            data[i * 512 + 6:i * 512 + 7] = b'D' if i < 600 else b'Q'
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'mixed.mseed')
+            with open(path, 'wb') as file:
+                file.write(data)
+            for workers in (None, 4):
+                traces = seed.traces(path, workers=workers)
+                self.assertEqual(1, len(traces[0].segments))
+                self.assertEqual('M', traces[0]._quality)
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,67 @@
+import io
+import unittest
+
+import seed
+import test_util
+from seedio import PrefetchReader, RecordIterator
+from test_stream_parser import PipeReader
+
+
+class TestPrefetchReader(unittest.TestCase):
+
+    def setUp(self):
+        with open(test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed'), 'rb') as file:
+            self.data = file.read()
+
+    def test_read(self):
+        with PrefetchReader(io.BytesIO(self.data), block_size=10000, depth=2) as reader:
+            self.assertFalse(reader.seekable())
+            chunks = list()
+            while True:
+                chunk = reader.read(777)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        self.assertEqual(self.data, b''.join(chunks))
+
+    def test_short_reads(self):
+        with PrefetchReader(PipeReader(self.data, chunk_size=333), block_size=2 ** 16) as reader:
+            self.assertEqual(self.data, reader.read())
+
+    def test_byte_budget(self):
+        with self.assertRaises(ValueError):
+            PrefetchReader(io.BytesIO(self.data), max_bytes=1024)
+        with PrefetchReader(io.BytesIO(self.data), max_bytes=2 ** 17) as reader:
+            self.assertEqual(self.data, reader.read())
+
+    def test_error_is_raised_in_consumer(self):
+        class BrokenReader(io.RawIOBase):
+            def readinto(self, b):
+                raise OSError('broken')
+
+        with PrefetchReader(BrokenReader()) as reader:
+            with self.assertRaises(OSError):
+                reader.read(10)
+
+    def test_close_before_end(self):
+        reader = PrefetchReader(io.BytesIO(self.data), block_size=2 ** 15, depth=1)
+        reader.read(10)
+        reader.close()
+        self.assertTrue(reader.closed)
+
+    def test_iterate(self):
+        source = test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed')
+        with RecordIterator(source, decompress=True) as iterator:
+            expected = [list(record.samples) for record in iterator]
+        with RecordIterator(source, decompress=True, prefetch=2, prefetch_bytes=2 ** 17) as iterator:
+            self.assertEqual(expected, [list(record.samples) for record in iterator])
+
+    def test_iterate_byte_budget(self):
+        source = test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed')
+        expected = [list(record.samples) for record in seed.read(source, decompress=True)]
+        with self.assertRaises(ValueError):
+            seed.iterate(source, prefetch=2, prefetch_bytes=1024)
+        with seed.iterate(source, decompress=True, prefetch=2, prefetch_bytes=2 ** 17) as iterator:
+            self.assertEqual(expected, [list(record.samples) for record in iterator])
+        self.assertEqual(expected, [list(record.samples) for record in
+                                    seed.read(source, decompress=True, prefetch=2, prefetch_bytes=2 ** 17)])
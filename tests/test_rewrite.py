@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import seed
+import test_util
+
+
+class TestRewriteHeaders(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.anmo = os.path.join(self.directory, 'anmo.mseed')
+        self.n25k = os.path.join(self.directory, 'n25k.mseed')
+        shutil.copy(test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed'), self.anmo)
+        shutil.copy(test_util.path('fdsnws-dataselect_2020-03-28t21_11_14z.mseed'), self.n25k)
+        self.records = seed.read(self.anmo)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_codes(self):
+        self.assertEqual(1243, seed.rewrite_headers(self.anmo, new_network='XX', new_location='--',
+                                                    new_quality='Q'))
+        records = seed.read(self.anmo)
+        self.assertEqual({('XX', '  ', 'Q')}, {(record.network_code, record.channel_location_code,
+                                                record.record_type) for record in records})
+        self.assertEqual([record.data for record in self.records], [record.data for record in records])
+
+    def test_window(self):
+        start = self.records[100].start_time_ns + 1
+        end = self.records[109].start_time_ns
+        self.assertEqual(10, seed.rewrite_headers(self.anmo, start=start, end=end, channel='BHZ',
+                                                  time_correction=5000, correction_applied=False))
+        records = seed.read(self.anmo)
+        for i, (before, after) in enumerate(zip(self.records, records)):
+            shift = 500000000 if 100 <= i < 110 else 0
+            self.assertEqual(before.start_time_ns + shift, after.start_time_ns)
+        seed.rewrite_headers(self.anmo, start=start + 500000000, end=end + 500000000, correction_applied=True)
+        self.assertEqual([record.start_time_ns for record in self.records],
+                         [record.start_time_ns for record in seed.read(self.anmo)])
+
+    def test_blockettes(self):
+        seed.rewrite_headers(self.anmo, timing_quality=42, encoding_format=10)
+        record = seed.read(self.anmo)[5]
+        self.assertEqual(42, record.blockette(1001).timing_quality)
+        self.assertEqual(10, int(record.encoding_format))
+
+    def test_selected_channels(self):
+        self.assertEqual(3, seed.rewrite_headers(self.n25k, channel='LH?', new_location='10'))
+        records = seed.read(self.n25k)
+        self.assertEqual(sorted(['LHE', 'LHN', 'LHZ']),
+                         sorted(record.channel_code for record in records if record.channel_location_code == '10'))
+
+    def test_dry_run(self):
+        with open(self.anmo, 'rb') as file:
+            before = file.read()
+        self.assertEqual(1243, seed.rewrite_headers(self.anmo, new_network='XX', dry_run=True))
+        with open(self.anmo, 'rb') as file:
+            self.assertEqual(before, file.read())
+
+    def test_invalid_values(self):
+        with self.assertRaises(ValueError):
+            seed.rewrite_headers(self.anmo, new_station='TOOLONG')
+        with self.assertRaises(ValueError):
+            seed.rewrite_headers(self.anmo, new_quality='X')
@@ -0,0 +1,132 @@
+import datetime
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import seed
+import test_util
+from model import datetime_to_ns
+from router import RecordRouter
+from sds import SDSArchive, SDSWriter
+
+
+def shift_record(record: bytes, delta: datetime.timedelta) -> bytes:
+    year, day, hour, minute, second, unused, fraction = struct.unpack('>HHBBBBH', record[20:30])
+    time = datetime.datetime(year, 1, 1, hour, minute, second) + datetime.timedelta(days=day - 1) + delta
+    time_of_year = time.timetuple()
+    return record[0:20] + struct.pack('>HHBBBBH', time.year, time_of_year.tm_yday, time.hour, time.minute,
+                                      time.second, unused, fraction) + record[30:]
+
+
+class TestSDS(unittest.TestCase):
+    source = test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.archive = SDSArchive(self.directory)
+        with open(self.source, 'rb') as file:
+            data = file.read()
+        records = seed.read(data)
+        # shift the data so record 600 starts in the first second of 2010-02-28
+        start = records[600].start_time.replace(microsecond=0)
+        self.delta = datetime.datetime(2010, 2, 28) - start
+        self.shifted = os.path.join(self.directory, 'shifted.mseed')
+        with open(self.shifted, 'wb') as shifted:
+            for i, record in enumerate(records):
+                b_bytes = shift_record(data[i * 512:(i + 1) * 512], self.delta)
+                shifted.write(b_bytes)
+                path = self.archive.path('IU', 'ANMO', '00', 'BHZ', record.start_time + self.delta)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'ab') as file:
+                    file.write(b_bytes)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_path(self):
+        self.assertEqual(os.path.join(self.directory, '2010', 'IU', 'ANMO', 'BHZ.D', 'IU.ANMO.00.BHZ.D.2010.059'),
+                         self.archive.path('IU', 'ANMO', '00', 'BHZ', datetime.date(2010, 2, 28)))
+        self.assertTrue(self.archive.path('IU', 'ANMO', '--', 'BHZ', datetime.date(2010, 1, 1)).endswith(
+            'IU.ANMO..BHZ.D.2010.001'))
+
+    def test_files(self):
+        day = datetime.datetime(2010, 2, 27, 12)
+        self.assertEqual({('IU', 'ANMO', '00', 'BHZ'): [self.archive.path('IU', 'ANMO', '00', 'BHZ', day)]},
+                         self.archive.files(day, day + datetime.timedelta(hours=1), 'IU', 'ANMO', '00', 'BHZ'))
+        both = self.archive.files(day, day + datetime.timedelta(days=1), 'I?', '*', None, 'BH?,LHZ')
+        self.assertEqual(2, len(both[('IU', 'ANMO', '00', 'BHZ')]))
+        self.assertEqual({}, self.archive.files(day, day, 'IU', 'ANMO', '10', 'BHZ'))
+        border = datetime.datetime(2010, 2, 28, 0, 0, 10)
+        self.assertEqual(2, len(self.archive.files(border, border, 'IU', 'ANMO', '00', 'BHZ')[
+                                    ('IU', 'ANMO', '00', 'BHZ')]))
+
+    def test_read_across_midnight(self):
+        start = datetime.datetime(2010, 2, 27, 23, 58)
+        end = datetime.datetime(2010, 2, 28, 0, 2)
+        traces = seed.read_sds(self.directory, start, end, network='IU', station='ANMO', channel='BHZ')
+        self.assertEqual(1, len(traces))
+        self.assertEqual(('IU', 'ANMO', '00', 'BHZ'), (traces[0].network, traces[0].station, traces[0].location,
+                                                       traces[0].channel))
+        self.assertEqual(1, len(traces[0].segments))
+        expected = seed.extract(self.shifted, start, end)
+        self.assertEqual(list(expected[0].samples), list(traces[0].segments[0].samples))
+        self.assertEqual(expected[0].start_time, traces[0].segments[0].start_time)
+        self.assertLessEqual(datetime_to_ns(start), datetime_to_ns(traces[0].start_time))
+
+
+class TestSDSWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed'), 'rb') as file:
+            data = file.read()
+        # the second half of the records moves to the next day
+        self.anmo = [data[i:i + 512] for i in range(0, len(data), 512)]
+        self.anmo = self.anmo[:600] + [shift_record(record, datetime.timedelta(days=1)) for record in self.anmo[600:]]
+        with open(test_util.path('fdsnws-dataselect_2020-03-28t21_11_14z.mseed'), 'rb') as file:
+            data = file.read()
+        self.n25k = [data[i:i + 512] for i in range(0, len(data), 512)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_write(self):
+        with SDSWriter(self.directory, max_open_files=2, fsync='close') as writer:
+            for i, record in enumerate(self.anmo):
+                writer.write(record)
+                if i < len(self.n25k):
+                    writer.write(memoryview(self.n25k[i]))
+            self.assertLessEqual(len(writer._handles), 2)
+        self.assertEqual(len(self.anmo) + len(self.n25k), writer.records_written)
+        archive = SDSArchive(self.directory)
+        with open(archive.path('IU', 'ANMO', '00', 'BHZ', datetime.date(2010, 2, 27)), 'rb') as file:
+            self.assertEqual(b''.join(self.anmo[:600]), file.read())
+        with open(archive.path('IU', 'ANMO', '00', 'BHZ', datetime.date(2010, 2, 28)), 'rb') as file:
+            self.assertEqual(b''.join(self.anmo[600:]), file.read())
+        files = archive.files(datetime.datetime(2015, 12, 28), datetime.datetime(2015, 12, 28, 1), network='TA')
+        self.assertEqual(12, len(files))
+        with open(files[('TA', 'N25K', '', 'BHZ')][0], 'rb') as file:
+            self.assertEqual(self.n25k[2], file.read())
+
+    def test_day_rollover_closes_previous_day(self):
+        with SDSWriter(self.directory, flush_interval=0) as writer:
+            previous = writer.write(self.anmo[599])
+            self.assertIn(previous, writer._handles)
+            writer.write(self.anmo[600])
+            self.assertNotIn(previous, writer._handles)
+            self.assertEqual(1, len(writer._handles))
+
+    def test_router_is_abstract(self):
+        with self.assertRaises(TypeError):
+            RecordRouter()
+
+    def test_append(self):
+        for records in (self.anmo[:10], self.anmo[10:20]):
+            with SDSWriter(self.directory) as writer:
+                for record in records:
+                    writer.write(record)
+        path = SDSArchive(self.directory).path('IU', 'ANMO', '00', 'BHZ', datetime.date(2010, 2, 27))
+        with open(path, 'rb') as file:
+            self.assertEqual(b''.join(self.anmo[:20]), file.read())
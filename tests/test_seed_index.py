@@ -0,0 +1,80 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import seedio
+import test_util
+from seedindex import RecordIndex, index_path, load_index
+from selection import Selection
+
+
+class TestSeedIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'fdsnws-dataselect_2021-10-16t19_00_21z.mseed')
+        shutil.copy(test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed'), self.source)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_build(self):
+        index = seedio.build_index(self.source)
+        self.assertEqual(1243, len(index))
+        self.assertEqual(512, index.record_length)
+        self.assertEqual([('IU', 'ANMO', '00', 'BHZ')], index.channels)
+        self.assertEqual(list(range(0, 1243 * 512, 512)), sorted(index.offsets))
+        for start, end in zip(index.start_times, index.end_times):
+            self.assertLessEqual(start, end)
+
+    def test_save_and_load(self):
+        index = seedio.open_index(self.source)
+        self.assertTrue(os.path.isfile(index_path(self.source)))
+        loaded = RecordIndex.load(index_path(self.source))
+        self.assertEqual(index.channels, loaded.channels)
+        self.assertEqual(index.offsets, loaded.offsets)
+        self.assertEqual(index.start_times, loaded.start_times)
+        self.assertEqual(index.end_times, loaded.end_times)
+        self.assertEqual(index.sample_counts, loaded.sample_counts)
+        self.assertEqual(index.encodings, loaded.encodings)
+
+    def test_stale_index(self):
+        seedio.open_index(self.source)
+        self.assertIsNotNone(load_index(self.source))
+        with open(self.source, 'ab') as file:
+            file.write(b'\x00')
+        self.assertIsNone(load_index(self.source))
+
+    def test_select(self):
+        index = seedio.open_index(self.source)
+        start = index.start_times[100]
+        end = index.start_times[110]
+        offsets = index.select(Selection(start=start, end=end))
+        expected = [index.offsets[row] for row in range(len(index))
+                    if index.end_times[row] >= start and index.start_times[row] <= end]
+        self.assertEqual(sorted(expected), offsets)
+        self.assertEqual([], index.select(Selection(channel='BHN')))
+        self.assertEqual(1243, len(index.select(Selection(network='IU', station='ANMO', location='00',
+                                                          channel='BHZ'))))
+
+    def test_iterate_window(self):
+        with seedio.RecordIterator(self.source, header_only=True) as iterator:
+            records = list(iterator)
+        start = records[10].start_time_ns
+        end = records[20].start_time_ns
+        expected = [record.header.sequence_number for record in records
+                    if record.end_time_ns >= start and record.start_time_ns <= end]
+        with seedio.RecordIterator(self.source, header_only=True, start=start, end=end, channel='BHZ') as iterator:
+            actual = [record.header.sequence_number for record in iterator]
+        self.assertTrue(os.path.isfile(index_path(self.source)))
+        self.assertEqual(expected, actual)
+        with seedio.RecordIterator(self.source, header_only=True, start=start, end=end,
+                                   use_index=False) as iterator:
+            self.assertEqual(expected, [record.header.sequence_number for record in iterator])
+
+    def test_record_times(self):
+        with seedio.RecordIterator(self.source, header_only=True) as iterator:
+            record = next(iterator)
+        self.assertEqual(datetime.datetime(2010, 2, 27, 6, 30, 0, 19500), record.start_time)
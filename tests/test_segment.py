@@ -38,3 +38,49 @@ class TestSegment(unittest.TestCase):
         seg1.is_before_or_equal()
         seg1.merge()
         seg1.samples
+
+    def test_append_and_merge(self):
+        start_time = datetime.datetime(year=2019, month=5, day=18, hour=15, minute=17, second=22)
+        segment = Segment(start_time=start_time, sample_rate=20, samples=[0, 1, 2, 3])
+        self.assertEqual('i', segment.samples.typecode)
+        segment.append(array.array('i', [4, 5]))
+        self.assertEqual(6, len(segment))
+        self.assertEqual(start_time + datetime.timedelta(seconds=0.25), segment.end_time)
+
+        segment.merge(Segment(start_time=start_time + datetime.timedelta(seconds=0.1), sample_rate=20,
+                              samples=[20, 30]))
+        self.assertEqual([0, 1, 20, 30, 4, 5], list(segment.samples))
+        segment.merge(Segment(start_time=start_time + datetime.timedelta(seconds=0.25), sample_rate=20,
+                              samples=[50, 60]))
+        self.assertEqual([0, 1, 20, 30, 4, 50, 60], list(segment.samples))
+        segment.merge(Segment(start_time=start_time - datetime.timedelta(seconds=0.1), sample_rate=20,
+                              samples=[-2, -1, 0.5]))
+        self.assertEqual('d', segment.samples.typecode)
+        self.assertEqual([-2, -1, 0.5, 1, 20, 30, 4, 50, 60], list(segment.samples))
+        self.assertEqual(start_time - datetime.timedelta(seconds=0.1), segment.start_time)
+        self.assertEqual(start_time + datetime.timedelta(seconds=0.3), segment.end_time)
+
+    def test_prepend_and_extend(self):
+        start_time = datetime.datetime(year=2019, month=5, day=18, hour=15, minute=17, second=22)
+        segment = Segment(start_time=start_time, sample_rate=20, samples=[2, 3])
+        segment.merge(Segment(start_time=start_time - datetime.timedelta(seconds=0.1), sample_rate=20,
+                              samples=[0, 1]))
+        segment.extend(Segment(start_time=start_time + datetime.timedelta(seconds=0.1), sample_rate=20,
+                               samples=[4.5, 5]))
+        self.assertEqual(6, len(segment))
+        self.assertEqual(start_time - datetime.timedelta(seconds=0.1), segment.start_time)
+        self.assertEqual(start_time + datetime.timedelta(seconds=0.15), segment.end_time)
+        self.assertEqual('d', segment.samples.typecode)
+        self.assertEqual([0, 1, 2, 3, 4.5, 5], list(segment.samples))
+
+    def test_merge_gap(self):
+        start_time = datetime.datetime(year=2019, month=5, day=18, hour=15, minute=17, second=22)
+        segment = Segment(start_time=start_time, sample_rate=20, samples=[0, 1, 2, 3])
+        with self.assertRaises(ValueError):
+            segment.merge(Segment(start_time=start_time - datetime.timedelta(seconds=1), sample_rate=20,
+                                  samples=[-2, -1]))
+        with self.assertRaises(ValueError):
+            segment.merge(Segment(start_time=start_time + datetime.timedelta(seconds=1), sample_rate=20,
+                                  samples=[10, 11]))
+        self.assertEqual([0, 1, 2, 3], list(segment.samples))
+        self.assertEqual(start_time, segment.start_time)
@@ -0,0 +1,78 @@
+import datetime
+import unittest
+
+import seed
+import test_util
+from model import DataHeader
+from seedio import RecordIterator
+from selection import Selection
+from test_stream_parser import PipeReader
+
+
+class TestSelection(unittest.TestCase):
+
+    def test_wildcards(self):
+        selection = Selection(network='IU', channel='BH?,LH*')
+        self.assertTrue(selection.matches_channel('IU', 'ANMO', '00', 'BHZ'))
+        self.assertTrue(selection.matches_channel('IU', 'ANMO', '00', 'LHN'))
+        self.assertFalse(selection.matches_channel('IU', 'ANMO', '00', 'VHZ'))
+        self.assertFalse(selection.matches_channel('TA', 'ANMO', '00', 'BHZ'))
+
+    def test_empty_location(self):
+        selection = Selection(location='--')
+        self.assertTrue(selection.matches_channel('TA', 'N25K', '  ', 'BHZ'))
+        self.assertFalse(selection.matches_channel('TA', 'N25K', 'EP', 'LCE'))
+
+    def test_quality(self):
+        header = DataHeader(record_type='Q', network_code='IU', station_identifier_code='ANMO',
+                            location_identifier='00', channel_identifier='BHZ')
+        self.assertTrue(Selection(quality='dq').matches_header(header))
+        self.assertFalse(Selection(quality='D').matches_header(header))
+        with self.assertRaises(ValueError):
+            Selection(quality='X')
+
+    def test_sample_rate(self):
+        self.assertTrue(Selection(sample_rate=20).matches_sample_rate(20.0))
+        self.assertFalse(Selection(sample_rate=20).matches_sample_rate(40.0))
+        self.assertTrue(Selection(sample_rate=(1, 40)).matches_sample_rate(40.0))
+
+    def test_time_window(self):
+        start = datetime.datetime(2010, 2, 27, 6, 30)
+        selection = Selection(start=start, end=start + datetime.timedelta(minutes=1))
+        self.assertTrue(selection.matches_time(selection.start_ns - 10, selection.start_ns))
+        self.assertFalse(selection.matches_time(selection.start_ns - 10, selection.start_ns - 1))
+        with self.assertRaises(ValueError):
+            Selection(start=start, end=start - datetime.timedelta(seconds=1))
+
+
+class TestPredicatePushdown(unittest.TestCase):
+    source = test_util.path('fdsnws-dataselect_2020-03-28t21_11_14z.mseed')
+
+    def channels(self, **kwargs):
+        return [record.channel_code for record in seed.read(self.source, decompress=True, **kwargs)]
+
+    def test_channel(self):
+        self.assertEqual(['BHE', 'BHN', 'BHZ'], sorted(self.channels(channel='BH?')))
+
+    def test_location(self):
+        self.assertEqual(8, len(self.channels(location='--')))
+        self.assertEqual(['LCE', 'LCO', 'LEP', 'LIM'], sorted(self.channels(location='EP')))
+
+    def test_quality(self):
+        self.assertEqual([], self.channels(quality='D'))
+        self.assertEqual(12, len(self.channels(quality='M')))
+
+    def test_sample_rate(self):
+        self.assertEqual(9, len(self.channels(sample_rate=1)))
+
+    def test_matching_record_has_payload(self):
+        with RecordIterator(self.source, channel='LHZ') as iterator:
+            records = list(iterator)
+        self.assertEqual(1, len(records))
+        self.assertIsNotNone(records[0].data)
+
+    def test_stream(self):
+        with open(self.source, 'rb') as file:
+            data = file.read()
+        with RecordIterator(PipeReader(data), decompress=True, channel='BH?') as iterator:
+            self.assertEqual(['BHE', 'BHN', 'BHZ'], sorted(record.channel_code for record in iterator))
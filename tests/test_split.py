@@ -0,0 +1,55 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import seed
+import test_util
+from seedio import RawRecordIterator
+from test_sds import shift_record
+from test_stream_parser import PipeReader
+
+
+class TestSplit(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open(test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed'), 'rb') as file:
+            data = file.read()
+        self.anmo = [data[i:i + 512] for i in range(0, len(data), 512)]
+        with open(test_util.path('fdsnws-dataselect_2020-03-28t21_11_14z.mseed'), 'rb') as file:
+            data = file.read()
+        self.n25k = [data[i:i + 512] for i in range(0, len(data), 512)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self, name: str) -> bytes:
+        with open(os.path.join(self.directory, name), 'rb') as file:
+            return file.read()
+
+    def test_raw_records(self):
+        with RawRecordIterator(b''.join(self.n25k)) as iterator:
+            records = [(header.channel_identifier, bytes(b_bytes)) for header, b_bytes in iterator]
+        self.assertEqual(self.n25k, [b_bytes for channel, b_bytes in records])
+        self.assertEqual('BHE', records[0][0])
+
+    def test_split(self):
+        multiplexed = list()
+        for i, record in enumerate(self.anmo[0:100]):
+            multiplexed.append(record)
+            if i < len(self.n25k):
+                multiplexed.append(self.n25k[i])
+        written = seed.split(PipeReader(b''.join(multiplexed)), self.directory, max_open_files=4)
+        self.assertEqual(13, len(written))
+        self.assertEqual(b''.join(self.anmo[0:100]), self.read('IU.ANMO.00.BHZ.mseed'))
+        self.assertEqual(self.n25k[2], self.read('TA.N25K..BHZ.mseed'))
+        self.assertEqual(100, written[os.path.join(self.directory, 'IU.ANMO.00.BHZ.mseed')])
+
+    def test_split_by_day(self):
+        records = self.anmo[0:10] + [shift_record(record, datetime.timedelta(days=1)) for record in self.anmo[10:20]]
+        seed.split(b''.join(records), self.directory, by_day=True)
+        self.assertEqual(['IU.ANMO.00.BHZ.2010.058.mseed', 'IU.ANMO.00.BHZ.2010.059.mseed'],
+                         sorted(os.listdir(self.directory)))
+        self.assertEqual(b''.join(records[10:20]), self.read('IU.ANMO.00.BHZ.2010.059.mseed'))
@@ -0,0 +1,89 @@
+import io
+import os
+import threading
+import unittest
+
+import seed
+import test_util
+from seedio import RecordIterator, StreamParser, find_record_length
+
+
+class PipeReader(io.RawIOBase):
+    """A non-seekable source returning short reads, like a pipe or a socket."""
+
+    def __init__(self, data: bytes, chunk_size: int = 1000):
+        self._data = data
+        self._position = 0
+        self._chunk_size = chunk_size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def readinto(self, b):
+        size = min(len(b), self._chunk_size, len(self._data) - self._position)
+        b[0:size] = self._data[self._position:self._position + size]
+        self._position += size
+        return size
+
+
+class TestStreamParser(unittest.TestCase):
+
+    def setUp(self):
+        with open(test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed'), 'rb') as file:
+            self.data = file.read()
+
+    def test_find_record_length(self):
+        self.assertEqual(512, find_record_length(self.data))
+        self.assertEqual(512, find_record_length(self.data[0:512], eof=True))
+        with self.assertRaises(SyntaxError):
+            find_record_length(self.data[0:300], eof=False)
+
+    def test_next_record(self):
+        with StreamParser(PipeReader(self.data), block_size=2 ** 15 + 8) as parser:
+            self.assertEqual(512, parser.record_length)
+            count = 0
+            while True:
+                record = parser.next_record()
+                if record is None:
+                    break
+                self.assertEqual(count * 512 + 512, parser.byte_offset())
+                self.assertEqual(448, len(record.data))
+                count += 1
+            self.assertEqual(1243, count)
+
+    def test_pipe_record_before_close(self):
+        read, write = os.pipe()
+        records = list()
+        with open(read, 'rb', buffering=0) as reader, open(write, 'wb', buffering=0) as writer:
+            writer.write(self.data[0:512])
+            parser = list()
+
+            def first_record():
+                parser.append(StreamParser(reader))
+                records.append(parser[0].next_record())
+
+            thread = threading.Thread(target=first_record, daemon=True)
+            thread.start()
+            thread.join(5)
+            self.assertEqual(1, len(records))
+            self.assertEqual(self.data[64:512], records[0].data)
+            writer.write(self.data[512:1024])
+            self.assertEqual(self.data[512 + 64:1024], parser[0].next_record().data)
+
+    def test_truncated_record(self):
+        with StreamParser(PipeReader(self.data[0:1000])) as parser:
+            self.assertIsNotNone(parser.next_record())
+            with self.assertRaises(IOError):
+                parser.next_record()
+
+    def test_iterate_non_seekable(self):
+        expected = [record.header.sequence_number for record in seed.read(self.data)]
+        with RecordIterator(PipeReader(self.data), header_only=True) as iterator:
+            actual = [record.header.sequence_number for record in iterator]
+        self.assertEqual(expected, actual)
+
+    def test_count_non_seekable(self):
+        self.assertEqual(1243, seed.count(PipeReader(self.data)))
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import seed
+import test_util
+from seedio import CorruptRecordError, RecordIterator
+from test_stream_parser import PipeReader
+
+
+class TestTolerant(unittest.TestCase):
+    source = test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed')
+
+    def setUp(self):
+        with open(self.source, 'rb') as file:
+            self.data = file.read()
+        self.expected = [list(record.samples) for record in seed.read(self.data, True)]
+
+    def read(self, source, **kwargs):
+        errors = list()
+        with RecordIterator(source, decompress=True, tolerant=True, on_error=errors.append, **kwargs) as iterator:
+            samples = [list(record.samples) for record in iterator]
+            return samples, errors, iterator
+
+    def test_clean_file(self):
+        samples, errors, iterator = self.read(self.data)
+        self.assertEqual(self.expected, samples)
+        self.assertEqual([], errors)
+        self.assertEqual(0, iterator.skipped_bytes)
+
+    def test_corrupt_header(self):
+        data = bytearray(self.data)
+        data[5 * 512 + 20:5 * 512 + 22] = b'\xff\xff'
+        samples, errors, iterator = self.read(bytes(data))
+        self.assertEqual(self.expected[:5] + self.expected[6:], samples)
+        self.assertEqual([5 * 512], [error.offset for error in errors])
+        self.assertEqual(1, iterator.corrupt_records)
+        self.assertEqual(511, iterator.skipped_bytes)
+
+    def test_read_reports_errors(self):
+        data = bytearray(self.data)
+        data[5 * 512 + 20:5 * 512 + 22] = b'\xff\xff'
+        errors = list()
+        records = seed.read(bytes(data), True, tolerant=True, on_error=errors.append)
+        self.assertEqual(self.expected[:5] + self.expected[6:], [list(record.samples) for record in records])
+        self.assertEqual([5 * 512], [error.offset for error in errors])
+
+    def test_corrupt_first_record(self):
+        data = bytearray(self.data)
+        data[0:6] = b'xxxxxx'
+        samples, errors, iterator = self.read(PipeReader(bytes(data)))
+        self.assertEqual(self.expected[1:], samples)
+        self.assertEqual([0], [error.offset for error in errors])
+
+    def test_corrupt_payload(self):
+        data = bytearray(self.data)
+        data[20 * 512 + 64:21 * 512] = bytes(448)
+        for workers in (None, 2):
+            samples, errors, iterator = self.read(bytes(data), workers=workers)
+            self.assertEqual(self.expected[:20] + self.expected[21:], samples)
+            self.assertEqual([20 * 512], [error.offset for error in errors])
+            self.assertEqual(0, iterator.skipped_bytes)
+
+    def test_missing_bytes(self):
+        data = bytearray(self.data)
+        del data[30 * 512 + 100:30 * 512 + 300]
+        samples, errors, iterator = self.read(bytes(data))
+        self.assertEqual(self.expected[:30] + self.expected[32:], samples)
+        self.assertEqual(2, iterator.corrupt_records)
+        self.assertEqual(311, iterator.skipped_bytes)
+
+    def test_truncated_end(self):
+        samples, errors, iterator = self.read(self.data[:-100])
+        self.assertEqual(self.expected[:-1], samples)
+        self.assertEqual(1, len(errors))
+
+    def test_reports_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'corrupt.mseed')
+            data = bytearray(self.data)
+            data[7 * 512 + 20:7 * 512 + 22] = b'\xff\xff'
+            with open(path, 'wb') as file:
+                file.write(data)
+            samples, errors, iterator = self.read(path)
+            self.assertEqual(1, len(errors))
+            self.assertIsInstance(errors[0], CorruptRecordError)
+            self.assertEqual(path, errors[0].name)
+            self.assertIn(f'{path} at byte offset {7 * 512}', str(errors[0]))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_strict_mode_raises(self):
+        data = bytearray(self.data)
+        data[5 * 512 + 20:5 * 512 + 22] = b'\xff\xff'
+        with self.assertRaises(ValueError):
+            seed.read(bytes(data), True)
@@ -50,7 +50,7 @@ class TestTrace(unittest.TestCase):
         trace.add(record)
         print('===========22222')
 
-        self.assertEqual(1, len(trace.segments))
+        self.assertEqual(4, len(trace.segments))
         print(trace.x)
         print(trace.y)
 
@@ -75,6 +75,32 @@ class TestTrace(unittest.TestCase):
         pyplot.plot(trace.x, trace.y)
         pyplot.show()
 
+    def test_add_sorted(self):
+        trace = Trace()
+        start_time: datetime.datetime = datetime.datetime(year=2010, month=7, day=12, hour=11, minute=11, second=11)
+
+        def add(seconds: float, samples: list):
+            header: DataHeader = DataHeader(sequence_number=1, record_type='M', network_code='IU',
+                                            station_identifier_code='ANMO', location_identifier='00',
+                                            channel_identifier='BHZ',
+                                            record_start_time=start_time + datetime.timedelta(seconds=seconds))
+            trace.add(DecompressedRecord(header=header, sample_rate=20, samples=samples))
+
+        add(1.0, [20, 21, 22, 23])
+        add(0.0, [0, 1, 2, 3])
+        add(2.0, [40, 41])
+        self.assertEqual(3, len(trace.segments))
+        add(0.2, list(range(4, 20)))
+        self.assertEqual(2, len(trace.segments))
+        self.assertEqual(list(range(0, 24)), list(trace.segments[0].samples))
+        add(1.2, list(range(24, 40)))
+        self.assertEqual(1, len(trace.segments))
+        self.assertEqual(list(range(0, 42)), list(trace.segments[0].samples))
+        add(2.5, [50])
+        self.assertEqual(2, len(trace.segments))
+        self.assertEqual(start_time, trace.start_time)
+        self.assertEqual(start_time + datetime.timedelta(seconds=2.5), trace.end_time)
+
     def test_trace(self):
         with importlib.resources.path('tests',
                                       'fdsnws-dataselect_IU_ANMO_00_BHZ_2020-02-27t06:30:00.000_2020-02-27t10:30:00.000.mseed') as file, \
@@ -0,0 +1,95 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import seed
+import test_util
+from translate import sample_rate_factors, to_ms3, translate, translate_files
+
+
+class TestTranslate(unittest.TestCase):
+    source = test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.expected = seed.read(self.source, decompress=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertSameRecords(self, records):
+        self.assertEqual(len(self.expected), len(records))
+        for expected, record in zip(self.expected, records):
+            self.assertEqual(list(expected.samples), list(record.samples))
+            self.assertEqual(expected.start_time_ns, record.start_time_ns)
+            self.assertEqual(expected.sample_rate, record.sample_rate)
+            self.assertEqual(expected.record_type, record.record_type)
+            self.assertEqual(expected.source_id, record.source_id)
+
+    def test_to_ms3(self):
+        output = io.BytesIO()
+        self.assertEqual(len(self.expected), translate(self.source, output))
+        records = seed.read(output.getvalue(), decompress=True, verify_crc=True)
+        self.assertSameRecords(records)
+        self.assertEqual({'FDSN': {'DataQuality': 'M', 'Sequence': 1, 'Time': {'Quality': 100}}},
+                         records[0].extra_headers)
+        self.assertEqual(4, records[0].header.publication_version)
+        self.assertEqual(0x04, records[0].header.flags)
+
+    def test_payload_copied(self):
+        with open(self.source, 'rb') as file:
+            data = file.read(512)
+        record = seed.read(bytes(to_ms3(data)))[0]
+        self.assertEqual(0, len(record.data) % 64)
+        self.assertEqual(data[64:64 + len(record.data)], record.data)
+
+    def test_round_trip(self):
+        ms3 = os.path.join(self.directory, 'anmo.ms3')
+        translate(self.source, ms3)
+        mseed = os.path.join(self.directory, 'anmo.mseed')
+        self.assertEqual(len(self.expected), translate(ms3, mseed, version=2, record_length=512))
+        self.assertSameRecords(seed.read(mseed, decompress=True))
+        with open(self.source, 'rb') as source, open(mseed, 'rb') as translated:
+            first, second = source.read(512), translated.read(512)
+        self.assertEqual(first[0:20], second[0:20])
+        self.assertEqual(first[64:], second[64:])
+
+    def test_record_too_long(self):
+        ms3 = io.BytesIO()
+        translate(self.source, ms3)
+        with self.assertRaises(ValueError):
+            translate(ms3.getvalue(), io.BytesIO(), version=2, record_length=256)
+
+    def test_sample_rate_factors(self):
+        self.assertEqual((20, 1, True), sample_rate_factors(20.0))
+        self.assertEqual((-10, 1, True), sample_rate_factors(0.1))
+        factor, multiplier, exact = sample_rate_factors(19.98)
+        self.assertFalse(exact)
+        self.assertAlmostEqual(19.98, factor / -multiplier)
+
+    def test_translate_files(self):
+        translated, errors = translate_files([self.source, test_util.path('test_util.py')], self.directory)
+        self.assertEqual({}, errors)
+        destination, count = translated[self.source]
+        self.assertEqual(os.path.join(self.directory, 'fdsnws-dataselect_2021-10-16t19_00_21z.ms3'), destination)
+        self.assertEqual(len(self.expected), count)
+        self.assertSameRecords(seed.read(destination, decompress=True))
+
+    def test_translate_files_with_same_names(self):
+        sources = [os.path.join(self.directory, name, 'IU.ANMO.mseed') for name in ('a', 'b')]
+        for path in sources:
+            os.makedirs(os.path.dirname(path))
+            shutil.copy(self.source, path)
+        output = os.path.join(self.directory, 'output')
+        for workers in (None, 2):
+            translated, errors = translate_files(sources, output, workers=workers)
+            self.assertEqual({}, errors)
+            self.assertEqual({sources[0]: (os.path.join(output, 'a', 'IU.ANMO.ms3'), len(self.expected)),
+                              sources[1]: (os.path.join(output, 'b', 'IU.ANMO.ms3'), len(self.expected))}, translated)
+            for destination, count in translated.values():
+                self.assertSameRecords(seed.read(destination, decompress=True))
+        shutil.copy(self.source, os.path.join(self.directory, 'a', 'IU.ANMO.msd'))
+        with self.assertRaises(ValueError):
+            translate_files(os.path.join(self.directory, 'a'), output)
@@ -0,0 +1,160 @@
+import datetime
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import seed
+import test_util
+from buffer import ByteOrder
+from codec import EncodingFormat
+from model import datetime_to_ns
+from seedfile import SeedFile
+from translate import B1000_BLOCKETTE, DATA_HEADER
+from writer import RecordWriter
+
+
+class TestWriter(unittest.TestCase):
+    source = test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed')
+
+    def setUp(self):
+        self.expected = seed.read(self.source, decompress=True)
+        self.samples = [sample for record in self.expected for sample in record.samples]
+        self.start = datetime.datetime(2021, 10, 16, 19, 0, 21, 123456)
+
+    def write(self, **kwargs):
+        output = io.BytesIO()
+        with RecordWriter(output, **kwargs) as writer:
+            writer.write('IU', 'ANMO', '00', 'BHZ', self.start, 20.0, self.samples)
+        return output.getvalue()
+
+    def assertSamples(self, data, samples, record_length):
+        records = seed.read(data, decompress=True)
+        self.assertEqual(0, len(data) % record_length)
+        self.assertEqual(len(data) // record_length, len(records))
+        self.assertEqual(list(samples), [sample for record in records for sample in record.samples])
+        self.assertEqual(datetime_to_ns(self.start), records[0].start_time_ns)
+        for previous, record in zip(records, records[1:]):
+            self.assertEqual(previous.end_time_ns + 50000000, record.start_time_ns)
+        return records
+
+    def test_steim2(self):
+        data = self.write(record_length=512)
+        records = self.assertSamples(data, self.samples, 512)
+        self.assertLessEqual(len(records), len(self.expected))
+        self.assertEqual(['%06d' % (i + 1) for i in range(len(records))],
+                         [record.header.sequence_number for record in records])
+        self.assertEqual(7, records[0].blockette(1001).frame_count)
+        self.assertEqual(('IU', 'ANMO', '00', 'BHZ', 20.0), (records[0].network_code, records[0].station_code,
+                                                             records[0].channel_location_code,
+                                                             records[0].channel_code, records[0].sample_rate))
+
+    def test_encodings_and_byte_orders(self):
+        for encoding_format in (EncodingFormat.STEIM_1, EncodingFormat.THIRTY_TOW_BIT,
+                                EncodingFormat.IEEE_DOUBLE):
+            for byte_order in (ByteOrder.BIG_ENDIAN, ByteOrder.LITTLE_ENDIAN):
+                data = self.write(record_length=1024, encoding_format=encoding_format, byte_order=byte_order)
+                records = self.assertSamples(data, self.samples, 1024)
+                self.assertEqual(encoding_format, records[0].encoding_format)
+
+    def test_continuation(self):
+        output = io.BytesIO()
+        half = len(self.samples) // 2
+        with RecordWriter(output, record_length=512) as writer:
+            writer.write('IU', 'ANMO', '00', 'BHZ', self.start, 20.0, self.samples[0:half])
+            writer.write('IU', 'ANMO', '00', 'BHZ', self.start + datetime.timedelta(seconds=half / 20), 20.0,
+                         self.samples[half:])
+        self.assertSamples(output.getvalue(), self.samples, 512)
+
+    def test_sequence_number_wraps(self):
+        output = io.BytesIO()
+        with RecordWriter(output, record_length=256, sequence_number=999999) as writer:
+            self.assertEqual(2, writer.write('IU', 'ANMO', '00', 'BHZ', self.start, 20.0, self.samples[0:200]))
+        records = seed.read(output.getvalue())
+        self.assertEqual(['999999', '000001'], [record.header.sequence_number for record in records])
+
+    def test_write_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'anmo.mseed')
+            trace = seed.trace(self.source, decompress=True)
+            self.assertEqual(seed.write(path, [trace]), seed.count(path))
+            with SeedFile.open(path, mode='a', record_length=4096) as writer:
+                writer.write('IU', 'ANMO', '10', 'BHZ', self.start, 19.98, self.samples[0:100])
+            records = seed.read(path, channel='BHZ', location='10', decompress=True)
+            self.assertEqual(self.samples[0:100], list(records[0].samples))
+            self.assertAlmostEqual(19.98, records[0].sample_rate, places=4)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            RecordWriter(io.BytesIO(), record_length=1000)
+        with self.assertRaises(ValueError):
+            RecordWriter(io.BytesIO(), encoding_format=EncodingFormat.ASCII)
+        with RecordWriter(io.BytesIO()) as writer:
+            with self.assertRaises(ValueError):
+                writer.write('IU', 'ANMO', '00', 'BHZZ', self.start, 20.0, self.samples)
+
+
+class TestReformat(unittest.TestCase):
+    source = test_util.path('fdsnws-dataselect_2021-10-16t19_00_21z.mseed')
+
+    def setUp(self):
+        self.expected = seed.read(self.source, decompress=True)
+
+    def test_reformat(self):
+        output = io.BytesIO()
+        count = seed.reformat(self.source, output, record_length=4096)
+        data = output.getvalue()
+        self.assertEqual(count * 4096, len(data))
+        self.assertLess(count, len(self.expected) // 4)
+        records = seed.read(data, decompress=True)
+        self.assertEqual([sample for record in self.expected for sample in record.samples],
+                         [sample for record in records for sample in record.samples])
+        self.assertEqual(self.expected[0].start_time_ns, records[0].start_time_ns)
+        self.assertEqual(self.expected[-1].end_time_ns, records[-1].end_time_ns)
+        self.assertEqual({self.expected[0].record_type}, {record.record_type for record in records})
+
+    def test_gap_and_quality(self):
+        with open(self.source, 'rb') as file:
+            data = bytearray(file.read(512 * 30))
+        del data[512 * 10:512 * 11]
+        data[512 * 20 + 6:512 * 20 + 7] = b'Q'
+        expected = seed.read(bytes(data), decompress=True)
+        output = io.BytesIO()
+        seed.reformat(bytes(data), output, record_length=1024, encoding_format=EncodingFormat.STEIM_1)
+        records = seed.read(output.getvalue(), decompress=True)
+        starts = {record.start_time_ns for record in records}
+        for i in (0, 10, 20, 21):
+            self.assertIn(expected[i].start_time_ns, starts)
+        self.assertEqual(['M', 'Q', 'M'], [record_type for i, record_type in enumerate(
+            [record.record_type for record in records]) if i == 0 or record_type != records[i - 1].record_type])
+        self.assertEqual({EncodingFormat.STEIM_1}, {record.encoding_format for record in records})
+        self.assertEqual([sample for record in expected for sample in record.samples],
+                         [sample for record in records for sample in record.samples])
+
+    def test_log_record_passed_through(self):
+        with open(self.source, 'rb') as file:
+            data = file.read(512 * 30)
+        text = b'clock locked to GPS'
+        log = bytearray(512)
+        DATA_HEADER.pack_into(log, 0, b'000011', b'D', b' ', b'ANMO ', b'00', b'LOG', b'IU', 2021, 289, 19, 0, 30, 0, 0,
+                              len(text), 0, 0, 0, 0, 0, 1, 0, 64, 48)
+        B1000_BLOCKETTE.pack_into(log, 48, 1000, 0, EncodingFormat.ASCII, 1, 9, 0)
+        log[64:64 + len(text)] = text
+        expected = seed.read(data, decompress=True)
+        output = io.BytesIO()
+        count = seed.reformat(data[0:512 * 10] + bytes(log) + data[512 * 10:], output, record_length=1024)
+        result = output.getvalue()
+        position = result.index(bytes(log))
+        self.assertEqual(0, position % 1024)
+        before = seed.read(result[0:position], decompress=True)
+        after = seed.read(result[position + 512:], decompress=True)
+        self.assertEqual(count, len(before) + 1 + len(after))
+        self.assertEqual([sample for record in expected[0:10] for sample in record.samples],
+                         [sample for record in before for sample in record.samples])
+        self.assertEqual([sample for record in expected[10:] for sample in record.samples],
+                         [sample for record in after for sample in record.samples])
+        self.assertEqual(expected[10].start_time_ns, after[0].start_time_ns)
@@ -1,5 +1,6 @@
 import datetime
-from collections import MutableSequence
+from bisect import bisect_right
+from collections import MutableSequence, deque
 from typing import Union
 
 import array
@@ -9,7 +10,7 @@ import math
 import numpy
 from pint import Unit
 
-from model import DecompressedRecord
+from model import DecompressedRecord, ns_to_datetime
 from objectidentifier import ObjectIdentifier
 from units import ureg
 
@@ -69,7 +70,27 @@ class Epoch:
         return self.is_after_or_equal(other)
 
 
+def as_samples(samples, copy: bool = False) -> array.array:
+    """samples as an array of 32 bit integers or, when they are floating point, of doubles.
+
+    Arrays of either type are returned as they are unless copy is set.
+    """
+    if isinstance(samples, array.array):
+        if samples.typecode in ('i', 'd'):
+            return array.array(samples.typecode, samples) if copy else samples
+        return array.array('d' if samples.typecode == 'f' else 'i', samples)
+    floating = any(isinstance(sample, float) for sample in samples)
+    return array.array('d' if floating else 'i', samples)
+
+
 class Segment(Epoch):
+    """Evenly sampled data from start_time on.
+
+    Samples are held as a list of arrays of 32 bit integers or doubles, joined into one array only when
+    samples is read, so appending or prepending a record costs no more than the record itself. An overlap
+    is resolved by overwriting the samples it covers.
+    """
+
     def __init__(self, start_time: datetime, sample_rate: int, samples: Union[list[int], MutableSequence[int]]):
         if start_time is None:
             raise ValueError
@@ -82,41 +103,100 @@ class Segment(Epoch):
         end_time: datetime = start_time + datetime.timedelta(milliseconds=milli_seconds)
         super(Segment, self).__init__(start_time=start_time, end_time=end_time)
         self._sample_rate: int = sample_rate
-        self._samples = samples
+        samples = as_samples(samples)
+        self._typecode: str = samples.typecode
+        self._chunks: deque = deque([samples])
+        self._length: int = length
 
     @property
     def sample_rate(self) -> int:
         return self._sample_rate
 
     @property
-    def samples(self) -> list[int]:
-        return self._samples
+    def samples(self) -> array.array:
+        if len(self._chunks) > 1 or self._chunks[0].typecode != self._typecode:
+            samples = array.array(self._typecode)
+            for chunk in self._chunks:
+                samples.extend(chunk if chunk.typecode == self._typecode else array.array(self._typecode, chunk))
+            self._chunks = deque([samples])
+        return self._chunks[0]
+
+    def _update_end_time(self):
+        milli_seconds = ((self._length - 1) / self.sample_rate) * 1000
+        self._end_time = self._start_time + datetime.timedelta(milliseconds=milli_seconds)
+
+    def _compatible(self, samples) -> array.array:
+        """samples as an array, an integer segment turns into doubles once floats join it."""
+        samples = as_samples(samples)
+        if samples.typecode == 'd':
+            self._typecode = 'd'
+        return samples
+
+    def append(self, samples):
+        """Append samples continuing this segment."""
+        samples = self._compatible(samples)
+        self._chunks.append(samples)
+        self._length += len(samples)
+        self._update_end_time()
+
+    def extend(self, other: 'Segment'):
+        """Append the samples of other, which continues this segment, without copying them."""
+        if other is None:
+            raise ValueError
+        if other._typecode == 'd':
+            self._typecode = 'd'
+        self._chunks.extend(other._chunks)
+        self._length += other._length
+        self._update_end_time()
 
     def merge(self, other: 'Segment'):
+        """Merge other into this segment in place, where they overlap the samples of other win.
+
+        other has to overlap this segment or continue or be continued by it within half a sample period.
+        """
         if other is None:
             raise ValueError
-        if self.overlap(other):
-            if self <= other:
-                duration = other.start_time - self.start_time
-                index: int = math.floor(duration.total_seconds() * self.sample_rate)
-                new_list = self.samples[0:index]
-                new_list += other.samples
-                self._samples = new_list
-                #self._end_time = other.end_time
+        if self.precedes(other):
+            self.extend(other)
+            return
+        if other.precedes(self):
+            if other._typecode == 'd':
+                self._typecode = 'd'
+            self._chunks.extendleft(reversed(other._chunks))
+            self._length += other._length
+            self._start_time = other.start_time
+            self._update_end_time()
+            return
+        if not self.overlap(other):
+            raise ValueError(f'{other} is neither contiguous with nor overlapping {self}')
+        samples = self._compatible(other.samples)
+        target = self.samples
+        if samples.typecode != target.typecode:
+            samples = array.array(target.typecode, samples)
+        if self <= other:
+            index: int = round((other.start_time - self.start_time).total_seconds() * self.sample_rate)
+            if index + len(samples) <= len(target):
+                target[index:index + len(samples)] = samples
             else:
-                duration = self.start_time - other.start_time
-                index: int = duration * self.sample_rate
-                new_list = other.samples[0:index]
-                new_list += self.samples[len(other.samples) - index:len(self)]
-                self._samples = new_list
-                #self._start_time = other.start_time
-        elif self <= other:
-            self._samples += other.samples
-            self._end_time = other.end_time
+                del target[min(index, len(target)):]
+                target.extend(samples)
         else:
-            #self._samples = other.samples.extend(self._samples)
-            self._samples = other.samples + self._samples
+            index: int = round((self.start_time - other.start_time).total_seconds() * self.sample_rate)
+            target[0:max(0, len(samples) - index)] = samples
             self._start_time = other.start_time
+        self._length = len(target)
+        self._update_end_time()
+
+    def precedes(self, other: 'Segment') -> bool:
+        """True when other continues this segment, its first sample following the last one of this
+        segment within half a sample period."""
+        if other is None:
+            raise ValueError
+        if not self.can_tolerable(other):
+            return False
+        half_period_in_milli_seconds: float = ((1 / self.sample_rate) / 2) * 1000
+        expected = self.end_time + datetime.timedelta(seconds=1 / self.sample_rate)
+        return abs(other.start_time - expected) <= datetime.timedelta(milliseconds=half_period_in_milli_seconds)
 
     def index(self, time: datetime.datetime) -> int:
         if time is None:
@@ -133,20 +213,16 @@ class Segment(Epoch):
         return abs(1.0 - (self.sample_rate / other.sample_rate)) < 0.0001
 
     def __getitem__(self, item):
-        if self._samples is None:
-            return IndexError
         if isinstance(item, slice):
             result = []
             if item.stop is not None and item.stop > len(self):
                 raise IndexError
-            return self._samples[item.start:item.stop:item.step]
+            return self.samples[item.start:item.stop:item.step]
         else:
-            return self._samples[item]
+            return self.samples[item]
 
     def __len__(self):
-        if self._samples is None:
-            return 0
-        return len(self._samples)
+        return self._length
 
     def __str__(self):
         return f'start_time:{self.start_time.isoformat()} <> end_time:{self.end_time.isoformat()}, number_of_samples:{len(self)}'
@@ -161,6 +237,8 @@ class Trace:
             self._object_identifier = None
         self._quality: str = None
         self._segments = list()
+        # start times of the segments, kept sorted for bisection
+        self._start_times = list()
 
     @property
     def object_identifier(self) -> ObjectIdentifier:
@@ -246,23 +324,49 @@ class Trace:
                                                            location=record.channel_location_code,
                                                            channel=record.channel_code):
                 raise ValueError
-        new_segment = Segment(start_time=record.start_time, sample_rate=record.sample_rate,
+        new_segment = Segment(start_time=ns_to_datetime(record.start_time_ns), sample_rate=record.sample_rate,
                               samples=record.samples)
-        sample_rate: int = new_segment.sample_rate
-        if sample_rate is None:
+        if new_segment.sample_rate is None:
             raise ValueError
-
-        half_period_in_milli_seconds: float = ((1 / sample_rate) / 2) * 1000
-        if self._segments and len(self._segments) > 0:
-            for segment in self._segments:
-                segment.merge(new_segment)
-        else:
-            self._segments.append(new_segment)
+        self._insert(new_segment)
         if not self._quality:
             self._quality = record.record_type
         elif self._quality != record.record_type:
             self._quality = 'M'
 
+    def _insert(self, segment: Segment):
+        """Join segment to the segment before or after it when it continues or is continued by them,
+        otherwise insert it in start time order. Either way finding the place is a bisection."""
+        index = bisect_right(self._start_times, segment.start_time)
+        previous = self._segments[index - 1] if index > 0 else None
+        following = self._segments[index] if index < len(self._segments) else None
+        if previous is not None and previous.precedes(segment):
+            previous.append(segment.samples)
+            if following is not None and previous.precedes(following):
+                previous.extend(following)
+                del self._segments[index]
+                del self._start_times[index]
+        elif following is not None and segment.precedes(following):
+            following.merge(segment)
+            self._start_times[index] = following.start_time
+        else:
+            # a segment of its own keeps growing, so it must not share the samples of the record
+            self._segments.insert(index, Segment(start_time=segment.start_time, sample_rate=segment.sample_rate,
+                                                 samples=as_samples(segment.samples, copy=True)))
+            self._start_times.insert(index, segment.start_time)
+
+    def add_segment(self, segment: Segment, quality: str = None):
+        if segment is None or not isinstance(segment, Segment):
+            raise ValueError
+        index = bisect_right(self._start_times, segment.start_time)
+        self._segments.insert(index, segment)
+        self._start_times.insert(index, segment.start_time)
+        if quality:
+            if not self._quality:
+                self._quality = quality
+            elif self._quality != quality:
+                self._quality = 'M'
+
     def plot(self, title: str = None, unit: Unit = None, color: str = 'blue', show_grid: bool = True,
              line_width: float = 0.5):
         kind, unit, convert = get_converter(unit)
@@ -0,0 +1,300 @@
+import datetime
+import os
+import struct
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from typing import Optional
+
+from buffer import ByteOrder
+from catalog import SCAN_CHUNK_SIZE, find_files, is_seed_file
+from codec import EncodingFormat
+from model import DataHeader, DataHeaderV3, DataRecord, EPOCH, STEIM_ENCODINGS
+from seedio import DEFAULT_BLOCK_SIZE, open_raw_records, parse_record, record_crc
+from selection import normalize_location
+
+STEIM_FRAME_LENGTH = 64
+SAMPLE_WIDTHS = {EncodingFormat.SIXTEEN_BIT: 2, EncodingFormat.THIRTY_TOW_BIT: 4,
+                 EncodingFormat.IEEE_FLOATING_POINT: 4, EncodingFormat.IEEE_DOUBLE: 8}
+PUBLICATION_VERSIONS = {'R': 1, 'D': 2, 'Q': 3, 'M': 4}
+DATA_HEADER = struct.Struct('>6sss5s2s3s2sHHBBBBHHhhBBBBiHH')
+B1000_BLOCKETTE = struct.Struct('>HHBBBB')
+B1001_BLOCKETTE = struct.Struct('>HHBbBB')
+B100_BLOCKETTE = struct.Struct('>HHfBBBB')
+# miniSEED 3 flag bits and the miniSEED 2 (flag field, bit) they come from
+MS3_FLAGS = ((0x01, 'activity_flags', 0x01), (0x02, 'data_quality_flags', 0x80), (0x04, 'io_and_clock_flags', 0x20))
+# miniSEED 2 activity flag bits kept as FDSN extra headers
+EVENT_FLAGS = ((0x04, 'Begin'), (0x08, 'End'), (0x40, 'InProgress'))
+
+
+def _swap(payload: bytes, width: int) -> bytes:
+    """payload with the byte order of every width byte word reversed."""
+    if width == 8:
+        words = array('d')
+    elif width == 4:
+        words = array('i')
+    else:
+        words = array('h')
+    words.frombytes(payload)
+    words.byteswap()
+    return words.tobytes()
+
+
+def _payload_length(record: DataRecord, payload: bytes) -> int:
+    """Bytes of the payload holding data, unused trailing Steim frames and padding excluded."""
+    encoding = record.encoding_format
+    if encoding in STEIM_ENCODINGS:
+        length = len(payload) - len(payload) % STEIM_FRAME_LENGTH
+        b1001 = record.blockette(1001)
+        if b1001 is not None and b1001.frame_count:
+            return min(length, b1001.frame_count * STEIM_FRAME_LENGTH)
+        while length > 0 and not any(payload[length - STEIM_FRAME_LENGTH:length]):
+            length -= STEIM_FRAME_LENGTH
+        return length
+    if encoding in SAMPLE_WIDTHS:
+        return min(len(payload), record.number_of_samples * SAMPLE_WIDTHS[encoding])
+    if encoding == EncodingFormat.ASCII:
+        return len(payload.rstrip(b'\x00'))
+    raise ValueError(f'Cannot translate records of encoding {encoding}')
+
+
+def _payload(record: DataRecord, payload: bytes, byte_order: ByteOrder) -> bytes:
+    """The payload of record, trimmed and in byte_order. Steim payloads, single bytes and payloads already in
+    byte_order are copied unchanged."""
+    payload = payload[0:_payload_length(record, payload)]
+    if record.byte_order == byte_order or record.encoding_format == EncodingFormat.ASCII:
+        return payload
+    if record.encoding_format in STEIM_ENCODINGS:
+        return _swap(payload, 4)
+    return _swap(payload, SAMPLE_WIDTHS[record.encoding_format])
+
+
+def to_ms3(b_bytes) -> bytearray:
+    """The miniSEED 3 record of one miniSEED 2 record.
+
+    The start time includes the B1001 microseconds and any pending time correction, the sample rate comes
+    from B100 when present and a rate below one sample per second is written as a negative period. The
+    quality code sets the publication version and, unless it is 'D', the FDSN.DataQuality extra header.
+    B1001 timing quality, the sequence number, the time correction and event flags go to FDSN extra
+    headers, the CRC is computed over the finished record.
+    """
+    record = parse_record(b_bytes, header_only=True)
+    header = record.header
+    extra = dict()
+    if header.record_type != 'D':
+        extra['DataQuality'] = header.record_type
+    if str(header.sequence_number).strip().isdigit() and int(header.sequence_number):
+        extra['Sequence'] = int(header.sequence_number)
+    b1001 = record.blockette(1001)
+    if b1001 is not None and b1001.timing_quality is not None:
+        extra.setdefault('Time', dict())['Quality'] = b1001.timing_quality
+    if header.time_correction:
+        extra.setdefault('Time', dict())['Correction'] = header.time_correction / 10000
+    activity_flags = header.activity_flags or 0
+    for bit, name in EVENT_FLAGS:
+        if activity_flags & bit:
+            extra.setdefault('Event', dict())[name] = True
+    if activity_flags & 0x10:
+        extra.setdefault('Time', dict())['LeapSecond'] = 1
+    elif activity_flags & 0x20:
+        extra.setdefault('Time', dict())['LeapSecond'] = -1
+    flags = 0
+    for bit, field, source_bit in MS3_FLAGS:
+        if (getattr(header, field) or 0) & source_bit:
+            flags |= bit
+    rate = record.sample_rate or 0.0
+    if 0 < rate < 1:
+        rate = -1.0 / rate
+    start_ns = record.start_time_ns
+    start = EPOCH + datetime.timedelta(seconds=start_ns // 1000000000)
+    payload = _payload(record, bytes(b_bytes[header.beginning_of_data:]), ByteOrder.BIG_ENDIAN
+                       if record.encoding_format in STEIM_ENCODINGS else ByteOrder.LITTLE_ENDIAN)
+    v3 = DataHeaderV3(source_id=record.source_id, start_time_ns=start_ns, encoding_format=record.encoding_format,
+                      number_of_samples=header.number_of_samples, flags=flags,
+                      publication_version=PUBLICATION_VERSIONS.get(header.record_type, 1),
+                      extra_headers={'FDSN': extra} if extra else None, data_length=len(payload))
+    identifier = v3.source_id.encode('ascii')
+    extra_headers = v3.extra_headers_bytes()
+    out = bytearray(v3.beginning_of_data + len(payload))
+    DataHeaderV3.FIXED_HEADER.pack_into(
+        out, 0, b'MS', 3, flags, start_ns % 1000000000, start.year, start.timetuple().tm_yday, start.hour,
+        start.minute, start.second, record.encoding_format, rate, header.number_of_samples, 0,
+        v3.publication_version, len(identifier), len(extra_headers), len(payload))
+    position = DataHeaderV3.LENGTH
+    out[position:position + len(identifier)] = identifier
+    position += len(identifier)
+    out[position:position + len(extra_headers)] = extra_headers
+    out[v3.beginning_of_data:] = payload
+    struct.pack_into('<I', out, DataHeaderV3.CRC_OFFSET, record_crc(out))
+    return out
+
+
+def sample_rate_factors(rate: float) -> tuple[int, int, bool]:
+    """(sample rate factor, sample rate multiplier, exact) of a rate in Hz, exact is False when the pair only
+    approximates the rate and a B100 has to carry it."""
+    if not rate:
+        return 0, 0, True
+    if rate >= 1 and rate == int(rate) and rate <= 32767:
+        return int(rate), 1, True
+    if rate < 1 and 1 / rate == int(1 / rate) and 1 / rate <= 32767:
+        return -int(1 / rate), 1, True
+    fraction = Fraction(rate).limit_denominator(32767)
+    if fraction.numerator > 32767:
+        return 32767, 1, False
+    return fraction.numerator, -fraction.denominator, False
+
+
+def to_ms2(b_bytes, record_length: int, sequence_number: int = 1) -> bytearray:
+    """The big endian miniSEED 2 record of length record_length of one miniSEED 3 record.
+
+    The start time is split into the 0.0001 second BTIME and the B1001 microseconds, nanoseconds below a
+    microsecond are dropped. A B100 carries a sample rate the factor and multiplier cannot express. The
+    quality code comes from FDSN.DataQuality, the sequence number from FDSN.Sequence when present.
+    """
+    record = parse_record(b_bytes, header_only=True)
+    header: DataHeaderV3 = record.header
+    network, station, location, channel = header.network_code, header.station_identifier_code, \
+        normalize_location(header.location_identifier), header.channel_identifier
+    if len(network) > 2 or len(station) > 5 or len(location) > 2 or len(channel) != 3:
+        raise ValueError(f'{header.source_id} has no miniSEED 2 codes')
+    fdsn = header.extra_headers.get('FDSN', dict())
+    sequence_number = fdsn.get('Sequence', sequence_number) % 1000000
+    timing_quality = fdsn.get('Time', dict()).get('Quality')
+    factor, multiplier, exact = sample_rate_factors(record.sample_rate)
+    start_us = header.start_time_ns // 1000
+    start = EPOCH + datetime.timedelta(microseconds=start_us - start_us % 100)
+    microseconds = start_us % 100
+    payload = _payload(record, bytes(b_bytes[header.beginning_of_data:header.record_length]), ByteOrder.BIG_ENDIAN)
+    blockettes = [(B1000_BLOCKETTE, [1000, 0, record.encoding_format, 1, record_length.bit_length() - 1, 0])]
+    if microseconds or timing_quality is not None or record.encoding_format in STEIM_ENCODINGS:
+        frames = len(payload) // STEIM_FRAME_LENGTH if record.encoding_format in STEIM_ENCODINGS else 0
+        blockettes.append((B1001_BLOCKETTE, [1001, 0, timing_quality or 0, microseconds, 0, frames]))
+    if not exact:
+        blockettes.append((B100_BLOCKETTE, [100, 0, record.sample_rate, 0, 0, 0, 0]))
+    position = DATA_HEADER.size
+    for blockette, values in blockettes:
+        position += blockette.size
+    beginning_of_data = -(-position // STEIM_FRAME_LENGTH) * STEIM_FRAME_LENGTH
+    if beginning_of_data + len(payload) > record_length:
+        raise ValueError(f'A record of {beginning_of_data + len(payload)} bytes does not fit in {record_length}')
+    activity_flags = 0x01 if header.flags & 0x01 else 0
+    for bit, name in EVENT_FLAGS:
+        if fdsn.get('Event', dict()).get(name):
+            activity_flags |= bit
+    leap_second = fdsn.get('Time', dict()).get('LeapSecond')
+    if leap_second:
+        activity_flags |= 0x10 if leap_second > 0 else 0x20
+    out = bytearray(record_length)
+    DATA_HEADER.pack_into(
+        out, 0, b'%06d' % sequence_number, header.record_type.encode('ascii'), b' ',
+        station.ljust(5).encode('ascii'), location.ljust(2).encode('ascii'), channel.encode('ascii'),
+        network.ljust(2).encode('ascii'), start.year,
+        start.timetuple().tm_yday, start.hour, start.minute, start.second, 0, start.microsecond // 100,
+        header.number_of_samples, factor, multiplier, activity_flags, 0x20 if header.flags & 0x04 else 0,
+        0x80 if header.flags & 0x02 else 0, len(blockettes), 0, beginning_of_data, DATA_HEADER.size)
+    position = DATA_HEADER.size
+    for i, (blockette, values) in enumerate(blockettes):
+        if i + 1 < len(blockettes):
+            values[1] = position + blockette.size
+        blockette.pack_into(out, position, *values)
+        position += blockette.size
+    out[beginning_of_data:beginning_of_data + len(payload)] = payload
+    return out
+
+
+def translate(source, output, version: int = 3, record_length: int = 4096, block_size: int = DEFAULT_BLOCK_SIZE) \
+        -> int:
+    """Write every record of source to output as a miniSEED version record, in constant memory.
+
+    Records are read raw and only their headers and blockettes are parsed, payloads are copied unchanged
+    unless their byte order has to change. Translated records are batched and written block_size bytes at
+    a time. record_length is the length of the records written when translating back to version 2.
+    Returns the number of records written.
+    """
+    if version not in (2, 3):
+        raise ValueError(f'Expected version 2 or 3 but received {version}')
+    if version == 2 and (record_length is None or record_length & (record_length - 1) or record_length < 256):
+        raise ValueError(f'Expected a power of two record length of at least 256 but received {record_length}')
+    close_output = not hasattr(output, 'write')
+    if close_output:
+        output = open(output, 'wb')
+    count = 0
+    batch = bytearray()
+    try:
+        with open_raw_records(source, block_size=block_size) as records:
+            for header, b_bytes in records:
+                count += 1
+                if version == 3:
+                    if isinstance(header, DataHeaderV3):
+                        batch += b_bytes
+                    else:
+                        batch += to_ms3(b_bytes)
+                elif isinstance(header, DataHeader) and len(b_bytes) == record_length:
+                    batch += b_bytes
+                elif isinstance(header, DataHeader):
+                    raise ValueError(f'Expected records of {record_length} bytes but received {len(b_bytes)}')
+                else:
+                    batch += to_ms2(b_bytes, record_length, sequence_number=count)
+                if len(batch) >= block_size:
+                    output.write(batch)
+                    batch.clear()
+        output.write(batch)
+    finally:
+        if close_output:
+            output.close()
+    return count
+
+
+def _translate_file(arguments: tuple) -> tuple[str, Optional[str], int, Optional[str]]:
+    path, destination, version, record_length = arguments
+    if not is_seed_file(path):
+        return path, None, 0, None
+    try:
+        return path, destination, translate(path, destination, version=version, record_length=record_length), None
+    except Exception as e:
+        try:
+            os.remove(destination)
+        except OSError:
+            pass
+        return path, None, 0, f'{type(e).__name__}: {e}'
+
+
+def translate_files(paths_or_globs, directory, version: int = 3, record_length: int = 4096,
+                    workers: int = None) -> tuple[dict, dict]:
+    """Translate every seed file under paths_or_globs into directory, one file each in a pool of workers
+    processes, as scan does. Outputs are named after their sources with a .ms3 or .mseed extension, at the
+    path of the source relative to the directory all sources share, so same named files of different
+    directories do not overwrite each other.
+
+    Returns ({source path: (output path, records)}, {source path: error}) and files that fail do not stop
+    the others.
+    """
+    os.makedirs(directory, exist_ok=True)
+    extension = '.ms3' if version == 3 else '.mseed'
+    paths = [os.path.abspath(path) for path in find_files(paths_or_globs)]
+    if not paths:
+        return dict(), dict()
+    root = os.path.commonpath([os.path.dirname(path) for path in paths])
+    arguments = list()
+    sources = dict()
+    for path in paths:
+        destination = os.path.join(directory, os.path.splitext(os.path.relpath(path, root))[0] + extension)
+        if destination in sources:
+            raise ValueError(f'{sources[destination]} and {path} would both be translated to {destination}')
+        sources[destination] = path
+        arguments.append((path, destination, version, record_length))
+    for destination in sources:
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_translate_file, arguments, chunksize=SCAN_CHUNK_SIZE))
+    else:
+        results = list(map(_translate_file, arguments))
+    translated = dict()
+    errors = dict()
+    for path, destination, count, error in results:
+        if error is not None:
+            errors[path] = error
+        elif destination is not None:
+            translated[path] = (destination, count)
+    return translated, errors
@@ -0,0 +1,339 @@
+import datetime
+import struct
+from typing import Union
+
+from buffer import ByteOrder
+from codec import EncodingFormat, get_encoder
+from model import DataRecord, EPOCH, STEIM_ENCODINGS
+from seedio import decode_record_data, open_raw_records, parse_record
+from selection import normalize_location, to_ns
+from translate import B100_BLOCKETTE, B1000_BLOCKETTE, B1001_BLOCKETTE, DATA_HEADER, SAMPLE_WIDTHS, \
+    STEIM_FRAME_LENGTH, sample_rate_factors
+
+MAXIMUM_SEQUENCE_NUMBER = 999999
+DEFAULT_BUFFER_SIZE = 2 ** 20
+# most samples one Steim 2 frame holds
+MAXIMUM_FRAME_SAMPLES = 15 * 7
+
+
+def _structs(blockette: struct.Struct) -> dict[ByteOrder, struct.Struct]:
+    return {ByteOrder.BIG_ENDIAN: blockette, ByteOrder.LITTLE_ENDIAN: struct.Struct('<' + blockette.format[1:])}
+
+
+FIXED_HEADERS = _structs(DATA_HEADER)
+B1000_BLOCKETTES = _structs(B1000_BLOCKETTE)
+B1001_BLOCKETTES = _structs(B1001_BLOCKETTE)
+B100_BLOCKETTES = _structs(B100_BLOCKETTE)
+
+
+class RecordWriter:
+    """Encodes sample series into miniSEED 2 records of record_length bytes and writes them to destination.
+
+    Every record carries a B1000 and a B1001, plus a B100 when the factor and multiplier cannot express the
+    sample rate, and holds as many samples as fit. Steim differences continue across records and across
+    writes of the same channel when the new series starts where the previous one ended. Records are packed
+    into a preallocated buffer of buffer_size bytes that is written out whenever it fills up.
+    """
+
+    def __init__(self, destination, mode: str = 'w', record_length: int = 4096,
+                 encoding_format: EncodingFormat = EncodingFormat.STEIM_2,
+                 byte_order: ByteOrder = ByteOrder.BIG_ENDIAN, record_type: str = 'D', sequence_number: int = 1,
+                 timing_quality: int = None, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        if destination is None:
+            raise ValueError
+        if mode not in ('w', 'a', 'x'):
+            raise ValueError("mode must be 'w', 'a' or 'x'")
+        if record_length is None or record_length & (record_length - 1) or not 256 <= record_length <= 2 ** 15:
+            raise ValueError(f'Expected a power of two record length between 256 and 32768 but received '
+                             f'{record_length}')
+        if not record_type or len(record_type) != 1:
+            raise ValueError(f'Expected a one letter record type but received {record_type}')
+        if sequence_number is None or not 1 <= sequence_number <= MAXIMUM_SEQUENCE_NUMBER:
+            raise ValueError(f'Expected a sequence number between 1 and 999999 but received {sequence_number}')
+        self.record_length = record_length
+        self.encoding_format = encoding_format
+        self.byte_order = byte_order
+        self.record_type = record_type
+        self.sequence_number = sequence_number
+        self.timing_quality = timing_quality
+        self.records_written = 0
+        self.samples_written = 0
+        self._encoders = dict()
+        self._encoder(self.encoding_format)
+        self._fixed_header = FIXED_HEADERS[byte_order]
+        self._b1000 = B1000_BLOCKETTES[byte_order]
+        self._b1001 = B1001_BLOCKETTES[byte_order]
+        self._b100 = B100_BLOCKETTES[byte_order]
+        self._blank = bytes(record_length)
+        self._buffer = bytearray(max(1, (buffer_size or 0) // record_length) * record_length)
+        self._position = 0
+        # (network, station, location, channel) -> (expected next start in ns, last sample) of Steim channels
+        self._continuations = dict()
+        self._close_file = not hasattr(destination, 'write')
+        self._file = open(destination, mode + 'b') if self._close_file else destination
+        self._closed = False
+
+    def write(self, network: str, station: str, location: str, channel: str,
+              start: Union[datetime.datetime, int], sample_rate: float, samples) -> int:
+        """Encode samples, the first of them at start, into records and return the number of records."""
+        return self._write(network, station, location, channel, start, sample_rate, samples)[0]
+
+    def _encoder(self, encoding_format: EncodingFormat):
+        encoder = self._encoders.get(encoding_format)
+        if encoder is None:
+            if encoding_format not in STEIM_ENCODINGS and encoding_format not in SAMPLE_WIDTHS:
+                raise ValueError(f'Cannot write records of encoding {encoding_format}')
+            encoder = get_encoder(EncodingFormat(encoding_format), byte_order=self.byte_order)
+            self._encoders[encoding_format] = encoder
+        return encoder
+
+    def _write(self, network: str, station: str, location: str, channel: str, start: Union[datetime.datetime, int],
+               sample_rate: float, samples, final: bool = True, record_type: str = None,
+               encoding_format: EncodingFormat = None, timing_quality: int = None) -> tuple[int, int]:
+        """(records, samples) written of samples. Unless final, the samples that would only fill part of a
+        record are left over for the next call."""
+        if self._closed:
+            raise ValueError('write to a closed RecordWriter')
+        if len(network) > 2 or len(station) > 5 or len(channel) != 3:
+            raise ValueError(f'{network}.{station}.{location}.{channel} are not miniSEED 2 codes')
+        location = normalize_location(location) or ''
+        if len(location) > 2:
+            raise ValueError(f'{location} is not a miniSEED 2 location code')
+        start_ns = to_ns(start)
+        if start_ns is None:
+            raise ValueError('start is required')
+        if not sample_rate or sample_rate < 0:
+            raise ValueError(f'Expected a positive sample rate but received {sample_rate}')
+        if samples is None or len(samples) == 0:
+            return 0, 0
+        encoding_format = self.encoding_format if encoding_format is None else encoding_format
+        encoder = self._encoder(encoding_format)
+        record_type = (record_type or self.record_type).encode('ascii')
+        if timing_quality is None:
+            timing_quality = self.timing_quality
+        factor, multiplier, exact = sample_rate_factors(sample_rate)
+        number_of_blockettes = 2 if exact else 3
+        header_length = self._fixed_header.size + self._b1000.size + self._b1001.size
+        if not exact:
+            header_length += self._b100.size
+        beginning_of_data = -(-header_length // STEIM_FRAME_LENGTH) * STEIM_FRAME_LENGTH
+        capacity = self.record_length - beginning_of_data
+        codes = (network.ljust(2).encode('ascii'), station.ljust(5).encode('ascii'),
+                 location.ljust(2).encode('ascii'), channel.encode('ascii'))
+        key = (network, station, location, channel)
+        steim = encoding_format in STEIM_ENCODINGS
+        carry_over = None
+        if steim:
+            expected = self._continuations.get(key)
+            if expected is not None and abs(start_ns - expected[0]) <= 500000000 / sample_rate:
+                carry_over = expected[1]
+        count = 0
+        offset = 0
+        while offset < len(samples):
+            if steim:
+                encoded = encoder.encode(samples, offset, number_of_frames=capacity // STEIM_FRAME_LENGTH,
+                                         carry_over=carry_over)
+                full = offset + encoded.number_of_samples < len(samples)
+            else:
+                maximum_number_of_samples = capacity // SAMPLE_WIDTHS[encoding_format]
+                encoded = encoder.encode(samples, offset, number_of_samples=maximum_number_of_samples)
+                full = encoded.number_of_samples == maximum_number_of_samples
+            if not final and not full:
+                break
+            number_of_samples = encoded.number_of_samples
+            self._pack(codes, start_ns + round(offset * 1000000000 / sample_rate), number_of_samples, factor,
+                       multiplier, exact, sample_rate, number_of_blockettes, beginning_of_data,
+                       encoded.to_byte_array(), record_type, encoding_format, timing_quality)
+            offset += number_of_samples
+            carry_over = samples[offset - 1]
+            count += 1
+        if steim and offset:
+            self._continuations[key] = (start_ns + round(offset * 1000000000 / sample_rate), carry_over)
+        self.records_written += count
+        self.samples_written += offset
+        return count, offset
+
+    def _pack(self, codes: tuple, start_ns: int, number_of_samples: int, factor: int, multiplier: int, exact: bool,
+              sample_rate: float, number_of_blockettes: int, beginning_of_data: int, payload: bytearray,
+              record_type: bytes, encoding_format: EncodingFormat, timing_quality: int):
+        if self._position + self.record_length > len(self._buffer):
+            self.flush()
+        position = self._position
+        out = self._buffer
+        out[position:position + self.record_length] = self._blank
+        network, station, location, channel = codes
+        start_us = start_ns // 1000
+        start = EPOCH + datetime.timedelta(microseconds=start_us - start_us % 100)
+        self._fixed_header.pack_into(
+            out, position, b'%06d' % self.sequence_number, record_type, b' ', station, location, channel, network,
+            start.year, start.timetuple().tm_yday, start.hour, start.minute, start.second, 0,
+            start.microsecond // 100, number_of_samples, factor, multiplier, 0, 0, 0, number_of_blockettes, 0,
+            beginning_of_data, self._fixed_header.size)
+        blockette = position + self._fixed_header.size
+        self._b1000.pack_into(out, blockette, 1000, blockette + self._b1000.size - position, encoding_format,
+                              1 if self.byte_order == ByteOrder.BIG_ENDIAN else 0,
+                              self.record_length.bit_length() - 1, 0)
+        blockette += self._b1000.size
+        frames = len(payload) // STEIM_FRAME_LENGTH if encoding_format in STEIM_ENCODINGS else 0
+        self._b1001.pack_into(out, blockette, 1001, 0 if exact else blockette + self._b1001.size - position,
+                              timing_quality or 0, start_us % 100, 0, frames)
+        if not exact:
+            self._b100.pack_into(out, blockette + self._b1001.size, 100, 0, sample_rate, 0, 0, 0, 0)
+        out[position + beginning_of_data:position + beginning_of_data + len(payload)] = payload
+        self._position += self.record_length
+        self.sequence_number = self.sequence_number % MAXIMUM_SEQUENCE_NUMBER + 1
+
+    def write_record(self, b_bytes):
+        """Write one complete record, bytes or a memoryview, as it is, its sequence number included."""
+        if self._closed:
+            raise ValueError('write to a closed RecordWriter')
+        if self._position + len(b_bytes) > len(self._buffer):
+            self.flush()
+        if len(b_bytes) > len(self._buffer):
+            self._file.write(b_bytes)
+        else:
+            self._buffer[self._position:self._position + len(b_bytes)] = b_bytes
+            self._position += len(b_bytes)
+        self.records_written += 1
+
+    def flush(self):
+        if self._position:
+            self._file.write(memoryview(self._buffer)[0:self._position])
+            self._position = 0
+        if hasattr(self._file, 'flush'):
+            self._file.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._closed = True
+            if self._close_file:
+                try:
+                    self._file.close()
+                except:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def write(destination, traces, mode: str = 'w', record_length: int = 4096,
+          encoding_format: EncodingFormat = EncodingFormat.STEIM_2, byte_order: ByteOrder = ByteOrder.BIG_ENDIAN,
+          record_type: str = 'D', timing_quality: int = None, buffer_size: int = DEFAULT_BUFFER_SIZE) -> int:
+    """Write traces to destination as miniSEED 2 records and return the number of records.
+
+    traces are Trace objects, whose segments are written one after the other, or tuples of
+    (network, station, location, channel, start, sample rate, samples).
+    """
+    with RecordWriter(destination, mode=mode, record_length=record_length, encoding_format=encoding_format,
+                      byte_order=byte_order, record_type=record_type, timing_quality=timing_quality,
+                      buffer_size=buffer_size) as writer:
+        for trace in traces:
+            if hasattr(trace, 'segments'):
+                for segment in trace.segments:
+                    writer.write(trace.network, trace.station, trace.location, trace.channel, segment.start_time,
+                                 segment.sample_rate, segment.samples)
+            else:
+                writer.write(*trace)
+        return writer.records_written
+
+
+class _Run:
+    """Samples of one channel continuing each other, not yet written."""
+
+    def __init__(self, key: tuple, start_ns: int, sample_rate: float, record_type: str,
+                 encoding_format: EncodingFormat, timing_quality: int = None):
+        self.key = key
+        self.start_ns = start_ns
+        self.sample_rate = sample_rate
+        self.record_type = record_type
+        self.encoding_format = encoding_format
+        self.timing_quality = timing_quality
+        self.samples = list()
+        self.written = 0
+
+    def time_of(self, index: int) -> int:
+        return self.start_ns + round(index * 1000000000 / self.sample_rate)
+
+    @property
+    def end_ns(self) -> int:
+        """Expected start of the next sample."""
+        return self.time_of(self.written + len(self.samples))
+
+    def continues(self, record, encoding_format: EncodingFormat) -> bool:
+        return self.sample_rate == record.sample_rate and self.record_type == record.record_type and \
+            self.encoding_format == encoding_format and \
+            abs(record.start_time_ns - self.end_ns) <= 500000000 / self.sample_rate
+
+    def write(self, writer: RecordWriter, final: bool):
+        records, written = writer._write(*self.key, self.time_of(self.written), self.sample_rate, self.samples,
+                                         final=final, record_type=self.record_type,
+                                         encoding_format=self.encoding_format, timing_quality=self.timing_quality)
+        del self.samples[0:written]
+        self.written += written
+
+
+def _repackable(record: DataRecord, encoding_format: EncodingFormat) -> bool:
+    """True when the samples of record can be decoded and written again in encoding_format, None keeping
+    the encoding of the record."""
+    if not record.number_of_samples or not record.sample_rate or record.sample_rate < 0:
+        return False
+    for encoding in (record.encoding_format, encoding_format or record.encoding_format):
+        if encoding not in STEIM_ENCODINGS and encoding not in SAMPLE_WIDTHS:
+            return False
+    return True
+
+
+def reformat(source, destination, record_length: int = 4096, encoding_format: EncodingFormat = None,
+             byte_order: ByteOrder = ByteOrder.BIG_ENDIAN, mode: str = 'w', buffer_size: int = DEFAULT_BUFFER_SIZE) \
+        -> int:
+    """Repack the records of source into full records of record_length bytes written to destination.
+
+    Records are decoded one at a time and the samples of every channel are gathered as long as each record
+    continues the previous one within half a sample, with the same sample rate, quality code and encoding.
+    Full records are written as soon as a channel has gathered enough samples, a gap or any other change
+    writes the last partial record of the run. Memory stays bounded by a few records per channel.
+    encoding_format None keeps the encoding of every run. Records that cannot be repacked, log records,
+    records without samples or of encodings that cannot be written, are copied byte for byte in their
+    place in the stream, after the partial records of all runs gathered before them. Returns the number
+    of records written.
+    """
+    threshold = 2 * (record_length // STEIM_FRAME_LENGTH) * MAXIMUM_FRAME_SAMPLES
+    runs = dict()
+    with RecordWriter(destination, mode=mode, record_length=record_length,
+                      encoding_format=encoding_format or EncodingFormat.STEIM_2, byte_order=byte_order,
+                      buffer_size=buffer_size) as writer, open_raw_records(source) as records:
+        for _, b_bytes in records:
+            record = parse_record(b_bytes)
+            if not _repackable(record, encoding_format):
+                for run in runs.values():
+                    run.write(writer, final=True)
+                runs.clear()
+                writer.write_record(b_bytes)
+                continue
+            samples = decode_record_data(record.encoding_format, record.byte_order, record.number_of_samples,
+                                         record.data)
+            key = (record.network_code.strip(), record.station_code.strip(),
+                   normalize_location(record.channel_location_code) or '', record.channel_code.strip())
+            record_encoding_format = encoding_format or record.encoding_format
+            run = runs.get(key)
+            if run is not None and not run.continues(record, record_encoding_format):
+                run.write(writer, final=True)
+                run = None
+            if run is None:
+                b1001 = record.blockette(1001)
+                run = _Run(key, record.start_time_ns, record.sample_rate, record.record_type, record_encoding_format,
+                           b1001.timing_quality if b1001 is not None else None)
+                runs[key] = run
+            run.samples.extend(samples)
+            if len(run.samples) >= threshold:
+                run.write(writer, final=False)
+        for run in runs.values():
+            run.write(writer, final=True)
+        return writer.records_written